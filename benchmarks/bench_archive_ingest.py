@@ -0,0 +1,89 @@
+"""
+Archive ingest benchmark
+Ingests a generated zip of small documentation files once as one upload job
+per file (each file spooled, chunked and indexed with its own add_texts
+call and segment) and once as a single archive job (files chunked in
+parallel, all chunks indexed with one add_texts call). Uses the hash
+embedding backend from bench_chunking, so the numbers exclude model
+inference.
+
+Usage:
+    python benchmarks/bench_archive_ingest.py --files 2000
+"""
+
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_chunking import make_embedder
+from simple_pandaaiqa.ingest import IngestionQueue
+from simple_pandaaiqa.pdf_processor import PDFProcessor
+from simple_pandaaiqa.text_processor import TextProcessor
+from simple_pandaaiqa.vector_store import VectorStore
+
+
+def spooled_copy(content: bytes) -> str:
+    """Write content to a temporary file the job deletes, like /api/upload does"""
+    with tempfile.NamedTemporaryFile(prefix="upload-", delete=False) as f:
+        f.write(content)
+    return f.name
+
+
+def wait_all(jobs) -> None:
+    while not all(job.finished for job in jobs):
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark archive upload against per-file uploads")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--sentences", type=int, default=40, help="sentences per file")
+    parser.add_argument("--archive-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    files = {f"docs/section{i % 20}/page{i}.md": (f"Page {i}: configure component {i % 97} before step {i}. "
+                                                 * args.sentences).encode() for i in range(args.files)}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    size = sum(map(len, files.values()))
+    print(f"{args.files} files, {size / 1e6:.1f} MB, zip {len(buffer.getvalue()) / 1e6:.1f} MB")
+
+    print(f"{'mode':>10} {'s':>8} {'files/s':>9} {'chunks':>8} {'chunks/s':>9}")
+    for mode in ("per-file", "archive"):
+        tmp = tempfile.mkdtemp()
+        try:
+            store = VectorStore(embedder=make_embedder(), persist_dir=os.path.join(tmp, "kb"))
+            ingestion = IngestionQueue(TextProcessor(), PDFProcessor(), store, max_pending=args.files + 1,
+                                       archive_workers=args.archive_workers)
+            start = time.perf_counter()
+            if mode == "per-file":
+                jobs = [ingestion.submit(name, "md", spooled_copy(content), {"source": name, "type": "md"})
+                        for name, content in files.items()]
+            else:
+                jobs = [ingestion.submit("docs.zip", "zip", spooled_copy(buffer.getvalue()))]
+            wait_all(jobs)
+            elapsed = time.perf_counter() - start
+            ingestion.shutdown()
+            if store._compaction is not None:
+                store._compaction.join()  # segment compaction started by the many small adds
+            failed = [job.message for job in jobs if job.status != "completed"]
+            if failed:
+                raise RuntimeError(failed[0])
+            chunks = store.document_count
+            print(f"{mode:>10} {elapsed:>8.2f} {args.files / elapsed:>9.1f} {chunks:>8} {chunks / elapsed:>9.1f}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
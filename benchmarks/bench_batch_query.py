@@ -0,0 +1,105 @@
+"""
+Batch query benchmark
+Scoring many queries one matrix-vector product at a time against one
+matrix-matrix product per block (FlatIndex.search vs search_batch), and a
+list of questions sent as individual /api/query calls against a single
+/api/query/batch call. LM Studio is replaced by the local stub completions
+server and the embedding model by a cheap deterministic one, so the API
+numbers show retrieval and generation scheduling, not model speed.
+
+Usage:
+    python benchmarks/bench_batch_query.py --sizes 100000 500000 --queries 1000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_chunking import HashBackend
+from bench_vector_index import random_vectors
+from stub_completions import start_stub_server
+import simple_pandaaiqa.config as config
+import simple_pandaaiqa.embedder as embedder_module
+from simple_pandaaiqa.index.flat import FlatIndex
+
+
+def bench_index(sizes, dim, query_count, top_k):
+    print(f"{'chunks':>10} {'queries':>8} {'loop ms':>10} {'batch ms':>10} {'speedup':>8}")
+    queries = random_vectors(query_count, dim, seed=1)
+    for n in sizes:
+        index = FlatIndex(dim)
+        index.add(random_vectors(n, dim))
+
+        start = time.perf_counter()
+        looped = [index.search(query, top_k) for query in queries]
+        loop_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        batched = index.search_batch(queries, top_k)
+        batch_ms = (time.perf_counter() - start) * 1000
+
+        assert all((a[0] == b[0]).all() for a, b in zip(looped, batched))
+        print(f"{n:>10} {query_count:>8} {loop_ms:>10.0f} {batch_ms:>10.0f} {loop_ms / batch_ms:>7.1f}x")
+
+
+async def bench_api(query_count, chunks, top_k):
+    import simple_pandaaiqa.api as api
+
+    api.embedder.backend = HashBackend()
+    questions = [f"What does section {i} say about topic {i % 13}?" for i in range(query_count)]
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        await asyncio.to_thread(
+            api.vector_store.add_texts, [f"Section {i} covers topic {i % 13} in detail." for i in range(chunks)]
+        )
+
+        api.answer_cache.clear()
+        start = time.perf_counter()
+        for question in questions:
+            (await client.post("/api/query", json={"text": question, "top_k": top_k})).raise_for_status()
+        sequential_s = time.perf_counter() - start
+
+        api.answer_cache.clear()
+        start = time.perf_counter()
+        response = await client.post("/api/query/batch", json={"queries": questions, "top_k": top_k})
+        response.raise_for_status()
+        batch_s = time.perf_counter() - start
+        body = response.json()
+        await api.generator.aclose()
+
+    print(f"{query_count} queries over {chunks} chunks")
+    print(f"  /api/query one by one  {sequential_s:8.2f} s")
+    print(f"  /api/query/batch       {batch_s:8.2f} s   (retrieval {body['retrieval_ms']:.0f} ms, "
+          f"{config.BATCH_QUERY_CONCURRENCY} generations in flight)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched retrieval and the batch query endpoint")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 500_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=1000, help="queries scored in the index benchmark")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--api-queries", type=int, default=200, help="questions sent through the API")
+    parser.add_argument("--api-chunks", type=int, default=5000)
+    args = parser.parse_args()
+
+    bench_index(args.sizes, args.dim, args.queries, args.top_k)
+
+    # keep the benchmark away from the real knowledge base and LM Studio
+    server, api_base = start_stub_server(token_delay=0.005)
+    config.KB_PERSISTENCE_ENABLED = False
+    embedder_module.EMBEDDING_STORE_ENABLED = False
+    config.LM_STUDIO_API_BASE = api_base
+    asyncio.run(bench_api(args.api_queries, args.api_chunks, args.top_k))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
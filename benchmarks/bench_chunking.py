@@ -0,0 +1,125 @@
+"""
+Chunking benchmark
+Ingest throughput of the llama_index backend with the old double chunking
+(TextProcessor chunks re-split by llama_index's SentenceSplitter) against
+inserting the chunks as nodes directly, and whether the chunk count reported
+for an upload matches what is indexed. The embedding model is replaced by a
+cheap deterministic one, so the numbers isolate chunking and node handling.
+
+Usage:
+    python benchmarks/bench_chunking.py --kb 2000
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core import Document, StorageContext, VectorStoreIndex
+from llama_index.core.node_parser import SentenceSplitter as LlamaSentenceSplitter
+
+import simple_pandaaiqa.embedder as embedder_module
+from simple_pandaaiqa.config import CHUNK_OVERLAP, CHUNK_SIZE
+from simple_pandaaiqa.embedder import Embedder, VectorLRUCache
+from simple_pandaaiqa.splitters import get_splitter
+from simple_pandaaiqa.text_processor import TextProcessor
+from simple_pandaaiqa.vector_store import VectorStore
+
+SENTENCES = [
+    "The Northeastern admission office reviews every application holistically.",
+    "Applicants may submit test scores, although they are optional for most programs.",
+    "Financial aid decisions are released together with the admission decision!",
+    "Is the co-op program available to international students?",
+    "Yes, and the program coordinator helps with work authorization.\n",
+]
+# Chinese text needs more llama_index tokens per character, so the old re-split produced extra nodes
+SENTENCES_ZH = [
+    "东北大学招生办公室会全面审核每一份申请材料。",
+    "大多数项目的标准化考试成绩是可选的，申请人可以自行决定是否提交。",
+    "奖学金和助学金的结果会与录取结果一起发布！",
+    "国际学生可以参加带薪实习项目吗？",
+    "可以，项目协调员会协助办理工作许可。\n",
+]
+
+
+class HashModel:
+    """Deterministic stand-in for SentenceTransformer"""
+
+    dim = 384
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, str):
+            return self._vector(texts)
+        return np.stack([self._vector(text) for text in texts])
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+class HashBackend:
+    model_name = "hash"
+    model = HashModel()
+    dimension = HashModel.dim
+
+
+def make_embedder():
+    # no embedding store, so both paths embed every chunk
+    embedder_module.EMBEDDING_STORE_ENABLED = False
+    return Embedder(backend=HashBackend(), query_cache=VectorLRUCache())
+
+
+def old_ingest(store, documents):
+    """The previous llama_index path: every chunk is re-split into nodes before embedding"""
+    llama_docs = [Document(text=doc["text"], metadata=doc["metadata"], doc_id=f"doc_{i}")
+                  for i, doc in enumerate(documents)]
+    parser = LlamaSentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    index = VectorStoreIndex.from_documents(
+        llama_docs,
+        storage_context=StorageContext.from_defaults(),
+        transformations=[parser],
+        embed_model=store.embed_model,
+    )
+    return len(index.vector_store.data.embedding_dict)
+
+
+def new_ingest(store, documents):
+    store.add_texts([doc["text"] for doc in documents], [doc["metadata"] for doc in documents])
+    return len(store.index.vector_store.data.embedding_dict)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark double chunking against direct node insertion")
+    parser.add_argument("--kb", type=int, default=2000, help="size of the uploaded text in KB")
+    parser.add_argument("--strategies", nargs="+", default=["character", "sentence", "token"])
+    parser.add_argument("--language", choices=["en", "zh"], default="en")
+    args = parser.parse_args()
+
+    sentences = SENTENCES_ZH if args.language == "zh" else SENTENCES
+    paragraph = " ".join(sentences) + " "
+    text = paragraph * (args.kb * 1000 // len(paragraph) + 1)
+
+    print(f"{'strategy':<10} {'path':<6} {'reported':>9} {'indexed':>8} {'seconds':>8} {'chunks/s':>9}")
+    for strategy in args.strategies:
+        documents = TextProcessor(splitter=get_splitter(strategy)).process_text(text, {"source": "bench.txt"})
+        for label, ingest in (("old", old_ingest), ("new", new_ingest)):
+            store = VectorStore(embedder=make_embedder(), backend="llama_index")
+            start = time.perf_counter()
+            indexed = ingest(store, documents)
+            seconds = time.perf_counter() - start
+            print(f"{strategy:<10} {label:<6} {len(documents):>9} {indexed:>8} {seconds:>8.2f} "
+                  f"{len(documents) / seconds:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Concurrency load test for the API
+Latency of /api/status and /api/query while a large upload is processed,
+against the same requests on an idle server. The app runs in-process on the
+client's event loop, so any handler that blocks the loop shows up directly;
+LM Studio is replaced by the local stub completions server.
+
+Usage:
+    python benchmarks/bench_concurrency.py --upload-kb 190 --uploads 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_completions import start_stub_server
+import simple_pandaaiqa.config as config
+
+SENTENCE = "The Northeastern admission office reviews every application holistically. "
+
+
+def summarize(label, samples):
+    if not samples:
+        return f"{label:<8} no samples"
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return (f"{label:<8} n={len(samples):<4} p50 {statistics.median(samples):7.1f} ms   "
+            f"p95 {p95:7.1f} ms   max {samples[-1]:7.1f} ms")
+
+
+async def probe(client, stop, interval):
+    """Alternate status and query requests until stop is set"""
+    latencies = {"status": [], "query": []}
+    while not stop.is_set():
+        start = time.perf_counter()
+        (await client.get("/api/status")).raise_for_status()
+        latencies["status"].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        (await client.post("/api/query", json={"text": "How are applications reviewed?", "top_k": 3})).raise_for_status()
+        latencies["query"].append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def upload(client, name, size):
+    text = (SENTENCE * (size // len(SENTENCE) + 1))[:size]
+    response = await client.post("/api/upload", files={"file": (name, text.encode("utf-8"), "text/plain")})
+    response.raise_for_status()
+    # uploads are processed as background jobs, wait until this one is indexed
+    job_id = response.json()["job_id"]
+    while True:
+        job = (await client.get(f"/api/jobs/{job_id}")).json()
+        if job["status"] not in ("queued", "running"):
+            break
+        await asyncio.sleep(0.05)
+
+
+async def run(args):
+    from simple_pandaaiqa.api import app, generator
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        await upload(client, "seed.txt", 20_000)
+
+        stop = asyncio.Event()
+        idle_task = asyncio.create_task(probe(client, stop, args.interval))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        idle = await idle_task
+
+        stop = asyncio.Event()
+        busy_task = asyncio.create_task(probe(client, stop, args.interval))
+        start = time.perf_counter()
+        await asyncio.gather(*(upload(client, f"large-{i}.txt", args.upload_kb * 1000) for i in range(args.uploads)))
+        upload_s = time.perf_counter() - start
+        stop.set()
+        busy = await busy_task
+        await generator.aclose()
+
+    print(f"{args.uploads} upload(s) of {args.upload_kb} KB took {upload_s:.2f}s")
+    for name in ("status", "query"):
+        print(summarize(name, idle[name]) + "   (idle)")
+        print(summarize(name, busy[name]) + "   (during upload)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Status/query latency during large uploads")
+    parser.add_argument("--upload-kb", type=int, default=190, help="size of each uploaded text file")
+    parser.add_argument("--uploads", type=int, default=2, help="concurrent uploads")
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--interval", type=float, default=0.05, help="pause between probe rounds")
+    args = parser.parse_args()
+
+    # keep the benchmark away from the real knowledge base and LM Studio
+    server, api_base = start_stub_server(token_delay=0.005)
+    config.KB_PERSISTENCE_ENABLED = False
+    config.LM_STUDIO_API_BASE = api_base
+
+    asyncio.run(run(args))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
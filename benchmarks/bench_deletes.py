@@ -0,0 +1,62 @@
+"""
+Tombstone delete benchmark
+Searching a FlatIndex whose deleted rows are masked through the exclude
+argument against the same index after compaction dropped them, for growing
+shares of deleted rows, plus the time compaction takes to copy the live rows.
+
+Usage:
+    python benchmarks/bench_deletes.py --size 200000 --queries 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_vector_index import random_vectors
+from simple_pandaaiqa.index.flat import FlatIndex
+
+
+def search_ms(index: FlatIndex, queries: np.ndarray, top_k: int, exclude=None) -> float:
+    """Average single-query search latency in milliseconds"""
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, top_k, exclude=exclude)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tombstoned search and compaction")
+    parser.add_argument("--size", type=int, default=200_000, help="chunks in the index")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"])
+    args = parser.parse_args()
+
+    index = FlatIndex(args.dim, dtype=args.dtype)
+    index.add(random_vectors(args.size, args.dim))
+    queries = random_vectors(args.queries, args.dim, seed=1)
+    rng = np.random.default_rng(0)
+    print(f"{args.size} chunks, {args.dtype}, no deletes: {search_ms(index, queries, args.top_k):.2f} ms/query")
+
+    print(f"{'deleted':>8} {'tombstoned ms':>14} {'compacted ms':>13} {'compaction s':>13}")
+    for share in (0.01, 0.05, 0.2, 0.5):
+        deleted = np.sort(rng.choice(args.size, size=int(args.size * share), replace=False)).astype(np.int64)
+        tombstoned = search_ms(index, queries, args.top_k, exclude=deleted)
+
+        start = time.perf_counter()
+        compacted = FlatIndex(args.dim, dtype=args.dtype)
+        compacted.load_arrays(index.arrays(np.setdiff1d(np.arange(args.size), deleted)))
+        compaction = time.perf_counter() - start
+
+        print(f"{share:>8.0%} {tombstoned:>14.2f} {search_ms(compacted, queries, args.top_k):>13.2f} {compaction:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Generator request overhead benchmark
+Per-question latency and TCP connections of the pooled, health-cached
+Generator against a probe plus un-pooled post per question, using a local
+stub completions server
+
+Usage:
+    python benchmarks/bench_generator.py --questions 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import requests
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_completions import start_stub_server
+from simple_pandaaiqa.generator import Generator
+
+CONTEXT = [{"text": "PandaAIQA answers questions from a local knowledge base.", "metadata": {"source": "bench"}}]
+
+
+def unpooled_generate(generator, query):
+    """What generate() did before: a health probe and a fresh connection per request"""
+    requests.get(f"{generator.api_base}/v1/models", timeout=5)
+    response = requests.post(
+        f"{generator.api_base}/v1/completions",
+        headers={"Content-Type": "application/json"},
+        data=json.dumps(generator._build_payload(query, CONTEXT)),
+        timeout=30,
+    )
+    return response.json()["choices"][0]["text"].strip()
+
+
+def run(label, server, generate, questions):
+    server.stats.update(connections=0, requests=0)
+    start = time.perf_counter()
+    for i in range(questions):
+        generate(f"question {i}")
+    per_question_ms = (time.perf_counter() - start) * 1000 / questions
+    print(f"{label:<10} {per_question_ms:>8.2f} ms/question {server.stats['requests']:>6} requests "
+          f"{server.stats['connections']:>6} new connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Generator request overhead")
+    parser.add_argument("--questions", type=int, default=200)
+    args = parser.parse_args()
+
+    server, api_base = start_stub_server(token_delay=0.0)
+    generator = Generator(api_base=api_base)
+    generator.check_connection()
+
+    run("unpooled", server, lambda query: unpooled_generate(generator, query), args.questions)
+    run("pooled", server, lambda query: generator.generate(query, CONTEXT), args.questions)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Hybrid search benchmark
+Latency and retrieval quality of VectorStore.search in dense, sparse (BM25)
+and hybrid (reciprocal rank fusion) mode, on a synthetic support corpus where
+every chunk carries a unique part number and error code.
+
+Three query sets, each with one relevant chunk per query:
+    identifier   "What does error E-4821 mean?"
+    keywords     four words of the chunk's description, as written
+    paraphrase   the chunk's description mostly in synonyms, no identifiers
+Keyword search cannot match synonyms and embeddings blur identifiers, so
+dense and sparse mode each fail one set, while hybrid finds the relevant
+chunk for all of them at some cost in rank on the sets one side gets wrong.
+
+Without sentence-transformers installed (or with --synthetic) the embedding
+model is replaced by a stand-in that maps synonyms to a shared vector and
+ignores tokens with digits, like a model that knows word meanings but not
+part numbers. Latencies use precomputed query vectors, so they show index
+work only; sparse latency is reported with and without MaxScore pruning.
+
+Usage:
+    python benchmarks/bench_hybrid_search.py --sizes 20000 100000 --queries 500
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import re
+import sys
+import time
+
+import numpy as np
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simple_pandaaiqa.embedder as embedder_module
+from simple_pandaaiqa.embedder import Embedder, EmbeddingBackend, VectorLRUCache
+from simple_pandaaiqa.vector_store import VectorStore
+
+# synonym groups, chunks use the first word and paraphrase queries the second
+CONCEPTS = [
+    ("printer", "copier"), ("paper", "sheet"), ("jam", "blockage"), ("fan", "blower"), ("noise", "sound"),
+    ("overheating", "heat"), ("battery", "cell"), ("screen", "display"), ("cracked", "broken"),
+    ("slow", "sluggish"), ("reset", "reboot"), ("install", "setup"), ("password", "passcode"),
+    ("network", "wifi"), ("update", "upgrade"), ("charging", "power"), ("cable", "cord"), ("light", "led"),
+    ("blinking", "flashing"), ("pairing", "connecting"), ("bluetooth", "wireless"), ("firmware", "software"),
+    ("camera", "webcam"), ("microphone", "mic"), ("keyboard", "keys"), ("mouse", "trackpad"),
+    ("storage", "disk"), ("memory", "ram"), ("freezes", "hangs"), ("crashes", "shutdown"),
+    ("login", "signin"), ("account", "profile"), ("refund", "reimbursement"), ("warranty", "guarantee"),
+    ("shipping", "delivery"), ("invoice", "bill"), ("replace", "swap"), ("repair", "fix"),
+    ("manual", "guide"), ("sensor", "detector"),
+]
+CONCEPT_OF = {word: i for i, group in enumerate(CONCEPTS) for word in group}
+
+
+class ConceptModel:
+    """Stand-in for SentenceTransformer: bag of concepts, synonyms share a vector, identifiers are ignored"""
+
+    dim = 384
+
+    def _word_vector(self, word):
+        key = f"concept:{CONCEPT_OF[word]}" if word in CONCEPT_OF else word
+        seed = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def _vector(self, text):
+        words = [word for word in re.findall(r"[\w-]+", text.lower()) if not any(c.isdigit() for c in word)]
+        vector = np.sum([self._word_vector(word) for word in words], axis=0) if words else np.ones(self.dim)
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, str):
+            return self._vector(texts)
+        return np.stack([self._vector(text) for text in texts])
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+class ConceptBackend:
+    model_name = "concepts"
+    model = ConceptModel()
+    dimension = ConceptModel.dim
+
+
+def make_corpus(count, seed=0):
+    """Chunks with unique identifiers and a description of four to ten concepts each"""
+    rng = random.Random(seed)
+    parts = rng.sample(range(100000, 1000000), count)
+    codes = rng.sample(range(1000, 10000 if count <= 9000 else 1000000), count)
+    chunks, descriptions = [], []
+    for part, code in zip(parts, codes):
+        concepts = rng.sample(range(len(CONCEPTS)), rng.randint(4, 10))
+        words = " ".join(CONCEPTS[c][0] for c in concepts)
+        chunks.append(f"Error E-{code} on part PN-{part}: the {words} afterwards. See the service notes.")
+        descriptions.append(concepts)
+    return chunks, parts, codes, descriptions
+
+
+def make_queries(count, parts, codes, descriptions, seed=1):
+    """(identifier, keyword, paraphrase) queries, each a list of (text, relevant row)"""
+    rng = random.Random(seed)
+    rows = rng.sample(range(len(parts)), count)
+    identifier = [
+        (f"What does error E-{codes[row]} mean?" if i % 2 else f"Where can I order part PN-{parts[row]}?", row)
+        for i, row in enumerate(rows)
+    ]
+    keywords = [
+        ("the " + " ".join(CONCEPTS[c][0] for c in rng.sample(descriptions[row], 4)) + " service notes", row)
+        for row in rows
+    ]
+    paraphrase = []
+    for row in rows:
+        concepts = rng.sample(descriptions[row], 4)
+        # one word as written in the chunk, so keyword search has a weak lead to follow
+        words = [CONCEPTS[concepts[0]][0]] + [CONCEPTS[c][1] for c in concepts[1:]]
+        paraphrase.append(("my " + " ".join(words) + " problem", row))
+    return identifier, keywords, paraphrase
+
+
+def evaluate(store, queries, vectors, mode, top_k):
+    """(mean ms per query, recall@top_k, MRR@top_k)"""
+    found, reciprocal = 0, 0.0
+    start = time.perf_counter()
+    results = [store._search_native(text, top_k, vector, mode) for (text, _), vector in zip(queries, vectors)]
+    elapsed = time.perf_counter() - start
+    for (_, row), hits in zip(queries, results):
+        texts = [hit["text"] for hit in hits]
+        target = store.documents[row]["text"]
+        if target in texts:
+            found += 1
+            reciprocal += 1.0 / (texts.index(target) + 1)
+    return elapsed * 1000 / len(queries), found / len(queries), reciprocal / len(queries)
+
+
+def bench_pruning(store, queries, top_k):
+    """Mean ms per BM25 query with and without MaxScore pruning"""
+    timings = []
+    for prune in (True, False):
+        start = time.perf_counter()
+        for text, _ in queries:
+            store.keyword_index.search(text, top_k, prune=prune)
+        timings.append((time.perf_counter() - start) * 1000 / len(queries))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dense, sparse and hybrid search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 100_000])
+    parser.add_argument("--queries", type=int, default=500, help="queries per query set")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--synthetic", action="store_true", help="use the stand-in instead of the real model")
+    args = parser.parse_args()
+
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        args.synthetic = True
+    backend = ConceptBackend() if args.synthetic else EmbeddingBackend()
+    print(f"embedding model: {backend.model_name}")
+
+    embedder_module.EMBEDDING_STORE_ENABLED = False
+    for size in args.sizes:
+        chunks, parts, codes, descriptions = make_corpus(size)
+        store = VectorStore(embedder=Embedder(backend=backend, query_cache=VectorLRUCache(0, 0)), backend="flat")
+        start = time.perf_counter()
+        store.add_texts(chunks)
+        print(f"\n{size} chunks indexed in {time.perf_counter() - start:.1f} s, "
+              f"{store.keyword_index.vocabulary_size} terms, keyword index {store.keyword_index.nbytes / 2**20:.1f} MiB")
+
+        print(f"{'queries':>11} {'mode':>7} {'ms/query':>9} {'recall@' + str(args.top_k):>10} {'MRR':>6}")
+        sets = zip(("identifier", "keywords", "paraphrase"), make_queries(args.queries, parts, codes, descriptions))
+        for name, queries in sets:
+            vectors = store.embedder.embed_queries([text for text, _ in queries])
+            for mode in ("dense", "sparse", "hybrid"):
+                ms, recall, mrr = evaluate(store, queries, vectors, mode, args.top_k)
+                print(f"{name:>11} {mode:>7} {ms:>9.2f} {recall:>10.3f} {mrr:>6.3f}")
+            pruned, exhaustive = bench_pruning(store, queries, args.top_k)
+            print(f"{name:>11} BM25 {pruned:.2f} ms with MaxScore pruning, {exhaustive:.2f} ms scoring every posting")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+IVF recall/latency benchmark
+Sweeps nprobe and reports recall@k against exact search
+
+Usage:
+    python benchmarks/bench_ivf_recall.py --size 300000 --nprobe 4 8 16 32 64
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_pandaaiqa.index.flat import normalize_rows
+from simple_pandaaiqa.index.ivf import IVFIndex
+
+
+def clustered_vectors(n: int, dim: int, clusters: int = 500, seed: int = 0) -> np.ndarray:
+    """Unit vectors drawn around random topic centres, closer to real embeddings than pure noise"""
+    rng = np.random.default_rng(seed)
+    centres = normalize_rows(rng.standard_normal((clusters, dim), dtype=np.float32))
+    labels = rng.integers(0, clusters, size=n)
+    noise = rng.standard_normal((n, dim), dtype=np.float32) * 0.08
+    return normalize_rows(centres[labels] + noise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure IVF recall@k against exact search")
+    parser.add_argument("--size", type=int, default=300_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.size + args.queries, args.dim)
+    data, queries = vectors[:args.size], vectors[args.size:]
+
+    start = time.perf_counter()
+    index = IVFIndex(args.dim, nlist=args.nlist, min_train_size=1)
+    index.add(data)
+    print(f"built IVF index over {args.size} vectors in {time.perf_counter() - start:.2f}s")
+
+    report = index.recall_at_k(queries, top_k=args.top_k, nprobe_values=args.nprobe)
+    print(f"{'nprobe':>8} {f'recall@{args.top_k}':>10} {'ivf ms':>8} {'exact ms':>9}")
+    for nprobe, result in report.items():
+        print(f"{nprobe:>8} {result['recall']:>10.3f} {result['query_ms']:>8.2f} {result['exact_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
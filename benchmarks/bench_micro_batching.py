@@ -0,0 +1,120 @@
+"""
+Query embedding micro-batching benchmark
+Throughput and latency of Embedder.embed_text with 1, 8, 32 and 128
+concurrent clients, each encode call on its own against the micro-batcher.
+Every query is unique, so the query cache never answers.
+
+Without sentence-transformers installed (or with --synthetic) the model is
+replaced by a cost model of a CPU-bound transformer: encode calls run one at
+a time and take a fixed overhead plus a smaller per-text cost.
+
+Usage:
+    python benchmarks/bench_micro_batching.py --clients 1 8 32 128 --seconds 5
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import simple_pandaaiqa.embedder as embedder_module
+from simple_pandaaiqa.embedder import Embedder, EmbeddingBackend, MicroBatcher, VectorLRUCache
+
+
+class SyntheticModel:
+    """Stand-in for SentenceTransformer: overhead_ms + per_text_ms * len(batch), one call at a time"""
+
+    dim = 384
+
+    def __init__(self, overhead_ms, per_text_ms):
+        self.overhead = overhead_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self._lock = threading.Lock()  # the model saturates the CPU, concurrent calls queue up
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else texts
+        with self._lock:
+            time.sleep(self.overhead + self.per_text * len(batch))
+        vectors = np.random.default_rng(len(batch)).standard_normal((len(batch), self.dim)).astype(np.float32)
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+class SyntheticBackend:
+    model_name = "synthetic"
+
+    def __init__(self, overhead_ms, per_text_ms):
+        self.model = SyntheticModel(overhead_ms, per_text_ms)
+        self.dimension = SyntheticModel.dim
+
+
+def run_clients(embedder, clients, seconds):
+    """Closed loop: each client embeds a new query as soon as the previous one returned"""
+    counter = itertools.count()
+    latencies = [[] for _ in range(clients)]
+    deadline = time.perf_counter() + seconds
+
+    def client(samples):
+        while time.perf_counter() < deadline:
+            text = f"how do i apply for program number {next(counter)}?"
+            start = time.perf_counter()
+            embedder.embed_text(text)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=client, args=(samples,)) for samples in latencies]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    samples = np.array([value for samples in latencies for value in samples])
+    return len(samples) / elapsed, np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query embedding micro-batching")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each run")
+    parser.add_argument("--max-batch", type=int, default=embedder_module.EMBEDDING_MICRO_BATCH_SIZE)
+    parser.add_argument("--window-ms", type=float, default=embedder_module.EMBEDDING_MICRO_BATCH_WINDOW_MS)
+    parser.add_argument("--synthetic", action="store_true", help="use the cost model instead of the real model")
+    parser.add_argument("--overhead-ms", type=float, default=6.0, help="synthetic cost per encode call")
+    parser.add_argument("--per-text-ms", type=float, default=0.5, help="synthetic cost per text")
+    args = parser.parse_args()
+
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        args.synthetic = True
+    if args.synthetic:
+        backend = SyntheticBackend(args.overhead_ms, args.per_text_ms)
+        print(f"synthetic model: {args.overhead_ms} ms per call + {args.per_text_ms} ms per text")
+    else:
+        backend = EmbeddingBackend()
+        backend.model.encode("warm up")
+
+    embedder_module.EMBEDDING_STORE_ENABLED = False
+    print(f"{'clients':>8} {'batching':>9} {'queries/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'mean batch':>11}")
+    for clients in args.clients:
+        for max_batch in (1, args.max_batch):
+            embedder = Embedder(backend=backend, query_cache=VectorLRUCache(0, 0))
+            embedder.micro_batcher = MicroBatcher(embedder._encode_batch, max_batch, args.window_ms)
+            qps, p50, p99 = run_clients(embedder, clients, args.seconds)
+            batch = embedder.micro_batcher.stats()["mean_batch_size"] if max_batch > 1 else 1.0
+            label = "on" if max_batch > 1 else "off"
+            print(f"{clients:>8} {label:>9} {qps:>10.0f} {p50:>8.1f} {p99:>8.1f} {batch:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
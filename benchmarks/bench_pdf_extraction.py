@@ -0,0 +1,125 @@
+"""
+PDF extraction benchmark
+Compares the old extract-everything-then-chunk path with streaming extraction,
+in-process and on the process pool, on a synthetic multi-hundred-page PDF
+
+Usage:
+    python benchmarks/bench_pdf_extraction.py --pages 400 --lines 60
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyPDF2 import PdfReader
+
+from simple_pandaaiqa.pdf_processor import PDFProcessor
+from simple_pandaaiqa.splitters import CharacterSplitter
+
+WORDS = ("panda bamboo knowledge answer question local model vector index chunk page "
+         "document search embedding context retrieval generate stream cache").split()
+
+
+def make_pdf(pages, lines):
+    """Minimal text-only PDF with one Helvetica content stream per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        rows = []
+        for line in range(lines):
+            words = " ".join(WORDS[(page * 7 + line * 3 + i) % len(WORDS)] for i in range(12))
+            rows.append(f"({page + 1}.{line + 1} {words}) Tj T*")
+        stream = ("BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(rows) + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), pages)
+
+    out = BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def old_split_pdf(content, chunk_size, chunk_overlap):
+    """The previous PDFProcessor._split_pdf"""
+    reader = PdfReader(BytesIO(content))
+    full_text = ""
+    for page in reader.pages:
+        full_text += page.extract_text() + "\n"
+
+    chunks = []
+    start = 0
+    while start < len(full_text):
+        end = min(start + chunk_size, len(full_text))
+        chunks.append(full_text[start:end])
+        if end == len(full_text):
+            break
+        start += chunk_size - chunk_overlap
+    return chunks
+
+
+def measure(label, produce):
+    """Time produce() (an iterator of chunk texts) to its first and last chunk, then rerun it for peak memory"""
+    start = time.perf_counter()
+    first = None
+    chunks = []
+    for chunk in produce():
+        if first is None:
+            first = time.perf_counter() - start
+        chunks.append(chunk)
+    total = time.perf_counter() - start
+
+    # separate run, tracing allocations slows extraction down several times
+    tracemalloc.start()
+    for _ in produce():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22} {first * 1000:>10.0f} {total * 1000:>10.0f} {peak / 2**20:>10.1f} {len(chunks):>8}")
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF extraction and chunking")
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--lines", type=int, default=60, help="text lines per page")
+    args = parser.parse_args()
+
+    content = make_pdf(args.pages, args.lines)
+    print(f"synthetic PDF: {args.pages} pages, {len(content) / 2**20:.1f} MiB, {os.cpu_count()} CPUs")
+    # plain character windows, as the old path used
+    processor = PDFProcessor(splitter=CharacterSplitter())
+    sequential = PDFProcessor(splitter=CharacterSplitter(), parallel_min_pages=args.pages + 1)
+
+    # start the worker processes outside the measurement
+    list(processor.iter_documents(make_pdf(processor.parallel_min_pages, 1)))
+
+    # peak memory is measured in this process only, pool workers hold their own pages
+    print(f"{'':<22} {'first ms':>10} {'total ms':>10} {'peak MiB':>10} {'chunks':>8}")
+    old = measure("old (full text)", lambda: iter(old_split_pdf(content, processor.chunk_size,
+                                                                processor.chunk_overlap)))
+    streamed = measure("streaming, 1 process", lambda: (doc["text"] for doc in sequential.iter_documents(content)))
+    pooled = measure("streaming, pool", lambda: (doc["text"] for doc in processor.iter_documents(content)))
+    print(f"identical chunks: {old == streamed == pooled}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Snapshot persistence benchmark
+Times save_to_disk / load_from_disk of the native store at several corpus sizes
+
+Usage:
+    python benchmarks/bench_persistence.py --sizes 10000 100000 500000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_vector_index import random_vectors
+from simple_pandaaiqa.index.flat import FlatIndex
+from simple_pandaaiqa.index.storage import read_snapshot, write_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot save/load")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>10} {'save s':>8} {'load ms':>8} {'first search ms':>16}")
+    for n in args.sizes:
+        index = FlatIndex(args.dim)
+        index.add(random_vectors(n, args.dim))
+        records = [{"text": f"chunk {i} " + "lorem ipsum " * 60, "metadata": {"source": "bench.txt", "chunk_id": i}}
+                   for i in range(n)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, "kb")
+            start = time.perf_counter()
+            write_snapshot(directory, index.arrays(), records, {"dim": args.dim, "dtype": "float32"})
+            save_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            arrays, loaded_records, _ = read_snapshot(directory)
+            loaded = FlatIndex(args.dim)
+            loaded.load_arrays(arrays)
+            load_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            ids, _ = loaded.search(random_vectors(1, args.dim, seed=1)[0], 3)
+            [loaded_records[int(i)] for i in ids]
+            search_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{n:>10} {save_s:>8.2f} {load_ms:>8.2f} {search_ms:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Quantized storage benchmark
+Reports bytes per chunk, recall@k against float32 exact search and query latency
+for each FlatIndex storage mode
+
+Usage:
+    python benchmarks/bench_quantization.py --size 200000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_ivf_recall import clustered_vectors
+from simple_pandaaiqa.index.flat import FlatIndex
+
+MODES = [
+    ("float32", False),
+    ("float16", False),
+    ("float16", True),
+    ("int8", False),
+    ("int8", True),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory and recall of quantized storage")
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.size + args.queries, args.dim)
+    data, queries = vectors[:args.size], vectors[args.size:]
+
+    truth = None
+    print(f"{'mode':<16} {'bytes/chunk':>12} {'in-memory MB':>13} {f'recall@{args.top_k}':>10} {'query ms':>9}")
+    for dtype, rescore in MODES:
+        index = FlatIndex(args.dim, dtype=dtype, rescore=rescore)
+        index.add(data)
+
+        start = time.perf_counter()
+        results = [set(index.search(query, args.top_k)[0].tolist()) for query in queries]
+        query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        if truth is None:
+            truth = results
+        recall = sum(len(t & r) for t, r in zip(truth, results)) / sum(len(t) for t in truth)
+        # the float32 rescoring copy is what gets memory-mapped from disk, report it separately
+        compact = index.nbytes - (index._full.nbytes if index._full is not None else 0)
+        name = f"{dtype}{'+rescore' if rescore else ''}"
+        print(f"{name:<16} {compact / args.size:>12.0f} {index.nbytes / 2**20:>13.1f} "
+              f"{recall:>10.3f} {query_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
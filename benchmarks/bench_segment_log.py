@@ -0,0 +1,73 @@
+"""
+Segment log benchmark
+Compares persisting one upload as a segment with rewriting the full snapshot
+
+Usage:
+    python benchmarks/bench_segment_log.py --sizes 10000 100000 --upload 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_vector_index import random_vectors
+from simple_pandaaiqa.index.flat import FlatIndex
+from simple_pandaaiqa.index.segments import SegmentLog
+from simple_pandaaiqa.index.storage import write_snapshot
+
+
+def make_records(start, count):
+    return [{"text": f"chunk {i} " + "lorem ipsum " * 60, "metadata": {"source": "bench.txt", "chunk_id": i}}
+            for i in range(start, start + count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segment appends against full snapshots")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--upload", type=int, default=50, help="chunks per simulated upload")
+    parser.add_argument("--segments", type=int, default=16, help="uploads replayed on restart")
+    parser.add_argument("--dim", type=int, default=384)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>10} {'snapshot ms':>12} {'segment ms':>11} {'replay ms':>10}")
+    for n in args.sizes:
+        index = FlatIndex(args.dim)
+        index.add(random_vectors(n, args.dim))
+        records = make_records(0, n)
+        upload = random_vectors(args.upload, args.dim, seed=1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            log = SegmentLog(os.path.join(tmp, "kb"))
+            log.compact(index.arrays(), records, {"dim": args.dim, "dtype": "float32"})
+
+            # what /api/save costs after every upload
+            index.add(upload)
+            records.extend(make_records(n, args.upload))
+            start = time.perf_counter()
+            write_snapshot(os.path.join(tmp, "full"), index.arrays(), records, {"dim": args.dim, "dtype": "float32"})
+            snapshot_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            for i in range(args.segments):
+                log.append(n + i * args.upload, upload, make_records(n + i * args.upload, args.upload))
+            segment_ms = (time.perf_counter() - start) * 1000 / args.segments
+
+            start = time.perf_counter()
+            restored = FlatIndex(args.dim)
+            arrays, restored_records, _ = log.open_base()
+            restored.load_arrays(arrays)
+            for vectors, segment_records in SegmentLog(log.directory).replay(len(restored_records)):
+                restored.add(vectors)
+                restored_records.extend(segment_records)
+            replay_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{n:>10} {snapshot_ms:>12.1f} {segment_ms:>11.1f} {replay_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
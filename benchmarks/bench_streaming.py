@@ -0,0 +1,54 @@
+"""
+Streaming answer benchmark
+Time to first token with Generator.generate_stream against the full wait of
+Generator.generate, using a local stub completions server
+
+Usage:
+    python benchmarks/bench_streaming.py --tokens 100 --token-delay 0.02
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_completions import start_stub_server
+from simple_pandaaiqa.generator import Generator
+
+CONTEXT = [{"text": "PandaAIQA answers questions from a local knowledge base.", "metadata": {"source": "bench"}}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streamed against blocking generation")
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds per generated token")
+    args = parser.parse_args()
+
+    tokens = [f" token{i}" for i in range(args.tokens)]
+    server, api_base = start_stub_server(args.token_delay, tokens)
+    generator = Generator(api_base=api_base)
+
+    start = time.perf_counter()
+    answer = generator.generate("What is PandaAIQA?", CONTEXT)
+    blocking_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first_token_s = None
+    pieces = []
+    for text in generator.generate_stream("What is PandaAIQA?", CONTEXT):
+        if first_token_s is None:
+            first_token_s = time.perf_counter() - start
+        pieces.append(text)
+    stream_s = time.perf_counter() - start
+    server.shutdown()
+
+    assert "".join(pieces) == answer, "streamed answer differs from the blocking one"
+    print(f"generate:        first text after {blocking_s * 1000:8.1f} ms")
+    print(f"generate_stream: first text after {first_token_s * 1000:8.1f} ms, complete after {stream_s * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
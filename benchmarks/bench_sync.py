@@ -0,0 +1,76 @@
+"""
+Directory sync benchmark
+Times a first sync of a generated tree of small text files, a re-sync of the
+unchanged tree (answered from the fingerprint manifest without reading any
+file), and a re-sync after a share of the files was modified, touched or
+deleted. Uses the hash embedding backend from bench_chunking, so the numbers
+exclude model inference.
+
+Usage:
+    python benchmarks/bench_sync.py --files 50000 --changed 0.01
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_chunking import make_embedder
+from simple_pandaaiqa.pdf_processor import PDFProcessor
+from simple_pandaaiqa.sync import DirectorySync
+from simple_pandaaiqa.text_processor import TextProcessor
+from simple_pandaaiqa.vector_store import VectorStore
+
+
+def timed_sync(directory_sync: DirectorySync, root: str, label: str) -> None:
+    start = time.perf_counter()
+    job = directory_sync.sync(root)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>18} {elapsed:>8.2f} {job.files_added:>7} {job.files_updated:>8} {job.files_deleted:>8} "
+          f"{job.files_unchanged:>10} {job.chunks_indexed:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark directory sync")
+    parser.add_argument("--files", type=int, default=50_000)
+    parser.add_argument("--per-dir", type=int, default=500, help="files per directory")
+    parser.add_argument("--changed", type=float, default=0.01, help="share of files modified, touched and deleted")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "corpus")
+        for i in range(args.files):
+            directory = os.path.join(root, f"dir{i // args.per_dir}")
+            if i % args.per_dir == 0:
+                os.makedirs(directory)
+            with open(os.path.join(directory, f"note{i}.txt"), "w") as f:
+                f.write(f"Note {i} about component {i % 997}. " * 8)
+
+        store = VectorStore(embedder=make_embedder(), persist_dir=os.path.join(tmp, "kb"))
+        directory_sync = DirectorySync(TextProcessor(), PDFProcessor(), store,
+                                       manifest_path=os.path.join(tmp, "kb", "sync_manifest.json"),
+                                       workers=args.workers)
+        print(f"{'sync':>18} {'s':>8} {'added':>7} {'updated':>8} {'deleted':>8} {'unchanged':>10} {'chunks':>8}")
+        timed_sync(directory_sync, root, "first")
+        timed_sync(directory_sync, root, "unchanged")
+
+        step = max(1, int(1 / args.changed)) if args.changed > 0 else args.files + 1
+        for i in range(0, args.files, step):
+            path = os.path.join(root, f"dir{i // args.per_dir}", f"note{i}.txt")
+            if i % 3 == 0:
+                with open(path, "a") as f:
+                    f.write("An added sentence. ")
+            elif i % 3 == 1:
+                os.utime(path)
+            else:
+                os.remove(path)
+        timed_sync(directory_sync, root, "after changes")
+
+
+if __name__ == "__main__":
+    main()
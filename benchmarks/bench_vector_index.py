@@ -0,0 +1,92 @@
+"""
+Vector index benchmark
+Compares FlatIndex with llama_index's SimpleVectorStore query path
+
+Usage:
+    python benchmarks/bench_vector_index.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# make sure the package can be found
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_pandaaiqa.index.flat import FlatIndex, normalize_rows
+
+
+def random_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Random unit vectors, generated in blocks to keep peak memory low"""
+    rng = np.random.default_rng(seed)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        block = rng.standard_normal((min(100_000, n - start), dim), dtype=np.float32)
+        out[start:start + len(block)] = normalize_rows(block)
+    return out
+
+
+def time_queries(search, queries: np.ndarray) -> float:
+    """Mean milliseconds per query"""
+    start = time.perf_counter()
+    for query in queries:
+        search(query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def bench_flat(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> dict:
+    start = time.perf_counter()
+    index = FlatIndex(vectors.shape[1])
+    index.add(vectors)
+    build_s = time.perf_counter() - start
+    query_ms = time_queries(lambda q: index.search(q, top_k), queries)
+    return {"build_s": build_s, "query_ms": query_ms}
+
+
+def bench_llama_index(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> dict:
+    from llama_index.core.schema import TextNode
+    from llama_index.core.vector_stores import SimpleVectorStore
+    from llama_index.core.vector_stores.types import VectorStoreQuery
+
+    start = time.perf_counter()
+    store = SimpleVectorStore()
+    store.add([
+        TextNode(text=f"chunk {i}", id_=f"node_{i}", embedding=vector.tolist())
+        for i, vector in enumerate(vectors)
+    ])
+    build_s = time.perf_counter() - start
+
+    def search(query):
+        return store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=top_k))
+
+    query_ms = time_queries(search, queries)
+    return {"build_s": build_s, "query_ms": query_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector index backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--skip-llama-index", action="store_true",
+                        help="only run the native index")
+    args = parser.parse_args()
+
+    queries = random_vectors(args.queries, args.dim, seed=1)
+    print(f"{'backend':<12} {'chunks':>10} {'build s':>10} {'query ms':>10}")
+    for n in args.sizes:
+        vectors = random_vectors(n, args.dim)
+        backends = [("flat", bench_flat)]
+        if not args.skip_llama_index:
+            backends.append(("llama_index", bench_llama_index))
+        for name, bench in backends:
+            result = bench(vectors, queries, args.top_k)
+            print(f"{name:<12} {n:>10} {result['build_s']:>10.2f} {result['query_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Stub OpenAI-compatible completions server
+Serves /v1/models and /v1/completions (plain or streamed) with a fixed
+per-token delay, standing in for LM Studio in benchmarks and tests
+"""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    tokens = ["The", " answer", " is", " in", " the", " context", "."]
+    token_delay = 0.05
+    status = 200  # anything else answers /v1/completions with that error status
+    stats = {"connections": 0, "requests": 0}
+
+    def setup(self):
+        super().setup()
+        # headers and body are separate writes, don't let Nagle hold the body back
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stats["connections"] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.stats["requests"] += 1
+        if self.path == "/v1/models":
+            self._send_json({"data": [{"id": "stub"}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        self.stats["requests"] += 1
+        if self.path != "/v1/completions":
+            self.send_error(404)
+            return
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.status != 200:
+            self.send_error(self.status, "stub failure")
+            return
+        if not payload.get("stream"):
+            time.sleep(self.token_delay * len(self.tokens))
+            self._send_json({"choices": [{"text": "".join(self.tokens)}]})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in self.tokens:
+            time.sleep(self.token_delay)
+            self._write_chunk(f"data: {json.dumps({'choices': [{'text': token}]})}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_stub_server(token_delay=0.05, tokens=None, status=200):
+    """
+    Start the stub server on a free local port in a daemon thread
+
+    Args:
+        token_delay: Seconds before each token
+        tokens: Completion tokens, in order
+        status: HTTP status of /v1/completions responses, errors carry no completion
+
+    Returns:
+        Tuple of (server, api_base URL); server.stats counts connections and requests
+    """
+    handler = type("Handler", (StubCompletionsHandler,), {
+        "token_delay": token_delay,
+        "tokens": tokens or StubCompletionsHandler.tokens,
+        "status": status,
+        "stats": {"connections": 0, "requests": 0},
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.stats = handler.stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
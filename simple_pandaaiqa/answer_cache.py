@@ -0,0 +1,209 @@
+"""
+Answer cache for PandaAIQA
+Reuses generated answers for repeated (or, optionally, near-duplicate) questions
+until the knowledge base changes
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simple_pandaaiqa.config import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_MAX_BYTES,
+    ANSWER_CACHE_TTL,
+    ANSWER_CACHE_SIMILARITY,
+)
+from simple_pandaaiqa.index.metadata import filters_key
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Lower-case and collapse whitespace, so trivially different spellings share an entry"""
+    return " ".join(text.lower().split())
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU cache of answers and their context
+
+    Entries are keyed on the normalized query, top_k and search filters. They are tied to a
+    knowledge-base version: the first lookup or store with a newer version
+    drops every entry, since any answer may depend on what changed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        max_bytes: int = ANSWER_CACHE_MAX_BYTES,
+        ttl: float = ANSWER_CACHE_TTL,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+    ):
+        """
+        Initialize answer cache
+
+        Args:
+            max_entries: Maximum number of cached answers
+            max_bytes: Approximate memory bound for answers, context and query vectors
+            ttl: Seconds an answer stays valid, 0 keeps it until evicted or invalidated
+            similarity: Cosine threshold for near-duplicate hits, 0 disables them
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries: "OrderedDict[Tuple[str, int, str], Dict[str, Any]]" = OrderedDict()
+        self._version = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        logger.info(f"Initialized answer cache, max_entries={max_entries}, similarity={similarity or 'off'}")
+
+    def _sync_version(self, version: int) -> bool:
+        """Drop all entries when the knowledge base moved on, False if version is outdated"""
+        if version < self._version:
+            return False
+        if version > self._version:
+            if self._entries:
+                self._stats["invalidations"] += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+        return True
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl > 0 and time.monotonic() - entry["time"] > self.ttl
+
+    def _remove(self, key: Tuple[str, int, str]) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+
+    def get(self, query: str, top_k: int, version: int,
+            filters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up the answer to exactly this (normalized) query
+
+        With near-duplicate hits enabled, a miss is counted by the
+        get_similar() call that follows instead.
+
+        Args:
+            query: Query text
+            top_k: Number of context documents requested
+            version: Current knowledge-base version
+            filters: Metadata filters of the search
+
+        Returns:
+            Dictionary with "answer" and "context", or None on a miss
+        """
+        key = (normalize_query(query), top_k, filters_key(filters))
+        with self._lock:
+            if self._sync_version(version):
+                entry = self._entries.get(key)
+                if entry is not None and self._expired(entry):
+                    self._remove(key)
+                    entry = None
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return {"answer": entry["answer"], "context": entry["context"]}
+            if self.similarity <= 0:
+                self._stats["misses"] += 1
+            return None
+
+    def get_similar(self, query_vector: np.ndarray, top_k: int, version: int,
+                    filters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look up the answer to the most similar cached query, checked after get() missed
+
+        Args:
+            query_vector: Normalized query embedding
+            top_k: Number of context documents requested
+            version: Current knowledge-base version
+            filters: Metadata filters of the search
+
+        Returns:
+            Dictionary with "answer" and "context", or None on a miss
+        """
+        scope = (top_k, filters_key(filters))
+        with self._lock:
+            best_key, best_score = None, self.similarity
+            if self.similarity > 0 and self._sync_version(version):
+                candidates = [key for key, entry in self._entries.items()
+                              if key[1:] == scope and entry["vector"] is not None and not self._expired(entry)]
+                if candidates:
+                    scores = np.stack([self._entries[key]["vector"] for key in candidates]) @ query_vector
+                    best = int(np.argmax(scores))
+                    if scores[best] >= best_score:
+                        best_key, best_score = candidates[best], float(scores[best])
+            if best_key is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self._stats["similar_hits"] += 1
+            entry = self._entries[best_key]
+            return {"answer": entry["answer"], "context": entry["context"]}
+
+    def put(self, query: str, top_k: int, version: int, answer: str, context: List[Dict[str, Any]],
+            query_vector: Optional[np.ndarray] = None, filters: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Store an answer
+
+        Args:
+            query: Query text
+            top_k: Number of context documents requested
+            version: Knowledge-base version the answer was generated against
+            answer: Generated answer
+            context: Retrieved context documents
+            query_vector: Query embedding, needed for near-duplicate hits
+            filters: Metadata filters of the search
+        """
+        key = (normalize_query(query), top_k, filters_key(filters))
+        vector = None if query_vector is None else np.asarray(query_vector, dtype=np.float32)
+        size = (len(key[0]) + len(key[2]) + len(answer.encode("utf-8"))
+                + len(json.dumps(context, ensure_ascii=False).encode("utf-8"))
+                + (vector.nbytes if vector is not None else 0))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if not self._sync_version(version):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "answer": answer,
+                "context": context,
+                "vector": vector,
+                "size": size,
+                "time": time.monotonic(),
+            }
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Drop all entries, keeping the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["similar_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": (self._stats["hits"] + self._stats["similar_hits"]) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "version": self._version,
+            }
@@ -4,8 +4,14 @@ Provides Web interface for querying and file uploads
 """
 
 import os
+import asyncio
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, nullcontext
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from fastapi import (
     FastAPI,
     UploadFile,
@@ -16,7 +22,7 @@ from fastapi import (
     BackgroundTasks,
 )
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 
@@ -26,9 +32,24 @@ from simple_pandaaiqa.pdf_processor import PDFProcessor
 # from simple_pandaaiqa.video_processor import VideoProcessor
 from simple_pandaaiqa.embedder import Embedder
 from simple_pandaaiqa.vector_store import VectorStore
-from simple_pandaaiqa.generator import Generator
-from simple_pandaaiqa.utils.helpers import extract_file_extension
-from simple_pandaaiqa.config import MAX_TEXT_LENGTH
+from simple_pandaaiqa.generator import GenerationError, Generator
+from simple_pandaaiqa.answer_cache import AnswerCache, normalize_query
+from simple_pandaaiqa.archive import archive_format
+from simple_pandaaiqa.index.metadata import filters_key, normalize_filters
+from simple_pandaaiqa.ingest import IngestionQueue
+from simple_pandaaiqa.single_flight import Flight, SingleFlight
+from simple_pandaaiqa.sync import DirectorySync
+from simple_pandaaiqa.utils.helpers import extract_file_extension, run_in_executor, save_upload
+from simple_pandaaiqa.config import (
+    MAX_UPLOAD_BYTES,
+    DEFAULT_STORAGE_DIR,
+    KB_PERSISTENCE_ENABLED,
+    SEARCH_WORKERS,
+    INGEST_WORKERS,
+    ANSWER_CACHE_ENABLED,
+    BATCH_QUERY_MAX_SIZE,
+    BATCH_QUERY_CONCURRENCY,
+)
 
 # Setup logging
 logging.basicConfig(
@@ -41,6 +62,11 @@ logger = logging.getLogger(__name__)
 class QueryRequest(BaseModel):
     text: str = Field(..., description="Query text")
     top_k: int = Field(3, description="Maximum number of results to return")
+    filters: Optional[Dict[str, Any]] = Field(
+        None,
+        description='Only search chunks whose metadata matches, e.g. {"source": "handbook.pdf"}; '
+        "a field may list several accepted values, all fields must match",
+    )
 
 
 class QueryResponse(BaseModel):
@@ -49,6 +75,29 @@ class QueryResponse(BaseModel):
     context: List[Dict[str, Any]] = Field(..., description="Relevant context")
 
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(..., description="Query texts")
+    top_k: int = Field(3, description="Maximum number of results to return per query")
+    filters: Optional[Dict[str, Any]] = Field(None, description="Metadata filters applied to every query")
+    stream: bool = Field(False, description="Stream each result as a server-sent event once it is answered")
+
+
+class BatchQueryResult(BaseModel):
+    index: int = Field(..., description="Position of the query in the request")
+    query: str = Field(..., description="Original query")
+    answer: str = Field(..., description="Generated answer")
+    context: List[Dict[str, Any]] = Field(..., description="Relevant context")
+    cached: bool = Field(..., description="Whether the answer came from the answer cache")
+    generation_ms: float = Field(..., description="Time spent generating this answer, including waiting for a slot")
+    total_ms: float = Field(..., description="Time from the start of the batch until this answer was ready")
+
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryResult] = Field(..., description="One result per query, in request order")
+    retrieval_ms: float = Field(..., description="Time to embed and search all queries together")
+    total_ms: float = Field(..., description="Time to answer the whole batch")
+
+
 class StatusResponse(BaseModel):
     status: str = Field(..., description="System status")
     document_count: int = Field(
@@ -62,10 +111,93 @@ class LMStudioStatusResponse(BaseModel):
     api_base: str = Field(..., description="LM Studio API基础URL")
 
 
+class CacheStatsResponse(BaseModel):
+    answer_cache: Optional[Dict[str, Any]] = Field(
+        None, description="Answer cache counters, null when the cache is disabled"
+    )
+    embedding_cache: Optional[Dict[str, Any]] = Field(
+        None, description="Query embedding cache counters, null when the cache is disabled"
+    )
+    embedding_store: Optional[Dict[str, Any]] = Field(
+        None, description="Persistent document embedding cache counters, null when disabled"
+    )
+    embedding_batches: Optional[Dict[str, Any]] = Field(
+        None, description="Query embedding micro-batch counters, null when micro-batching is disabled"
+    )
+    single_flight: Dict[str, Any] = Field(
+        ..., description="Queries that started an answer and queries that joined an identical one in flight"
+    )
+
+
+class ArchiveMemberResult(BaseModel):
+    name: str = Field(..., description="Path of the file inside the archive")
+    status: str = Field(..., description="parsing, parsed, indexed, skipped (unsupported type) or failed")
+    chunks: int = Field(..., description="Chunks the file produced")
+    error: Optional[str] = Field(None, description="Why the file was skipped or failed")
+
+
+class IngestJobResponse(BaseModel):
+    job_id: str = Field(..., description="Ingestion job id")
+    filename: str = Field(..., description="Uploaded file name")
+    status: str = Field(..., description="queued, running, completed, failed or cancelled")
+    message: str = Field(..., description="Human-readable progress message")
+    chunks_total: Optional[int] = Field(None, description="Chunks in the file, null until parsed")
+    chunks_parsed: int = Field(..., description="Chunks handed to the embed stage")
+    chunks_indexed: int = Field(..., description="Chunks embedded and searchable")
+    embeddings_reused: int = Field(..., description="Chunks whose embedding came from the embedding store")
+    replace: bool = Field(..., description="Whether the job replaces the previous chunks of its source")
+    chunks_replaced: int = Field(..., description="Previous chunks of the source deleted once the job completed")
+    members: Optional[List[ArchiveMemberResult]] = Field(
+        None, description="Per-file results of an archive upload, in archive order; null for single files"
+    )
+    members_per_second: float = Field(..., description="Archive files read and chunked per second")
+    throughput: float = Field(..., description="Chunks indexed per second")
+    errors: List[str] = Field(..., description="Errors that stopped the job")
+    created_at: float = Field(..., description="Submission time (unix seconds)")
+    started_at: Optional[float] = Field(None, description="Start time (unix seconds)")
+    finished_at: Optional[float] = Field(None, description="Finish time (unix seconds)")
+
+
 class MessageResponse(BaseModel):
     message: str = Field(..., description="Response message")
 
 
+class SourceResponse(BaseModel):
+    source: Any = Field(..., description="Source metadata of the chunks, the file name for uploads")
+    chunks: int = Field(..., description="Searchable chunks of the source")
+
+
+class DeleteSourceResponse(BaseModel):
+    source: str = Field(..., description="Deleted source")
+    chunks_deleted: int = Field(..., description="Chunks deleted")
+    message: str = Field(..., description="Response message")
+
+
+class SyncRequest(BaseModel):
+    directory: str = Field(..., description="Directory tree to sync into the knowledge base")
+
+
+class SyncJobResponse(BaseModel):
+    job_id: str = Field(..., description="Sync job id")
+    directory: str = Field(..., description="Absolute path of the synced directory")
+    status: str = Field(..., description="queued, running, completed, failed or cancelled")
+    message: str = Field(..., description="Human-readable progress message")
+    files_scanned: int = Field(..., description="Supported files found so far")
+    files_unchanged: int = Field(..., description="Files skipped because their content did not change")
+    files_added: int = Field(..., description="New files indexed")
+    files_updated: int = Field(..., description="Changed files whose chunks were replaced")
+    files_deleted: int = Field(..., description="Files gone from the directory whose chunks were deleted")
+    files_failed: int = Field(..., description="Files that could not be read, chunked or indexed")
+    chunks_indexed: int = Field(..., description="Chunks embedded and searchable")
+    chunks_deleted: int = Field(..., description="Previous chunks of updated and deleted files")
+    embeddings_reused: int = Field(..., description="Chunks whose embedding came from the embedding store")
+    throughput: float = Field(..., description="Files scanned per second")
+    errors: List[str] = Field(..., description="Per-file errors, the first ones only")
+    created_at: float = Field(..., description="Submission time (unix seconds)")
+    started_at: Optional[float] = Field(None, description="Start time (unix seconds)")
+    finished_at: Optional[float] = Field(None, description="Finish time (unix seconds)")
+
+
 class SaveRequest(BaseModel):
     directory: str = Field(..., description="Directory to save the knowledge base")
 
@@ -74,15 +206,35 @@ class LoadRequest(BaseModel):
     directory: str = Field(..., description="Directory to load the knowledge base from")
 
 
+# Bounded pools for blocking work, so handlers never block the event loop
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+ingest_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    ingestion_queue.shutdown(wait=False)
+    directory_sync.shutdown(wait=False)
+    await generator.aclose()
+
+
 # Create FastAPI application
-app = FastAPI(title="PandaAIQA", description="本地知识问答系统")
+app = FastAPI(title="PandaAIQA", description="本地知识问答系统", lifespan=lifespan)
 
 # Initialize components
 text_processor = TextProcessor()
 pdf_processor = PDFProcessor()
 embedder = Embedder()
-vector_store = VectorStore(embedder=embedder)
+vector_store = VectorStore(
+    embedder=embedder,
+    persist_dir=DEFAULT_STORAGE_DIR if KB_PERSISTENCE_ENABLED else None,
+)
 generator = Generator()
+answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
+single_flight = SingleFlight()
+ingestion_queue = IngestionQueue(text_processor, pdf_processor, vector_store)
+directory_sync = DirectorySync(text_processor, pdf_processor, vector_store)
 
 # Create routers
 main_router = APIRouter(prefix="/api")
@@ -105,117 +257,317 @@ def get_components():
         "vector_store": vector_store,
         "generator": generator,
         "pdf_processor": pdf_processor,
+        "answer_cache": answer_cache,
+        "single_flight": single_flight,
+        "ingestion_queue": ingestion_queue,
+        "directory_sync": directory_sync,
         # "video_processor": video_processor,
     }
 
 
+async def _lookup_answer(
+    request: QueryRequest, components: Dict[str, Any]
+) -> Tuple[Optional[Dict[str, Any]], Any, int]:
+    """check the answer cache, embedding the query only for near-duplicate lookups
+
+    Returns (cached answer and context or None, query vector or None, knowledge-base version)
+    """
+    cache = components["answer_cache"]
+    version = components["vector_store"].version
+    if cache is None:
+        return None, None, version
+
+    cached = cache.get(request.text, request.top_k, version, request.filters)
+    query_vector = None
+    if cached is None and cache.similarity > 0:
+        query_vector = await run_in_executor(
+            search_executor, components["vector_store"].embedder.embed_text, request.text
+        )
+        cached = cache.get_similar(query_vector, request.top_k, version, request.filters)
+    return cached, query_vector, version
+
+
+def _store_answer(
+    request: QueryRequest,
+    components: Dict[str, Any],
+    version: int,
+    answer: str,
+    results: List[Dict[str, Any]],
+    query_vector: Any,
+) -> None:
+    """cache a generated answer"""
+    cache = components["answer_cache"]
+    if cache is not None and results:
+        cache.put(request.text, request.top_k, version, answer, results, query_vector, request.filters)
+
+
+async def _answer_flight(
+    flight: Flight,
+    request: QueryRequest,
+    components: Dict[str, Any],
+    version: int,
+    query_vector: Any,
+    results: Optional[List[Dict[str, Any]]] = None,
+    slots: Optional[asyncio.Semaphore] = None,
+) -> None:
+    """retrieve and generate one answer, publishing ("context", results), then ("token", text) events
+
+    Generation always streams, so requests that join a streaming query's
+    flight receive its tokens as they are produced.
+    """
+    if results is None:
+        results = await run_in_executor(
+            search_executor,
+            components["vector_store"].search,
+            request.text,
+            top_k=request.top_k,
+            query_vector=query_vector,
+            filters=request.filters,
+        )
+    flight.publish(("context", results))
+    if not results:
+        logger.warning("No documents found related to the query")
+        flight.publish(("token", "No relevant information found."))
+        return
+
+    pieces = []
+    failed = False
+    async with slots or nullcontext():
+        async for text in components["generator"].agenerate_stream(request.text, results):
+            failed = failed or isinstance(text, GenerationError)
+            pieces.append(text)
+            flight.publish(("token", text))
+    if failed:
+        logger.warning("Answer generation failed, not caching the answer")
+        return
+    logger.info("Generated answer for the query")
+    _store_answer(request, components, version, "".join(pieces).strip(), results, query_vector)
+
+
+def _join_answer(
+    request: QueryRequest,
+    components: Dict[str, Any],
+    version: int,
+    query_vector: Any,
+    results: Optional[List[Dict[str, Any]]] = None,
+    slots: Optional[asyncio.Semaphore] = None,
+) -> Flight:
+    """attach to the in-flight answer for the same query, top_k, filters and knowledge-base version, or start it"""
+    key = (normalize_query(request.text), request.top_k, filters_key(request.filters), version)
+    flight, started = components["single_flight"].join(
+        key,
+        lambda flight: _answer_flight(flight, request, components, version, query_vector, results, slots),
+    )
+    if not started:
+        logger.info("Joined an identical query that is already being answered")
+    return flight
+
+
+def _check_filters(filters: Optional[Dict[str, Any]]) -> None:
+    """reject malformed metadata filters before any work is done"""
+    try:
+        normalize_filters(filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _collect_answer(flight: Flight) -> Tuple[List[Dict[str, Any]], str]:
+    """wait for a flight to finish, returns (context, answer)"""
+    results, pieces = [], []
+    async for event, data in flight.subscribe():
+        if event == "context":
+            results = data
+        else:
+            pieces.append(data)
+    return results, "".join(pieces).strip()
+
+
 @app.get("/")
 async def root():
     """Root path endpoint, returns the frontend page"""
     return FileResponse("simple_pandaaiqa/static/index.html")
 
 
-@main_router.post("/upload", response_model=MessageResponse)
-async def upload_file(
-    file: UploadFile = File(...), components: Dict[str, Any] = Depends(get_components)
+async def _submit_upload(
+    file: UploadFile,
+    components: Dict[str, Any],
+    source: Optional[str] = None,
+    replace: bool = False,
+    archive: bool = False,
 ):
-    """Upload a file and process its content"""
+    """spool an upload to disk and queue it for ingestion, returns the job or an error response"""
     try:
         logger.info(f"Uploading file: {file.filename}")
 
-        # check file type
-        ext = extract_file_extension(file.filename)
-        if ext not in ["txt", "md", "csv", "pdf", "mp4"]:
-            logger.warning(f"Unsupported file type: {ext}")
+        # check file type, archives are queued under their format
+        ext = archive_format(file.filename) if archive else extract_file_extension(file.filename)
+        if archive and ext is None:
+            logger.warning(f"Unsupported archive type: {file.filename}")
             return JSONResponse(
                 status_code=400,
                 content={
-                    "message": f"Unsupported file type: {ext}. Only txt, md, and csv files are supported"
+                    "message": f"Unsupported archive type: {file.filename}. "
+                    "Only zip, tar, tar.gz, tgz, tar.bz2 and tar.xz archives are supported"
                 },
             )
-
-        # read file content
-        content = await file.read()
-
-        # check file size
-        if (
-            len(content) > MAX_TEXT_LENGTH * 2
-        ):  # allow file to be slightly larger than pure text
-            logger.warning(f"File too large: {len(content)} bytes")
+        if not archive and ext not in ["txt", "md", "csv", "pdf", "mp4"]:
+            logger.warning(f"Unsupported file type: {ext}")
             return JSONResponse(
                 status_code=400,
                 content={
-                    "message": f"File too large. Maximum allowed size is {MAX_TEXT_LENGTH * 2} bytes"
+                    "message": f"Unsupported file type: {ext}. Only txt, md, and csv files are supported"
                 },
             )
-
-        documents = []
-        metadata = {"source": file.filename, "type": ext}
-
-        if ext in ["txt", "md", "csv"]:
-            try:
-                text = content.decode("utf-8")
-            except UnicodeDecodeError:
-                try:
-                    text = content.decode("latin-1")
-                    logger.info("Using latin-1 encoding to decode file")
-                except:
-                    logger.error("Failed to decode file content")
-                    return JSONResponse(
-                        status_code=400,
-                        content={
-                            "message": "Failed to decode file content. Ensure the file is a valid text file."
-                        },
-                    )
-            documents = components["text_processor"].process_text(text, metadata)
-        elif ext == "pdf":
-            documents = components["pdf_processor"].process_pdf(content, metadata)
-        # else:  # video files
-        # text = components["video_processor"].extract_text_from_video(content)
-
-        # # decode text
-        # try:
-        #     text = content.decode("utf-8")
-        # except UnicodeDecodeError:
-        #     # try other encodings
-        #     try:
-        #         text = content.decode("latin-1")
-        #         logger.info("Using latin-1 encoding to decode file")
-        #     except:
-        #         logger.error("Failed to decode file content")
-        #         return JSONResponse(
-        #             status_code=400,
-        #             content={
-        #                 "message": "Failed to decode file content. Please ensure the file is a valid text file"
-        #             },
-        #         )
-
-        # # process text
-        # # metadata = {"source": file.filename, "type": "file"}
-        # documents = components["text_processor"].process_text(text, metadata)
-
-        if not documents:
-            logger.warning("No documents generated from file")
+        if ext == "mp4":
             return JSONResponse(
                 status_code=400,
-                content={"message": "No documents generated from uploaded file"},
+                content={"message": "Video files are not supported yet"},
             )
 
-        # extract text and metadata
-        texts = [doc["text"] for doc in documents]
-        metadatas = [doc["metadata"] for doc in documents]
+        # spool the upload to disk in blocks, so its size does not matter for memory
+        try:
+            path, size = await run_in_executor(ingest_executor, save_upload, file.file, MAX_UPLOAD_BYTES)
+        except ValueError as e:
+            logger.warning(f"Rejected upload {file.filename}: {e}")
+            return JSONResponse(status_code=400, content={"message": str(e)})
+        logger.info(f"Spooled {size} bytes from {file.filename}")
+
+        metadata = {"source": source, "type": ext} if source is not None else None
+        try:
+            job = components["ingestion_queue"].submit(file.filename, ext, path, metadata, replace=replace)
+        except queue.Full:
+            os.remove(path)
+            logger.warning("Ingestion queue is full")
+            return JSONResponse(
+                status_code=503,
+                content={"message": "Too many uploads in progress, please retry later"},
+                headers={"Retry-After": "5"},
+            )
+        return job.to_dict()
 
-        # add to vector store
-        components["vector_store"].add_texts(texts, metadatas)
-        logger.info(f"Successfully processed {len(documents)} documents from file")
+    except Exception as e:
+        logger.error(f"Error processing file: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {
-            "message": f"Successfully processed {len(documents)} documents from {file.filename}"
-        }
 
+@main_router.post("/upload", response_model=IngestJobResponse, status_code=202)
+async def upload_file(
+    file: UploadFile = File(...), components: Dict[str, Any] = Depends(get_components)
+):
+    """Upload a file and queue it for processing, progress is reported under /api/jobs"""
+    return await _submit_upload(file, components)
+
+
+@main_router.post("/upload/archive", response_model=IngestJobResponse, status_code=202)
+async def upload_archive(
+    file: UploadFile = File(...), replace: bool = False, components: Dict[str, Any] = Depends(get_components)
+):
+    """Upload a zip or tar archive and queue its txt/md/csv/pdf files for processing
+
+    The files are read from the archive without extracting it, chunked in
+    parallel and indexed together once all of them are chunked; per-file
+    results are reported under /api/jobs. Each file's source is the archive
+    name and its path inside the archive, e.g. "docs.zip/guide/setup.md".
+    With replace=true, the chunks of files from an earlier upload of the
+    same archive are deleted once the new ones are indexed.
+    """
+    return await _submit_upload(file, components, replace=replace, archive=True)
+
+
+@main_router.get("/sources", response_model=List[SourceResponse])
+async def list_sources(components: Dict[str, Any] = Depends(get_components)):
+    """List the sources in the knowledge base with their chunk counts"""
+    counts = await run_in_executor(ingest_executor, components["vector_store"].sources)
+    return [{"source": source, "chunks": count} for source, count in counts.items()]
+
+
+@main_router.put("/sources/{source:path}", response_model=IngestJobResponse, status_code=202)
+async def replace_source(
+    source: str, file: UploadFile = File(...), components: Dict[str, Any] = Depends(get_components)
+):
+    """Upload a new version of a source, its previous chunks are deleted once the new ones are indexed
+
+    Until then searches keep finding the previous version; if the job fails
+    or is cancelled, the chunks it indexed are deleted instead. A source that
+    does not exist yet is simply added.
+    """
+    return await _submit_upload(file, components, source=source, replace=True)
+
+
+@main_router.delete("/sources/{source:path}", response_model=DeleteSourceResponse)
+async def delete_source(source: str, components: Dict[str, Any] = Depends(get_components)):
+    """Delete every chunk of a source, without re-embedding the rest of the knowledge base"""
+    try:
+        deleted = await run_in_executor(ingest_executor, components["vector_store"].delete_source, source)
     except Exception as e:
-        logger.error(f"Error processing file: {e}", exc_info=True)
+        logger.error(f"Error deleting source {source}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Unknown source: {source}")
+    return {"source": source, "chunks_deleted": deleted, "message": f"Deleted {deleted} chunks of {source}"}
+
+
+@main_router.get("/jobs", response_model=List[IngestJobResponse])
+async def list_jobs(components: Dict[str, Any] = Depends(get_components)):
+    """List queued, running and recently finished ingestion jobs"""
+    return [job.to_dict() for job in components["ingestion_queue"].list()]
+
+
+@main_router.get("/jobs/{job_id}", response_model=IngestJobResponse)
+async def get_job(job_id: str, components: Dict[str, Any] = Depends(get_components)):
+    """Get the progress of an ingestion job"""
+    job = components["ingestion_queue"].get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+
+@main_router.delete("/jobs/{job_id}", response_model=IngestJobResponse)
+async def cancel_job(job_id: str, components: Dict[str, Any] = Depends(get_components)):
+    """Cancel an ingestion job, chunks indexed so far are kept"""
+    job = components["ingestion_queue"].cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
+
+
+@main_router.post("/sync", response_model=SyncJobResponse, status_code=202)
+async def sync_directory(request: SyncRequest, components: Dict[str, Any] = Depends(get_components)):
+    """Sync a directory tree: index new and changed files, delete the chunks of removed ones
+
+    Syncs run one at a time in the background, progress is reported under
+    /api/sync/{job_id}. Unchanged files are recognized by the fingerprint
+    manifest without being read.
+    """
+    try:
+        job = components["directory_sync"].submit(request.directory)
+    except ValueError as e:
+        return JSONResponse(status_code=404, content={"message": str(e)})
+    return job.to_dict()
+
+
+@main_router.get("/sync", response_model=List[SyncJobResponse])
+async def list_syncs(components: Dict[str, Any] = Depends(get_components)):
+    """List queued, running and recently finished directory syncs"""
+    return [job.to_dict() for job in components["directory_sync"].list()]
+
+
+@main_router.get("/sync/{job_id}", response_model=SyncJobResponse)
+async def get_sync(job_id: str, components: Dict[str, Any] = Depends(get_components)):
+    """Get the progress of a directory sync"""
+    job = components["directory_sync"].get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sync job: {job_id}")
+    return job.to_dict()
+
+
+@main_router.delete("/sync/{job_id}", response_model=SyncJobResponse)
+async def cancel_sync(job_id: str, components: Dict[str, Any] = Depends(get_components)):
+    """Cancel a directory sync, files indexed so far are kept"""
+    job = components["directory_sync"].cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sync job: {job_id}")
+    return job.to_dict()
 
 
 @main_router.post("/query", response_model=QueryResponse)
@@ -223,36 +575,197 @@ async def query(
     request: QueryRequest, components: Dict[str, Any] = Depends(get_components)
 ):
     """process query and return answer"""
+    _check_filters(request.filters)
     try:
         logger.info(f"Processing query: {request.text}")
 
-        # search related documents
-        results = components["vector_store"].search(request.text, top_k=request.top_k)
+        cached, query_vector, version = await _lookup_answer(request, components)
+        if cached is not None:
+            logger.info("Answered query from the answer cache")
+            return {"query": request.text, **cached}
 
-        if not results:
-            logger.warning("No documents found related to the query")
-            return {
-                "query": request.text,
-                "answer": "No relevant information found.",
-                "context": [],
-            }
+        # identical concurrent queries share one retrieval and generation
+        flight = _join_answer(request, components, version, query_vector)
+        results, answer = await _collect_answer(flight)
+        return {"query": request.text, "answer": answer, "context": results}
+
+    except Exception as e:
+        logger.error(f"Error processing query: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # generate answer
-        answer = components["generator"].generate(request.text, results)
-        logger.info("Generated answer for the query")
 
-        return {"query": request.text, "answer": answer, "context": results}
+def _retrieve_batch(
+    request: BatchQueryRequest, components: Dict[str, Any], version: int
+) -> Tuple[List[Optional[Dict[str, Any]]], List[Optional[List[Dict[str, Any]]]], Dict[int, Any]]:
+    """answer-cache lookups, one batched embedding pass and one batched search for all queries of a batch
+
+    Returns (cached answer and context or None, search results or None, query vector by position)
+    """
+    cache = components["answer_cache"]
+    vector_store = components["vector_store"]
+    cached = [
+        cache.get(text, request.top_k, version, request.filters) if cache is not None else None
+        for text in request.queries
+    ]
+    pending = [i for i, hit in enumerate(cached) if hit is None]
+    vectors = {}
+    if pending:
+        matrix = vector_store.embedder.embed_queries([request.queries[i] for i in pending])
+        vectors = {i: matrix[row] for row, i in enumerate(pending)}
+        if cache is not None and cache.similarity > 0:
+            for i in pending:
+                cached[i] = cache.get_similar(vectors[i], request.top_k, version, request.filters)
+            rows = [row for row, i in enumerate(pending) if cached[i] is None]
+            pending, matrix = [pending[row] for row in rows], matrix[rows]
+
+    contexts: List[Optional[List[Dict[str, Any]]]] = [None] * len(request.queries)
+    if pending:
+        found = vector_store.search_batch(
+            [request.queries[i] for i in pending], top_k=request.top_k, query_vectors=matrix, filters=request.filters
+        )
+        for i, results in zip(pending, found):
+            contexts[i] = results
+    return cached, contexts, vectors
+
+
+@main_router.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch(
+    request: BatchQueryRequest, components: Dict[str, Any] = Depends(get_components)
+):
+    """process many queries with one batched retrieval and bounded concurrent generation
+
+    All queries are embedded together and scored against the index as one
+    matrix product, then up to BATCH_QUERY_CONCURRENCY answers are generated
+    at a time. With "stream": true the response is server-sent events instead:
+    a "result" event per query in completion order (carrying its index), then
+    "done" with the batch timings.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if len(request.queries) > BATCH_QUERY_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries: {len(request.queries)}, at most {BATCH_QUERY_MAX_SIZE} per batch",
+        )
+    _check_filters(request.filters)
 
+    try:
+        logger.info(f"Processing batch of {len(request.queries)} queries")
+        start = time.perf_counter()
+        version = components["vector_store"].version
+        cached, contexts, vectors = await run_in_executor(
+            search_executor, _retrieve_batch, request, components, version
+        )
+        retrieval_ms = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        logger.error(f"Error processing batch query: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+    generator = components["generator"]
+    slots = asyncio.Semaphore(max(1, min(BATCH_QUERY_CONCURRENCY, generator.pool_size)))
+
+    async def answer(i: int) -> Dict[str, Any]:
+        text = request.queries[i]
+        generation_start = time.perf_counter()
+        if cached[i] is not None:
+            result = {**cached[i], "cached": True}
+        else:
+            # repeated queries in the batch, or ones other requests are answering, share one generation
+            flight = _join_answer(QueryRequest(text=text, top_k=request.top_k, filters=request.filters), components,
+                                  version, vectors.get(i), results=contexts[i], slots=slots)
+            context, answer_text = await _collect_answer(flight)
+            result = {"answer": answer_text, "context": context, "cached": False}
+        now = time.perf_counter()
+        return {
+            "index": i,
+            "query": text,
+            **result,
+            "generation_ms": (now - generation_start) * 1000,
+            "total_ms": (now - start) * 1000,
+        }
+
+    if not request.stream:
+        results = await asyncio.gather(*(answer(i) for i in range(len(request.queries))))
+        total_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Answered batch of {len(results)} queries in {total_ms:.0f} ms")
+        return {"results": results, "retrieval_ms": retrieval_ms, "total_ms": total_ms}
+
+    async def events() -> AsyncIterator[str]:
+        tasks = [asyncio.ensure_future(answer(i)) for i in range(len(request.queries))]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield _sse_event("result", await task)
+            total_ms = (time.perf_counter() - start) * 1000
+            logger.info(f"Streamed batch of {len(tasks)} queries in {total_ms:.0f} ms")
+            yield _sse_event("done", {"retrieval_ms": retrieval_ms, "total_ms": total_ms})
+        finally:
+            # the client went away, stop generating answers nobody reads
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@main_router.post("/query/stream")
+async def query_stream(
+    request: QueryRequest, components: Dict[str, Any] = Depends(get_components)
+):
+    """process query and stream the answer as server-sent events
+
+    Events, in order: "context" (the retrieved documents), "token" ({"text": ...})
+    for each piece of the answer, then "done".
+    """
+    _check_filters(request.filters)
+    try:
+        logger.info(f"Processing streaming query: {request.text}")
+
+        cached, query_vector, version = await _lookup_answer(request, components)
+        subscription = None
+        if cached is not None:
+            results = cached["context"]
+        else:
+            # identical concurrent queries share one retrieval and token stream
+            subscription = _join_answer(request, components, version, query_vector).subscribe()
+            _, results = await subscription.__anext__()
     except Exception as e:
         logger.error(f"Error processing query: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def events() -> AsyncIterator[str]:
+        yield _sse_event("context", results)
+        if subscription is None:
+            logger.info("Answered query from the answer cache")
+            yield _sse_event("token", {"text": cached["answer"]})
+        else:
+            try:
+                async for _, text in subscription:
+                    yield _sse_event("token", {"text": text})
+            finally:
+                await subscription.aclose()
+            logger.info("Streamed answer for the query")
+        yield _sse_event("done", {})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @main_router.get("/status", response_model=StatusResponse)
 async def status(components: Dict[str, Any] = Depends(get_components)):
     """get system status"""
     try:
-        doc_count = len(components["vector_store"].documents)
+        doc_count = components["vector_store"].document_count
         logger.info(f"Status request: {doc_count} documents in vector store")
         return {"status": "ready", "document_count": doc_count}
     except Exception as e:
@@ -260,11 +773,25 @@ async def status(components: Dict[str, Any] = Depends(get_components)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@main_router.get("/cache", response_model=CacheStatsResponse)
+async def cache_stats(components: Dict[str, Any] = Depends(get_components)):
+    """get cache hit/miss counters"""
+    cache = components["answer_cache"]
+    embedder = components["vector_store"].embedder
+    return {
+        "answer_cache": cache.stats() if cache is not None else None,
+        "embedding_cache": embedder.query_cache.stats() if embedder.query_cache.enabled else None,
+        "embedding_store": embedder.store.stats() if embedder.store is not None else None,
+        "embedding_batches": embedder.micro_batcher.stats() if embedder.micro_batcher.enabled else None,
+        "single_flight": components["single_flight"].stats(),
+    }
+
+
 @main_router.delete("/clear", response_model=MessageResponse)
 async def clear(components: Dict[str, Any] = Depends(get_components)):
     """clear all documents"""
     try:
-        components["vector_store"].clear()
+        await run_in_executor(ingest_executor, components["vector_store"].clear)
         logger.info("Vector store cleared")
         return {"message": "All documents have been cleared"}
     except Exception as e:
@@ -277,7 +804,7 @@ async def lm_studio_status(components: Dict[str, Any] = Depends(get_components))
     """check LM Studio connection status"""
     try:
         generator = components["generator"]
-        is_connected, message = generator.check_connection()
+        is_connected, message = await generator.aconnection_status()
         logger.info(f"LM Studio connection status check: {is_connected}, {message}")
 
         return {
@@ -297,12 +824,20 @@ async def save_knowledge_base(
     """Save the current knowledge base to disk"""
     try:
         logger.info(f"Saving knowledge base to {request.directory}")
+        if components["vector_store"].overlaps_persist_dir(request.directory):
+            return JSONResponse(
+                status_code=400,
+                content={"message": f"Cannot save to {request.directory}, it overlaps the live knowledge base "
+                         "directory; choose a directory outside it"},
+            )
 
         # Ensure directory exists
         os.makedirs(request.directory, exist_ok=True)
 
         # Save vector store
-        success = components["vector_store"].save_to_disk(request.directory)
+        success = await run_in_executor(
+            ingest_executor, components["vector_store"].save_to_disk, request.directory
+        )
 
         if success:
             return {
@@ -325,6 +860,12 @@ async def load_knowledge_base(
     """Load a knowledge base from disk"""
     try:
         logger.info(f"Loading knowledge base from {request.directory}")
+        if components["vector_store"].overlaps_persist_dir(request.directory):
+            return JSONResponse(
+                status_code=400,
+                content={"message": f"Cannot load from {request.directory}, it overlaps the live knowledge base "
+                         "directory; choose a directory outside it"},
+            )
 
         # Check if directory exists
         if not os.path.exists(request.directory):
@@ -334,10 +875,12 @@ async def load_knowledge_base(
             )
 
         # Load vector store
-        success = components["vector_store"].load_from_disk(request.directory)
+        success = await run_in_executor(
+            ingest_executor, components["vector_store"].load_from_disk, request.directory
+        )
 
         if success:
-            doc_count = len(components["vector_store"].documents)
+            doc_count = components["vector_store"].document_count
             return {
                 "message": f"Successfully loaded knowledge base with {doc_count} documents"
             }
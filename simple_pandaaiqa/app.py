@@ -13,7 +13,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # import config
 from simple_pandaaiqa.config import HOST, PORT, DEBUG
-from simple_pandaaiqa.api import app
+# uvicorn imports the app from its import string below; importing it here as well would
+# build every component again in each spawned worker process (e.g. PDF extraction)
 from simple_pandaaiqa.utils.helpers import ensure_dir
 
 # set up logging
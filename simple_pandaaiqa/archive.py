@@ -0,0 +1,116 @@
+"""
+Archive reading for PandaAIQA
+Streams the files of zip and tar archives (plain or gzip, bzip2 or xz
+compressed) without extracting them to disk
+"""
+
+import logging
+import posixpath
+import tarfile
+import zipfile
+from functools import partial
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ("zip", "tar")
+
+# file name suffix -> archive format, longest suffixes first
+ARCHIVE_SUFFIXES = (
+    (".tar.gz", "tar"),
+    (".tar.bz2", "tar"),
+    (".tar.xz", "tar"),
+    (".tgz", "tar"),
+    (".tbz2", "tar"),
+    (".txz", "tar"),
+    (".tar", "tar"),
+    (".zip", "zip"),
+)
+
+
+def archive_format(filename: str) -> Optional[str]:
+    """
+    Archive format of a file, by its name
+
+    Args:
+        filename: File name
+
+    Returns:
+        "zip" or "tar", or None if the name is not an archive name
+    """
+    name = filename.lower()
+    for suffix, fmt in ARCHIVE_SUFFIXES:
+        if name.endswith(suffix):
+            return fmt
+    return None
+
+
+def is_hidden(name: str) -> bool:
+    """Whether a member path is hidden or macOS metadata (dot files, __MACOSX)"""
+    return any((part.startswith(".") and part not in (".", "..")) or part == "__MACOSX" for part in name.split("/"))
+
+
+def member_name(name: str) -> str:
+    """Normalized path of a member inside its archive, e.g. ./docs//a.md -> docs/a.md"""
+    return posixpath.normpath(name).lstrip("/")
+
+
+def iter_members(path: str, fmt: str) -> Iterator[Tuple[str, Callable[[], BinaryIO]]]:
+    """
+    Regular files of an archive, in archive order
+
+    Each file is yielded with a function that opens it as a binary stream,
+    decompressing while it is read. Tar archives are read as a stream, so a
+    file has to be opened and read before the next one is requested.
+    Directories, links, hidden files and macOS metadata are skipped, and
+    paths are normalized with member_name.
+
+    Args:
+        path: Archive file path
+        fmt: "zip" or "tar", see archive_format
+
+    Yields:
+        Tuples of (normalized member path, open function)
+
+    Raises:
+        ValueError: If the format is unknown
+        zipfile.BadZipFile, tarfile.TarError: If the archive is corrupt
+    """
+    if fmt == "zip":
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and not is_hidden(info.filename):
+                    yield member_name(info.filename), partial(archive.open, info)
+    elif fmt == "tar":
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and not is_hidden(member.name):
+                    yield member_name(member.name), partial(archive.extractfile, member)
+    else:
+        raise ValueError(f"Unknown archive format: {fmt}")
+
+
+def read_member(open_member: Callable[[], BinaryIO], max_bytes: int) -> bytes:
+    """
+    Read an archive member into memory
+
+    The limit is checked against the decompressed bytes, not the size the
+    archive claims.
+
+    Args:
+        open_member: Open function from iter_members
+        max_bytes: Maximum accepted size
+
+    Returns:
+        Member content
+
+    Raises:
+        ValueError: If the member is larger than max_bytes
+    """
+    with open_member() as f:
+        content = f.read(max_bytes + 1)
+    if len(content) > max_bytes:
+        raise ValueError(f"File too large. Maximum allowed size is {max_bytes} bytes")
+    return content
@@ -8,25 +8,80 @@ import os
 HOST = "localhost"
 PORT = 8000
 DEBUG = True
+SEARCH_WORKERS = 32  # threads for query embedding and search, bounds the queries the micro-batcher can combine
+INGEST_WORKERS = 2  # threads for save/load/clear, and concurrent upload jobs
+INGEST_BATCH_SIZE = 256  # chunks handed from the parse stage to the embed stage at a time
+INGEST_QUEUE_DEPTH = 4  # parsed batches buffered per job before parsing waits for embedding
+INGEST_MAX_PENDING_JOBS = 32  # queued uploads before /api/upload answers 503
+INGEST_JOB_HISTORY = 100  # finished jobs kept for /api/jobs
+ARCHIVE_WORKERS = 4  # threads decoding and chunking the files of an uploaded archive in parallel
+SYNC_WORKERS = 4  # threads hashing and chunking new or changed files during a directory sync
 
 # text processing settings
-CHUNK_SIZE = 1000
+CHUNK_STRATEGY = "sentence"  # "character", "sentence" (ends chunks at sentence ends) or "token"
+CHUNK_SIZE = 1000  # characters, for the character and sentence strategies
 CHUNK_OVERLAP = 200
+CHUNK_TOKENS = 200  # whitespace-delimited tokens, for the token strategy
+CHUNK_TOKEN_OVERLAP = 40
 MAX_TEXT_LENGTH = 100000
+MAX_UPLOAD_BYTES = 1024 * 1024 * 1024  # uploads are spooled to disk and chunked as a stream
+ARCHIVE_MAX_MEMBERS = 10000  # files read from one uploaded archive
+ARCHIVE_MAX_BYTES = 4 * 1024 * 1024 * 1024  # total uncompressed size read from one archive
+UPLOAD_BLOCK_SIZE = 1024 * 1024  # bytes read and decoded at a time
+PDF_WORKERS = 0  # processes extracting PDF pages, 0 = one per CPU
+PDF_PAGES_PER_TASK = 8  # pages extracted per worker task
+PDF_PAGE_WINDOW = 64  # pages extracted ahead of the chunker, bounds memory for large PDFs
+PDF_PARALLEL_MIN_PAGES = 32  # smaller PDFs are extracted in-process
 
 # embedding settings
-EMBEDDING_DIMENSION = 1536
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIMENSION = 384  # output size of the model above; Embedder.dimension reports the loaded value
+EMBEDDING_BATCH_SIZE = 64  # texts per SentenceTransformer.encode call
+EMBEDDING_CACHE_MAX_ENTRIES = 10000  # query vectors kept by Embedder.embed_text, 0 = no entry bound
+EMBEDDING_CACHE_MAX_BYTES = 16 * 1024 * 1024  # byte bound for the same cache, 0 = none (both 0 disables it)
+EMBEDDING_MICRO_BATCH_SIZE = 32  # concurrent query embeddings encoded together, 1 = one encode call per query
+EMBEDDING_MICRO_BATCH_WINDOW_MS = 3  # ms to wait for more queries once concurrent load is seen
+EMBEDDING_STORE_ENABLED = True  # keep document embeddings on disk by content hash, reused on re-ingestion
+EMBEDDING_STORE_DIR = os.path.join(os.getcwd(), "embedding_cache")
 
 # search settings
+VECTOR_STORE_BACKEND = "flat"  # "flat" (exact), "ivf" (approximate) or "llama_index"
+IVF_NLIST = 0  # number of IVF clusters, 0 = 4 * sqrt(chunk count) at training time
+IVF_NPROBE = 16  # clusters scored per query, trades speed for recall
+IVF_MIN_TRAIN_SIZE = 10000  # below this many chunks the IVF index searches exactly
+VECTOR_DTYPE = "float32"  # native index storage: "float32", "float16" or "int8" (per-vector scale)
+VECTOR_RESCORE = False  # keep float32 copies to re-rank compressed-score candidates
 DEFAULT_TOP_K = 3
 SIMILARITY_THRESHOLD = 0.0
+SEARCH_MODE = "dense"  # "dense" (embeddings), "sparse" (BM25 keywords) or "hybrid" (both, rank-fused); native backends
+HYBRID_CANDIDATES = 50  # results taken from each of dense and keyword search before fusion
+HYBRID_RRF_K = 60  # reciprocal rank fusion offset, larger values flatten the rank weights
+BM25_K1 = 1.2  # term frequency saturation
+BM25_B = 0.75  # document length normalization, 0 = none, 1 = full
+BATCH_SEARCH_MAX_SCORES = 16 * 1024 * 1024  # query x chunk scores per matrix product in batch search (64 MiB)
+BATCH_QUERY_MAX_SIZE = 1000  # queries accepted by one /api/query/batch request
+BATCH_QUERY_CONCURRENCY = 4  # LM Studio calls in flight per batch request, at most LM_STUDIO_POOL_SIZE are used
+
+# answer cache settings
+ANSWER_CACHE_ENABLED = True
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_MAX_BYTES = 32 * 1024 * 1024  # approximate bound for cached answers, context and query vectors
+ANSWER_CACHE_TTL = 3600  # seconds, 0 = until evicted or the knowledge base changes
+ANSWER_CACHE_SIMILARITY = 0.0  # > 0 also answers near-duplicate queries with cosine >= this (e.g. 0.95)
 
 # storage settings
 DEFAULT_STORAGE_DIR = os.path.join(os.getcwd(), "knowledge_base")
-KB_PERSISTENCE_ENABLED = True
+KB_PERSISTENCE_ENABLED = True  # log every add under DEFAULT_STORAGE_DIR and restore it on startup
+KB_COMPACT_SEGMENTS = 16  # pending segments that trigger a background compaction
+KB_COMPACT_DELETED_RATIO = 0.2  # share of deleted (tombstoned) chunks that triggers a compaction dropping them
+SYNC_MANIFEST_FILE = os.path.join(DEFAULT_STORAGE_DIR, "sync_manifest.json")  # fingerprints of synced files
 
 # LM Studio settings
 LM_STUDIO_API_BASE = "http://127.0.0.1:1234"
 LM_STUDIO_MODEL = "default"
 LM_STUDIO_MAX_TOKENS = 1024
-LM_STUDIO_TEMPERATURE = 0.7 
\ No newline at end of file
+LM_STUDIO_TEMPERATURE = 0.7
+LM_STUDIO_POOL_SIZE = 10  # keep-alive connections kept open to LM Studio
+LM_STUDIO_CONNECT_TIMEOUT = 5  # seconds, also the health probe timeout
+LM_STUDIO_READ_TIMEOUT = 30  # seconds to wait for (the next piece of) a completion
+LM_STUDIO_HEALTH_TTL = 30  # seconds a health status is trusted before a background refresh 
\ No newline at end of file
@@ -1,25 +1,283 @@
 """
 Simple Embedder
-Uses LM Studio API to generate embeddings
+Generates sentence embeddings with a shared, lazily loaded SentenceTransformer
 """
 
 import numpy as np
 import logging
-import requests
-from typing import List
-from sentence_transformers import SentenceTransformer
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from simple_pandaaiqa.config import EMBEDDING_DIMENSION, LM_STUDIO_API_BASE
+from simple_pandaaiqa.config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_STORE_ENABLED,
+    EMBEDDING_MICRO_BATCH_SIZE,
+    EMBEDDING_MICRO_BATCH_WINDOW_MS,
+)
+from simple_pandaaiqa.embedding_store import EmbeddingStore, get_embedding_store
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class EmbeddingBackend:
+    """Embedding model that is loaded once, on first use, and shared by all consumers"""
+    
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+    
+    @property
+    def model(self):
+        """The underlying SentenceTransformer, loaded on first access"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    
+                    start = time.perf_counter()
+                    self._model = SentenceTransformer(self.model_name)
+                    logger.info(f"Loaded embedding model {self.model_name} in {time.perf_counter() - start:.2f}s")
+        return self._model
+    
+    @property
+    def dimension(self) -> int:
+        """Output dimension reported by the loaded model"""
+        return self.model.get_sentence_embedding_dimension()
+
+
+_backends: Dict[str, EmbeddingBackend] = {}
+_backends_lock = threading.Lock()
+
+def get_embedding_backend(model_name: str = EMBEDDING_MODEL_NAME) -> EmbeddingBackend:
+    """
+    Get the process-wide backend for a model, creating it if needed
+    
+    Args:
+        model_name: SentenceTransformer model name
+        
+    Returns:
+        Shared EmbeddingBackend instance
+    """
+    with _backends_lock:
+        if model_name not in _backends:
+            _backends[model_name] = EmbeddingBackend(model_name)
+        return _backends[model_name]
+
+
+class VectorLRUCache:
+    """Thread-safe LRU cache of vectors, bounded by entry count and/or bytes"""
+    
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        """
+        Initialize vector cache
+        
+        Args:
+            max_entries: Maximum number of vectors, 0 for no entry bound
+            max_bytes: Maximum bytes of vector data, 0 for no byte bound
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.max_bytes > 0
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Cached (read-only) vector for a key, None on a miss"""
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is None:
+                self._misses += 1
+                return None
+            self._vectors.move_to_end(key)
+            self._hits += 1
+            return vector
+    
+    def put(self, key: str, vector: np.ndarray) -> np.ndarray:
+        """Store a vector, evicting least recently used ones, returns the stored read-only vector"""
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            previous = self._vectors.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._vectors[key] = vector
+            self._bytes += vector.nbytes
+            while self._vectors and (
+                (self.max_entries and len(self._vectors) > self.max_entries)
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                _, evicted = self._vectors.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return vector
+    
+    def clear(self) -> None:
+        """Drop all vectors, keeping the counters"""
+        with self._lock:
+            self._vectors.clear()
+            self._bytes = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "entries": len(self._vectors),
+                "bytes": self._bytes,
+            }
+
+
+class MicroBatcher:
+    """
+    Collects texts encoded concurrently by many threads into batched encode calls
+    
+    A single worker thread takes every text waiting in the queue, up to
+    max_batch, and encodes them with one call. While the model runs, new
+    texts queue up for the next batch. Once a batch held more than one text
+    (there is concurrent load), the worker also waits up to window_ms for
+    more texts before encoding, so a lone caller never pays the window.
+    """
+    
+    def __init__(self, encode: Callable[[List[str]], np.ndarray],
+                 max_batch: int = EMBEDDING_MICRO_BATCH_SIZE, window_ms: float = EMBEDDING_MICRO_BATCH_WINDOW_MS):
+        """
+        Initialize micro-batcher, the worker thread starts with the first text
+    
+        Args:
+            encode: Function encoding a list of texts to a matrix with one row per text
+            max_batch: Maximum texts per encode call, 1 disables batching
+            window_ms: Milliseconds to wait for more texts under concurrent load
+        """
+        self.encode = encode
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window_ms) / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._texts = 0
+        self._largest = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch > 1
+    
+    def submit(self, text: str) -> np.ndarray:
+        """
+        Encode one text as part of the next batch, blocking until it is done
+    
+        Args:
+            text: Preprocessed text
+    
+        Returns:
+            Embedding vector
+        """
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-micro-batcher", daemon=True)
+                    self._thread.start()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+    
+    def _collect(self, busy: bool) -> List[Tuple[str, Future]]:
+        """Block for the first text, then take what is queued, waiting out the window under load"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window if busy else 0.0
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self) -> None:
+        busy = False
+        while True:
+            batch = self._collect(busy)
+            busy = len(batch) > 1
+            # identical texts from concurrent callers are encoded once
+            unique: Dict[str, List[Future]] = {}
+            for text, future in batch:
+                unique.setdefault(text, []).append(future)
+            try:
+                vectors = self.encode(list(unique))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._lock:
+                self._batches += 1
+                self._texts += len(batch)
+                self._largest = max(self._largest, len(batch))
+            for row, futures in enumerate(unique.values()):
+                for future in futures:
+                    future.set_result(vectors[row])
+    
+    def stats(self) -> Dict[str, Any]:
+        """Batch counters"""
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "texts": self._texts,
+                "mean_batch_size": self._texts / self._batches if self._batches else 0.0,
+                "largest_batch": self._largest,
+            }
+
+
 class Embedder:
     
-    def __init__(self):
-        self.model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-        logger.info("Initialized simple embedder")
+    def __init__(self, backend: EmbeddingBackend = None, query_cache: Optional[VectorLRUCache] = None,
+                 store: Optional[EmbeddingStore] = None, micro_batcher: Optional[MicroBatcher] = None):
+        """
+        Initialize embedder
+        
+        Args:
+            backend: Shared embedding backend
+            query_cache: Cache for embed_text vectors, created from config if not provided
+            store: Persistent cache for embed_texts vectors, the shared one for the model
+                if not provided and EMBEDDING_STORE_ENABLED is set
+            micro_batcher: Batcher for concurrent embed_text calls, created from config if not provided
+        """
+        self.backend = backend or get_embedding_backend()
+        self.query_cache = query_cache if query_cache is not None else VectorLRUCache()
+        if store is None and EMBEDDING_STORE_ENABLED:
+            try:
+                store = get_embedding_store(self.backend.model_name)
+            except Exception as e:
+                logger.error(f"Error opening embedding store, embeddings will not be reused: {e}", exc_info=True)
+        self.store = store
+        self.micro_batcher = micro_batcher if micro_batcher is not None else MicroBatcher(self._encode_batch)
+        logger.info(f"Initialized simple embedder, model={self.backend.model_name}")
+    
+    @property
+    def model(self):
+        """Shared SentenceTransformer model"""
+        return self.backend.model
+    
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension"""
+        return self.backend.dimension
     
     def _normalize(self, vector: np.ndarray) -> np.ndarray:
         """Normalize vector"""
@@ -30,30 +288,185 @@ class Embedder:
         """
         Generate embedding for a single text
         
+        Repeated texts (after lower-casing and stripping) are served from the
+        query cache without running the model.
+        
         Args:
             text: Text to embed
             
         Returns:
-            Embedding vector as a numpy array
+            Embedding vector as a numpy array (read-only when cached), a zero
+            vector that is not cached if embedding failed
         """
         try:
             text = text.lower().strip()
-            return self.model.encode(text, normalize_embeddings=True)
+            if not self.query_cache.enabled:
+                return self._encode_query(text)
+            
+            vector = self.query_cache.get(text)
+            if vector is None:
+                vector = self._encode_query(text)
+                if vector.any():
+                    vector = self.query_cache.put(text, vector)
+            return vector
         except Exception as e:
             logger.error(f"Error generating embedding: {e}", exc_info=True)
-            vector = np.random.randn(EMBEDDING_DIMENSION).astype(np.float32)
-            return self._normalize(vector)
+            return np.zeros(self.dimension, dtype=np.float32)
     
-    def embed_texts(self, texts: List[str]) -> List[np.ndarray]:
+    def _encode_query(self, text: str) -> np.ndarray:
+        """Encode one preprocessed query, together with concurrent ones if micro-batching is enabled"""
+        if self.micro_batcher.enabled:
+            return self.micro_batcher.submit(text)
+        return self.model.encode(text, normalize_embeddings=True)
+    
+    def embed_queries(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
         """
-        Generate embeddings for multiple texts
+        Generate embeddings for several queries at once
+        
+        Like embed_text, but queries missing from the query cache are
+        embedded together in batched forward passes instead of one call each.
+        
+        Args:
+            texts: Query texts
+            batch_size: Maximum number of texts per encode call
+        
+        Returns:
+            Float32 matrix of shape (len(texts), dim)
+        """
+        prepared = [text.lower().strip() for text in texts]
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        missing: Dict[str, List[int]] = {}
+        for position, text in enumerate(prepared):
+            vector = self.query_cache.get(text) if self.query_cache.enabled else None
+            if vector is None:
+                missing.setdefault(text, []).append(position)
+            else:
+                embeddings[position] = vector
+        
+        logger.info(f"Embedding {len(missing)} of {len(texts)} queries ({len(texts) - len(missing)} cached or repeated)")
+        if missing:
+            unique = list(missing)
+            vectors = self._embed_uncached(unique, batch_size)
+            for row, text in enumerate(unique):
+                vector = vectors[row]
+                if self.query_cache.enabled and vector.any():
+                    vector = self.query_cache.put(text, vector)
+                embeddings[missing[text]] = vector
+        return embeddings
+    
+    def embed_texts(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+                    report: Optional[Dict[str, int]] = None) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts in batches
+        
+        Texts already in the embedding store are not embedded again, and
+        duplicates within the call are embedded once. The rest are sorted by
+        length so each batch holds similarly sized inputs (less padding per
+        forward pass), encoded with one call per batch and written back in
+        their original order.
         
         Args:
             texts: List of texts to embed
+            batch_size: Maximum number of texts per encode call
+            report: Optional dictionary that receives "embedded" and "reused" counts
             
         Returns:
-            List of embedding vectors
+            Float32 matrix of shape (len(texts), dim)
         """
-        logger.info(f"Embedding {len(texts)} texts")
+        if not texts:
+            logger.info("Embedding 0 texts")
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        
+        prepared = [text.lower().strip() for text in texts]
+        embeddings, positions = None, []
+        if self.store is not None:
+            try:
+                positions, vectors = self.store.lookup(prepared)
+                if positions:
+                    embeddings = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+                    embeddings[positions] = vectors
+            except Exception as e:
+                logger.error(f"Error reading embedding store: {e}", exc_info=True)
+                embeddings, positions = None, []
+        
+        reused = len(positions)
+        found = set(positions)
+        missing: Dict[str, List[int]] = {}
+        for position, text in enumerate(prepared):
+            if position not in found:
+                missing.setdefault(text, []).append(position)
+        
+        logger.info(f"Embedding {len(missing)} texts ({reused} of {len(texts)} reused from the embedding store)")
+        if report is not None:
+            report["embedded"] = report.get("embedded", 0) + len(missing)
+            report["reused"] = report.get("reused", 0) + reused
+        if not missing:
+            return embeddings
+        
+        unique = list(missing)
+        vectors = self._embed_uncached(unique, batch_size)
+        if embeddings is None:
+            embeddings = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+        for row, text in enumerate(unique):
+            embeddings[missing[text]] = vectors[row]
+        
+        # zero vectors of texts that failed to embed are retried next time rather than stored
+        embedded = vectors.any(axis=1)
+        if self.store is not None and embedded.any():
+            try:
+                self.store.put([text for text, ok in zip(unique, embedded) if ok], vectors[embedded])
+            except Exception as e:
+                logger.error(f"Error writing embedding store: {e}", exc_info=True)
+        return embeddings
+    
+    def _embed_uncached(self, prepared: List[str], batch_size: int) -> np.ndarray:
+        """Embed preprocessed texts with length-sorted batches, in their original order"""
+        order = sorted(range(len(prepared)), key=lambda i: len(prepared[i]), reverse=True)
+        batch_size = max(1, batch_size)
+        
+        embeddings = None
+        for start in range(0, len(order), batch_size):
+            batch_ids = order[start:start + batch_size]
+            vectors = self._encode_batch([prepared[i] for i in batch_ids])
+            if embeddings is None:
+                embeddings = np.zeros((len(prepared), vectors.shape[1]), dtype=np.float32)
+            embeddings[batch_ids] = vectors
+        
+        return embeddings
+    
+    def _encode_batch(self, batch: List[str]) -> np.ndarray:
+        """
+        Encode one batch, isolating failures to the texts that cause them
+        
+        If the batched call fails, the batch is retried text by text and any
+        text that still fails gets a zero vector, so it never matches anything
+        instead of polluting search results with a random direction. Model
+        vectors are normalized and never zero, so the caches recognize these
+        and never store them.
+        
+        Args:
+            batch: Preprocessed texts
+            
+        Returns:
+            Float32 matrix of shape (len(batch), dim)
+        """
+        try:
+            vectors = self.model.encode(
+                batch,
+                batch_size=len(batch),
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+            )
+            return np.asarray(vectors, dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Error embedding batch of {len(batch)} texts, retrying individually: {e}")
         
-        return [self.embed_text(text) for text in texts] 
\ No newline at end of file
+        rows = []
+        for text in batch:
+            try:
+                rows.append(np.asarray(self.model.encode(text, normalize_embeddings=True), dtype=np.float32))
+            except Exception as e:
+                logger.error(f"Error generating embedding: {e}", exc_info=True)
+                rows.append(None)
+        dim = next((row.shape[0] for row in rows if row is not None), self.dimension)
+        return np.stack([row if row is not None else np.zeros(dim, dtype=np.float32) for row in rows])
@@ -0,0 +1,223 @@
+"""
+Persistent embedding store for PandaAIQA
+Content-addressed on-disk cache of document embeddings, so re-ingesting
+unchanged chunks never runs the model again
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simple_pandaaiqa.config import EMBEDDING_STORE_DIR
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+KEYS_FILE = "keys.bin"
+VECTORS_FILE = "vectors.f32"
+KEY_SIZE = 16  # bytes of BLAKE2b digest per entry
+
+
+class EmbeddingStore:
+    """
+    Append-only map from (model, text) content hash to float32 vector
+
+    Entries live in two row-aligned files: raw float32 vectors, memory-mapped
+    for reads, and fixed-size hash keys that are loaded into a dict on open.
+    Vectors are written before their keys and a torn tail is truncated on
+    open, so a crash never leaves a key pointing at a missing vector. A
+    directory must only be opened by one process at a time.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        """
+        Open (or create) the store of one model
+
+        Args:
+            directory: Store root, each model gets its own subdirectory
+            model_name: Embedding model the vectors come from
+        """
+        self.model_name = model_name
+        self.directory = os.path.join(os.path.abspath(directory), re.sub(r"[^\w.-]+", "_", model_name))
+        self.dim: Optional[int] = None
+        self._rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.ndarray] = None  # mapping of the first len(self._vectors) rows
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._open()
+        logger.info(f"Opened embedding store at {self.directory} with {len(self._rows)} vectors")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open(self) -> None:
+        """Load the key index, dropping rows that were only partially written"""
+        meta_path = self._path(META_FILE)
+        if not os.path.isfile(meta_path):
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION or meta.get("model") != self.model_name:
+            logger.warning(f"Discarding incompatible embedding store at {self.directory}")
+            self._reset_files()
+            return
+
+        self.dim = int(meta["dim"])
+        row_bytes = self.dim * 4
+        keys_size = os.path.getsize(self._path(KEYS_FILE)) if os.path.exists(self._path(KEYS_FILE)) else 0
+        vectors_size = os.path.getsize(self._path(VECTORS_FILE)) if os.path.exists(self._path(VECTORS_FILE)) else 0
+        count = min(keys_size // KEY_SIZE, vectors_size // row_bytes)
+        if keys_size != count * KEY_SIZE or vectors_size != count * row_bytes:
+            logger.warning(f"Truncating embedding store to {count} complete rows")
+            for name, size in ((KEYS_FILE, count * KEY_SIZE), (VECTORS_FILE, count * row_bytes)):
+                with open(self._path(name), "ab") as f:
+                    f.truncate(size)
+
+        if count:
+            with open(self._path(KEYS_FILE), "rb") as f:
+                keys = f.read(count * KEY_SIZE)
+            self._rows = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(count)}
+            self._map(count)
+
+    def _map(self, count: int) -> None:
+        """Memory-map the first count vectors"""
+        self._vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float32, mode="r", shape=(count, self.dim))
+
+    def _reset_files(self) -> None:
+        self._vectors = None
+        self._rows = {}
+        self.dim = None
+        for name in (META_FILE, KEYS_FILE, VECTORS_FILE):
+            if os.path.exists(self._path(name)):
+                os.remove(self._path(name))
+
+    def key(self, text: str) -> bytes:
+        """Content hash of a (preprocessed) text under this store's model"""
+        digest = hashlib.blake2b(digest_size=KEY_SIZE)
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def lookup(self, texts: List[str]) -> Tuple[List[int], np.ndarray]:
+        """
+        Find stored vectors for texts
+
+        Args:
+            texts: Preprocessed texts
+
+        Returns:
+            Tuple of (positions in texts that were found, their vectors as a
+            float32 matrix)
+        """
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            found = [(position, self._rows[key]) for position, key in enumerate(keys) if key in self._rows]
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(texts) - len(found)
+            if not found:
+                return [], np.zeros((0, self.dim or 0), dtype=np.float32)
+            if self._vectors is None or len(self._vectors) < len(self._rows):
+                self._map(len(self._rows))
+            rows = np.array([row for _, row in found], dtype=np.int64)
+            return [position for position, _ in found], np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def put(self, texts: List[str], vectors: np.ndarray) -> int:
+        """
+        Store vectors for texts that are not stored yet
+
+        All-zero vectors (texts the model failed on) are skipped, so they are
+        retried on the next ingestion.
+
+        Args:
+            texts: Preprocessed texts
+            vectors: Float32 matrix of shape (len(texts), dim)
+
+        Returns:
+            Number of vectors written
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self._path(META_FILE), "w", encoding="utf-8") as f:
+                    json.dump({"version": FORMAT_VERSION, "model": self.model_name, "dim": self.dim}, f)
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            new_keys, new_rows, seen = [], [], set()
+            for index, key in enumerate(keys):
+                if key in self._rows or key in seen or not vectors[index].any():
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(index)
+            if not new_rows:
+                return 0
+
+            # vectors first, so a crash in between leaves only an ignorable vector tail
+            with open(self._path(VECTORS_FILE), "ab") as f:
+                f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self._path(KEYS_FILE), "ab") as f:
+                f.write(b"".join(new_keys))
+                f.flush()
+                os.fsync(f.fileno())
+
+            start = len(self._rows)
+            for offset, key in enumerate(new_keys):
+                self._rows[key] = start + offset
+            self._stats["writes"] += len(new_keys)
+            return len(new_keys)
+
+    def clear(self) -> None:
+        """Delete all stored vectors, keeping the counters"""
+        with self._lock:
+            self._reset_files()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._rows),
+                "bytes": len(self._rows) * ((self.dim or 0) * 4 + KEY_SIZE),
+            }
+
+
+_stores: Dict[str, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+def get_embedding_store(model_name: str, directory: str = EMBEDDING_STORE_DIR) -> EmbeddingStore:
+    """
+    Get the process-wide store for a model, opening it if needed
+
+    Args:
+        model_name: Embedding model name
+        directory: Store root
+
+    Returns:
+        Shared EmbeddingStore instance
+    """
+    key = os.path.join(os.path.abspath(directory), model_name)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = EmbeddingStore(directory, model_name)
+        return _stores[key]
@@ -3,17 +3,38 @@ Generator module for PandaAIQA
 Handles text generation using LM Studio API
 """
 
+import asyncio
+import httpx
 import requests
 import json
 import logging
-from typing import List, Dict, Any, Tuple, Optional
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, AsyncIterator, Iterator, Tuple, Optional
 
-from simple_pandaaiqa.config import LM_STUDIO_API_BASE, LM_STUDIO_MODEL, LM_STUDIO_MAX_TOKENS, LM_STUDIO_TEMPERATURE
+from simple_pandaaiqa.config import (
+    LM_STUDIO_API_BASE,
+    LM_STUDIO_MODEL,
+    LM_STUDIO_MAX_TOKENS,
+    LM_STUDIO_TEMPERATURE,
+    LM_STUDIO_POOL_SIZE,
+    LM_STUDIO_CONNECT_TIMEOUT,
+    LM_STUDIO_READ_TIMEOUT,
+    LM_STUDIO_HEALTH_TTL,
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+class GenerationError(str):
+    """error message returned or yielded in place of answer text
+
+    A str, so callers can show it like an answer, while isinstance tells it
+    apart from generated text without looking at its content.
+    """
+
 class Generator:
     """text generator class, using LM Studio API to generate replies"""
     
@@ -21,33 +42,133 @@ class Generator:
                  api_base: str = LM_STUDIO_API_BASE, 
                  model: str = LM_STUDIO_MODEL,
                  max_tokens: int = LM_STUDIO_MAX_TOKENS,
-                 temperature: float = LM_STUDIO_TEMPERATURE):
+                 temperature: float = LM_STUDIO_TEMPERATURE,
+                 pool_size: int = LM_STUDIO_POOL_SIZE,
+                 connect_timeout: float = LM_STUDIO_CONNECT_TIMEOUT,
+                 read_timeout: float = LM_STUDIO_READ_TIMEOUT,
+                 health_ttl: float = LM_STUDIO_HEALTH_TTL):
         """initialize generator"""
         self.api_base = api_base
         self.model = model
         self.max_tokens = max_tokens
         self.temperature = temperature
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.health_ttl = health_ttl
+        
+        # keep-alive connections reused by every request, instead of one TCP handshake per call
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # async client for the API's event loop, created on first use
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # cached (connection status, status message) and when it was recorded
+        self._health: Optional[Tuple[bool, str]] = None
+        self._health_time = 0.0
+        self._health_lock = threading.Lock()
+        self._refreshing = False
         self.system_prompt = """You are Panda AIQA assistant, a AI that focuses on answering questions based on the provided context.
 - you should only use the information provided in the context to answer the question
 - if there is not enough information in the context, please say you don't know
 - do not make up information"""
         
         logger.info(f"initialize generator, API base URL: {api_base}")
-        # check connection status when initializing
-        self.check_connection()
+        # check connection status when initializing, without blocking startup
+        self._refresh_in_background()
     
     def check_connection(self) -> Tuple[bool, str]:
         """
-        check connection status with LM Studio
+        check connection status with LM Studio now and cache the result
+        
+        :return:
+            Tuple[bool, str]: (connection status, status message)
+        """
+        status = self._probe()
+        self._set_health(*status)
+        return status
+    
+    def connection_status(self) -> Tuple[bool, str]:
+        """
+        cached connection status with LM Studio
+        
+        only the very first call waits for a probe; a status older than
+        health_ttl is returned as is while a background probe refreshes it
+        
+        :return:
+            Tuple[bool, str]: (connection status, status message)
+        """
+        health = self._health
+        if health is None:
+            return self.check_connection()
+        if time.monotonic() - self._health_time > self.health_ttl:
+            self._refresh_in_background()
+        return health
+    
+    async def aconnection_status(self) -> Tuple[bool, str]:
+        """
+        connection_status for the event loop, the first probe runs in a worker thread
+        
+        :return:
+            Tuple[bool, str]: (connection status, status message)
+        """
+        if self._health is None:
+            return await asyncio.to_thread(self.check_connection)
+        return self.connection_status()
+    
+    def _set_health(self, connected: bool, message: str) -> None:
+        """record a connection status, from a probe or from the outcome of a real request"""
+        with self._health_lock:
+            self._health = (connected, message)
+            self._health_time = time.monotonic()
+    
+    def _record_status(self, status_code: int) -> None:
+        """record the connection status implied by the HTTP status of a completions request"""
+        if status_code == 200:
+            self._set_health(True, "LM Studio connection successful")
+        else:
+            self._set_health(False, f"LM Studio connection failed: HTTP {status_code}")
+    
+    def _refresh_in_background(self) -> None:
+        """probe LM Studio in a daemon thread, unless a probe is already running"""
+        with self._health_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        
+        def refresh():
+            try:
+                self.check_connection()
+            finally:
+                self._refreshing = False
+        
+        threading.Thread(target=refresh, name="lm-studio-health", daemon=True).start()
+    
+    def _connection_failed(self, error: Exception, timed_out: bool) -> GenerationError:
+        """mark LM Studio down after a failed request and return the message for the user"""
+        if timed_out:
+            message = "LM Studio connection timeout, please confirm the service has been started"
+        else:
+            message = f"LM Studio connection failed, please confirm the service has been started and check the URL: {self.api_base}"
+        logger.error(f"LM Studio request failed: {error}")
+        self._set_health(False, message)
+        return GenerationError(f"cannot connect to language model: {message}")
+    
+    def _probe(self) -> Tuple[bool, str]:
+        """
+        request the model list from LM Studio
         
         :return:
             Tuple[bool, str]: (connection status, status message)
         """
         try:
             # use the correct API endpoint /v1/models
-            response = requests.get(
+            response = self.session.get(
                 f"{self.api_base}/v1/models",
-                timeout=5
+                timeout=(self.connect_timeout, self.connect_timeout)
             )
             
             # check response
@@ -78,53 +199,263 @@ class Generator:
         :param context: context documents list
             
         :return:
-            generated answer
+            generated answer, or a GenerationError describing the failure
         """
         try:
-            # check connection status
-            is_connected, message = self.check_connection()
+            # check connection status (cached, no probe round trip on the query path)
+            is_connected, message = self.connection_status()
             if not is_connected:
-                return f"cannot connect to language model: {message}"
-            
-            # prepare context text
-            context_text = self._prepare_context(context)
+                return GenerationError(f"cannot connect to language model: {message}")
             
-            # prepare prompt text (using completions format)
-            prompt = f"{self.system_prompt}\n\nBased on the following information, answer the question:\n\nContext:\n{context_text}\n\nQuestion:\n{query}\n\nAnswer:"
-            
-            # prepare request
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "max_tokens": self.max_tokens,
-                "temperature": self.temperature,
-                "stop": ["</s>", "\n\n"]  # common stop tokens
-            }
+            payload = self._build_payload(query, context)
             
             # use the correct API endpoint /v1/completions
             logger.info(f"Sending request to LM Studio: {self.api_base}/v1/completions")
-            response = requests.post(
+            response = self.session.post(
                 f"{self.api_base}/v1/completions",
                 headers={"Content-Type": "application/json"},
                 data=json.dumps(payload),
-                timeout=30
+                timeout=(self.connect_timeout, self.read_timeout)
             )
+            self._record_status(response.status_code)
+            return self._answer_from_response(response)
             
-            # check response
-            if response.status_code == 200:
-                result = response.json()
-                if "choices" in result and len(result["choices"]) > 0:
-                    logger.info("Successfully got reply from LM Studio")
-                    # completions API returns a different format from chat
-                    return result["choices"][0]["text"].strip()
+        except requests.exceptions.ConnectionError as e:
+            return self._connection_failed(e, isinstance(e, requests.exceptions.ConnectTimeout))
+        
+        except Exception as e:
+            logger.error(f"Error generating answer: {str(e)}", exc_info=True)
+            return GenerationError(f"Sorry, an error occurred while processing your request: {str(e)}")
+    
+    async def agenerate(self, query: str, context: List[Dict[str, Any]]) -> str:
+        """
+        generate for the event loop, using the pooled async client
+        
+        :param query: user query
+        :param context: context documents list
+            
+        :return:
+            generated answer, or a GenerationError describing the failure
+        """
+        try:
+            is_connected, message = await self.aconnection_status()
+            if not is_connected:
+                return GenerationError(f"cannot connect to language model: {message}")
             
-            # log detailed error information
-            logger.error(f"Failed to generate answer: {response.status_code}, {response.text}")
-            return f"Sorry, I cannot generate an answer. API returned an error: {response.status_code} - {response.text}"
+            payload = self._build_payload(query, context)
+            logger.info(f"Sending request to LM Studio: {self.api_base}/v1/completions")
+            response = await self.async_client.post(f"{self.api_base}/v1/completions", json=payload)
+            self._record_status(response.status_code)
+            return self._answer_from_response(response)
             
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            return self._connection_failed(e, isinstance(e, httpx.ConnectTimeout))
+        
         except Exception as e:
             logger.error(f"Error generating answer: {str(e)}", exc_info=True)
-            return f"Sorry, an error occurred while processing your request: {str(e)}"
+            return GenerationError(f"Sorry, an error occurred while processing your request: {str(e)}")
+    
+    def _answer_from_response(self, response: Any) -> str:
+        """
+        extract the answer from a /v1/completions response (requests or httpx)
+        
+        :param response: completions response
+            
+        :return:
+            generated answer, or a GenerationError
+        """
+        # check response
+        if response.status_code == 200:
+            result = response.json()
+            if "choices" in result and len(result["choices"]) > 0:
+                logger.info("Successfully got reply from LM Studio")
+                # completions API returns a different format from chat
+                return result["choices"][0]["text"].strip()
+        
+        # log detailed error information
+        logger.error(f"Failed to generate answer: {response.status_code}, {response.text}")
+        return GenerationError(
+            f"Sorry, I cannot generate an answer. API returned an error: {response.status_code} - {response.text}"
+        )
+    
+    def generate_stream(self, query: str, context: List[Dict[str, Any]]) -> Iterator[str]:
+        """
+        generate answer based on query and context, yielding tokens as LM Studio produces them
+        
+        :param query: user query
+        :param context: context documents list
+            
+        :return:
+            iterator of answer text pieces; errors are yielded as a GenerationError, like generate
+        """
+        try:
+            is_connected, message = self.connection_status()
+            if not is_connected:
+                yield GenerationError(f"cannot connect to language model: {message}")
+                return
+            
+            payload = self._build_payload(query, context, stream=True)
+            logger.info(f"Sending streaming request to LM Studio: {self.api_base}/v1/completions")
+            with self.session.post(
+                f"{self.api_base}/v1/completions",
+                headers={"Content-Type": "application/json"},
+                data=json.dumps(payload),
+                stream=True,
+                timeout=(self.connect_timeout, self.read_timeout)
+            ) as response:
+                self._record_status(response.status_code)
+                if response.status_code != 200:
+                    logger.error(f"Failed to generate answer: {response.status_code}, {response.text}")
+                    yield GenerationError(
+                        f"Sorry, I cannot generate an answer. API returned an error: {response.status_code} - {response.text}"
+                    )
+                    return
+                
+                started = False
+                for text in self._iter_stream_text(response):
+                    # match generate(), which strips the completion
+                    if not started:
+                        text = text.lstrip()
+                        started = bool(text)
+                    if text:
+                        yield text
+            logger.info("Finished streaming reply from LM Studio")
+            
+        except requests.exceptions.ConnectionError as e:
+            yield self._connection_failed(e, isinstance(e, requests.exceptions.ConnectTimeout))
+        
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}", exc_info=True)
+            yield GenerationError(f"Sorry, an error occurred while processing your request: {str(e)}")
+    
+    async def agenerate_stream(self, query: str, context: List[Dict[str, Any]]) -> AsyncIterator[str]:
+        """
+        generate_stream for the event loop, using the pooled async client
+        
+        :param query: user query
+        :param context: context documents list
+            
+        :return:
+            async iterator of answer text pieces; errors are yielded as a GenerationError, like generate
+        """
+        try:
+            is_connected, message = await self.aconnection_status()
+            if not is_connected:
+                yield GenerationError(f"cannot connect to language model: {message}")
+                return
+            
+            payload = self._build_payload(query, context, stream=True)
+            logger.info(f"Sending streaming request to LM Studio: {self.api_base}/v1/completions")
+            async with self.async_client.stream("POST", f"{self.api_base}/v1/completions", json=payload) as response:
+                self._record_status(response.status_code)
+                if response.status_code != 200:
+                    await response.aread()
+                    logger.error(f"Failed to generate answer: {response.status_code}, {response.text}")
+                    yield GenerationError(
+                        f"Sorry, I cannot generate an answer. API returned an error: {response.status_code} - {response.text}"
+                    )
+                    return
+                
+                started = False
+                async for line in response.aiter_lines():
+                    finished, text = self._parse_stream_line(line)
+                    if finished:
+                        break
+                    # match generate(), which strips the completion
+                    if not started:
+                        text = text.lstrip()
+                        started = bool(text)
+                    if text:
+                        yield text
+            logger.info("Finished streaming reply from LM Studio")
+            
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            yield self._connection_failed(e, isinstance(e, httpx.ConnectTimeout))
+        
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}", exc_info=True)
+            yield GenerationError(f"Sorry, an error occurred while processing your request: {str(e)}")
+    
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """pooled keep-alive client used by the async methods"""
+        # pooled connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_loop = loop
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            )
+        return self._async_client
+    
+    async def aclose(self) -> None:
+        """close the async client's connections"""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+    
+    def _iter_stream_text(self, response: requests.Response) -> Iterator[str]:
+        """
+        parse the server-sent events of a streaming completion
+        
+        :param response: streaming response of /v1/completions
+            
+        :return:
+            iterator of completion text pieces
+        """
+        for line in response.iter_lines(decode_unicode=True):
+            finished, text = self._parse_stream_line(line)
+            if finished:
+                break
+            yield text
+    
+    def _parse_stream_line(self, line: str) -> Tuple[bool, str]:
+        """
+        parse one line of a streaming completion
+        
+        :param line: server-sent event line
+            
+        :return:
+            Tuple[bool, str]: (end of stream, text piece, empty for non-data lines)
+        """
+        if not line or not line.startswith("data:"):
+            return False, ""
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return True, ""
+        chunk = json.loads(data)
+        if chunk.get("choices"):
+            return False, chunk["choices"][0].get("text") or ""
+        return False, ""
+    
+    def _build_payload(self, query: str, context: List[Dict[str, Any]], stream: bool = False) -> Dict[str, Any]:
+        """
+        build the /v1/completions request body
+        
+        :param query: user query
+        :param context: context documents list
+        :param stream: ask the server for server-sent events
+            
+        :return:
+            request payload
+        """
+        # prepare context text
+        context_text = self._prepare_context(context)
+        
+        # prepare prompt text (using completions format)
+        prompt = f"{self.system_prompt}\n\nBased on the following information, answer the question:\n\nContext:\n{context_text}\n\nQuestion:\n{query}\n\nAnswer:"
+        
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "stop": ["</s>", "\n\n"]  # common stop tokens
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
     
     def _prepare_context(self, context: List[Dict[str, Any]]) -> str:
         """
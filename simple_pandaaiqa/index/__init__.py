@@ -0,0 +1,3 @@
+"""
+Native vector index engines
+"""
@@ -0,0 +1,333 @@
+"""
+BM25 keyword index for PandaAIQA
+Inverted index with compact postings arrays, scored with BM25 and MaxScore
+top-k pruning, plus reciprocal rank fusion with dense results
+"""
+
+import logging
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from simple_pandaaiqa.index.flat import renumber, top_k_indices
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# words, keeping identifiers such as E-4821, v2.3.1 or 0x8007 together
+_WORD = re.compile(r"\w+(?:[-./:#+]\w+)*")
+# scripts written without spaces are indexed character by character
+_CJK = re.compile(r"([぀-ヿ㐀-䶿一-鿿豈-﫿가-힯])")
+_PART = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into index terms
+
+    Identifiers are kept whole and also indexed by their alphanumeric parts,
+    so "ERR_DISK-42" matches both the exact code and a query for "disk".
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        Lower-case terms in text order, repeated terms included
+    """
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        for piece in _CJK.split(word) if _CJK.search(word) else (word,):
+            piece = piece.strip("-./:#+")
+            if not piece:
+                continue
+            tokens.append(piece)
+            parts = _PART.findall(piece)
+            if len(parts) > 1 or (parts and parts[0] != piece):
+                tokens.extend(parts)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], top_k: int, k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse ranked id lists by reciprocal rank
+
+    Each list contributes 1 / (k + rank) for every id it contains, so ids
+    ranked well by several lists rise to the top without calibrating their
+    scores against each other.
+
+    Args:
+        rankings: Id arrays, best first
+        top_k: Number of fused results
+        k: Rank offset, damps the weight of the first few ranks
+
+    Returns:
+        Tuple of (ids, fused scores), best first
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row_id in enumerate(ranking.tolist(), start=1):
+            fused[row_id] = fused.get(row_id, 0.0) + 1.0 / (k + rank)
+    if not fused:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    ids = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+    scores = np.fromiter(fused.values(), dtype=np.float32, count=len(fused))
+    best = top_k_indices(scores, top_k)
+    return ids[best], scores[best]
+
+
+class BM25Index:
+    """
+    Keyword index over the same row ids as the vector index
+
+    Each term has a postings list of row ids in ascending order and a
+    parallel list of term frequencies. Lists grow as array("i") while rows
+    are added and are read-only int32 views after loading, like the IVF
+    inverted lists.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, initial_capacity: int = 1024):
+        """
+        Initialize BM25 index
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization, 0 = none, 1 = full
+            initial_capacity: Rows allocated up front for document lengths
+        """
+        self.k1 = k1
+        self.b = b
+        self._initial_capacity = max(1, initial_capacity)
+        # searches copy the lists they read while adds extend them (an exported array cannot be resized)
+        self._lock = threading.Lock()
+        self.clear()
+        logger.info(f"Initialized BM25 index, k1={k1}, b={b}")
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._terms)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by postings, frequencies and document lengths"""
+        postings = sum(len(ids) for ids in self._postings)
+        return postings * 8 + self._count * 4 + len(self._terms) * 8
+
+    def add(self, texts: Iterable[str]) -> np.ndarray:
+        """
+        Index texts as the next rows
+
+        Args:
+            texts: Texts, one per row
+
+        Returns:
+            Row ids assigned to the texts
+        """
+        start = self._count
+        with self._lock:
+            for text in texts:
+                row_id = self._count
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                for term, tf in counts.items():
+                    term_id = self._terms.get(term)
+                    if term_id is None:
+                        term_id = self._terms[term] = len(self._postings)
+                        self._postings.append(array("i"))
+                        self._freqs.append(array("i"))
+                        self._max_tf.append(0)
+                        self._min_length.append(length)
+                    elif not isinstance(self._postings[term_id], array):
+                        self._postings[term_id] = array("i", np.asarray(self._postings[term_id]).tobytes())
+                        self._freqs[term_id] = array("i", np.asarray(self._freqs[term_id]).tobytes())
+                    self._postings[term_id].append(row_id)
+                    self._freqs[term_id].append(tf)
+                    self._max_tf[term_id] = max(self._max_tf[term_id], tf)
+                    self._min_length[term_id] = min(self._min_length[term_id], length)
+                self._append_length(length)
+        return np.arange(start, self._count)
+
+    def _append_length(self, length: int) -> None:
+        """Append a document length, growing storage geometrically"""
+        if self._count == len(self._lengths):
+            # readers keep using the old buffer, so it is replaced rather than resized
+            lengths = np.zeros(max(self._initial_capacity, 2 * len(self._lengths)), dtype=np.int32)
+            lengths[:self._count] = self._lengths[:self._count]
+            self._lengths = lengths
+        self._lengths[self._count] = length
+        self._total_length += length
+        self._count += 1
+
+    def _term_lists(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Postings and frequencies of a term as int32 arrays, copied if they are still growing"""
+        ids, freqs = self._postings[term_id], self._freqs[term_id]
+        if isinstance(ids, array):
+            return np.frombuffer(ids, dtype=np.int32).copy(), np.frombuffer(freqs, dtype=np.int32).copy()
+        return ids, freqs
+
+    def search(self, query: str, top_k: int, prune: bool = True, candidates: Optional[np.ndarray] = None,
+               exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the rows with the highest BM25 score for a query
+
+        With pruning, terms are scored in order of their score upper bound.
+        Once the bounds of the remaining terms add up to less than the current
+        k-th best score, no row that none of the scored terms matched can reach
+        the top k (MaxScore), so the remaining lists are only probed for the
+        surviving rows by binary search instead of being scanned, where that is
+        cheaper.
+
+        Args:
+            query: Query text
+            top_k: Number of results to return
+            prune: Skip work that cannot change the top k; False scores every posting
+            candidates: Restrict results to these row ids, postings of other rows are dropped before scoring
+            exclude: Row ids never returned (deleted rows), their scores are pinned at -inf
+
+        Returns:
+            Tuple of (row ids, BM25 scores), best first
+        """
+        with self._lock:
+            count, lengths, total = self._count, self._lengths[:self._count], self._total_length
+            terms = []
+            for term, weight in Counter(tokenize(query)).items():
+                term_id = self._terms.get(term)
+                if term_id is not None:
+                    terms.append((term_id, weight, self._max_tf[term_id], self._min_length[term_id]))
+        if count == 0 or not terms or top_k <= 0 or (candidates is not None and len(candidates) == 0):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        average = total / count
+        allowed = None
+        if candidates is not None:
+            allowed = np.zeros(count, dtype=bool)
+            allowed[candidates[candidates < count]] = True
+        lists, weights, bounds = [], [], []
+        for term_id, weight, max_tf, min_length in terms:
+            with self._lock:
+                ids, freqs = self._term_lists(term_id)
+            # idf counts every row, so filtering does not change the scores of the rows that remain
+            idf = np.log(1.0 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            if allowed is not None:
+                keep = allowed[ids]
+                ids, freqs = ids[keep], freqs[keep]
+                if len(ids) == 0:
+                    continue
+            lists.append((ids, freqs))
+            weights.append(weight * idf)
+            bounds.append(weight * idf * self._saturate(max_tf, min_length, average))
+        if not lists:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        order = np.argsort(bounds)[::-1]
+        # remaining[i]: best score the terms from position i on can still add to a row
+        remaining = np.concatenate((np.cumsum(np.asarray(bounds)[order][::-1])[::-1], [0.0]))
+
+        scores = np.zeros(count, dtype=np.float32)
+        if exclude is not None:
+            # excluded rows can neither raise the pruning threshold nor be returned
+            scores[exclude[exclude < count]] = -np.inf
+        survivors = None  # rows that can still reach the top k, once the remaining terms are non-essential
+        threshold = 0.0
+        for position, term in enumerate(order):
+            ids, freqs = lists[term]
+            if survivors is None and prune and 0 < threshold and remaining[position] < threshold:
+                # the remaining terms are non-essential: rows none of the scored terms matched cannot reach the top k
+                survivors = np.flatnonzero(scores + remaining[position] >= threshold)
+            elif survivors is not None:
+                survivors = survivors[scores[survivors] + remaining[position] >= threshold]
+            if survivors is None or len(survivors) * 8 > len(ids):
+                # essential term, or too many survivors for probing to pay off (other rows stay below the threshold)
+                scores[ids] += weights[term] * self._saturate(freqs, lengths[ids], average)
+            else:
+                slots = np.minimum(np.searchsorted(ids, survivors), len(ids) - 1)
+                hit = ids[slots] == survivors
+                rows = survivors[hit]
+                scores[rows] += weights[term] * self._saturate(freqs[slots[hit]], lengths[rows], average)
+            if position + 1 < len(order):
+                # k-th best score among the rows just scored, a lower bound on the overall k-th best
+                pool = scores[ids] if survivors is None else scores[survivors]
+                if len(pool) >= top_k:
+                    threshold = max(threshold, float(np.partition(pool, len(pool) - top_k)[len(pool) - top_k]))
+
+        best = top_k_indices(scores, top_k)
+        best = best[scores[best] > 0]
+        return best.astype(np.int64), scores[best]
+
+    def _saturate(self, tf: Union[np.ndarray, int], length: Union[np.ndarray, int], average: float):
+        """BM25 term frequency component, without the idf factor"""
+        return tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average))
+
+    def arrays(self, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Postings in CSR form plus document lengths and vocabulary, for persistence
+
+        Args:
+            rows: Only these rows (ascending), renumbered from 0; terms left without postings are dropped,
+                the score bounds of the others are kept since they still bound the remaining rows
+
+        Returns:
+            Mapping of array name to array
+        """
+        with self._lock:
+            sizes = np.array([len(ids) for ids in self._postings], dtype=np.int64)
+            term_ids = list(range(len(self._postings)))
+            postings = [np.asarray(self._term_lists(term_id)[0]) for term_id in term_ids]
+            freqs = [np.asarray(self._term_lists(term_id)[1]) for term_id in term_ids]
+            terms = sorted(self._terms, key=self._terms.get)
+            arrays = {
+                "lengths": self._lengths[:self._count].copy(),
+                "postings": np.concatenate(postings) if postings else np.zeros(0, dtype=np.int32),
+                "freqs": np.concatenate(freqs) if freqs else np.zeros(0, dtype=np.int32),
+                "max_tf": np.array(self._max_tf, dtype=np.int32),
+                "min_length": np.array(self._min_length, dtype=np.int32),
+            }
+        if rows is not None:
+            keep, postings = renumber(arrays["postings"], rows, len(arrays["lengths"]))
+            sizes = np.bincount(np.repeat(np.arange(len(sizes)), sizes)[keep], minlength=len(sizes))
+            used = sizes > 0
+            terms = [term for term, kept in zip(terms, used.tolist()) if kept]
+            arrays.update(lengths=arrays["lengths"][rows], postings=postings.astype(np.int32),
+                          freqs=arrays["freqs"][keep], max_tf=arrays["max_tf"][used],
+                          min_length=arrays["min_length"][used])
+            sizes = sizes[used]
+        arrays["offsets"] = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+        arrays["terms"] = np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8)
+        return arrays
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Replace the contents with arrays produced by arrays()
+
+        Args:
+            arrays: Mapping of array name to array, arrays may be memory-mapped
+        """
+        offsets, postings, freqs = arrays["offsets"], arrays["postings"], arrays["freqs"]
+        terms = bytes(arrays["terms"]).decode("utf-8").split("\n") if len(arrays["terms"]) else []
+        with self._lock:
+            self._terms = {term: term_id for term_id, term in enumerate(terms)}
+            self._postings = [postings[offsets[i]:offsets[i + 1]] for i in range(len(terms))]
+            self._freqs = [freqs[offsets[i]:offsets[i + 1]] for i in range(len(terms))]
+            self._max_tf = array("i", np.asarray(arrays["max_tf"], dtype=np.int32).tobytes())
+            self._min_length = array("i", np.asarray(arrays["min_length"], dtype=np.int32).tobytes())
+            self._lengths = np.array(arrays["lengths"], dtype=np.int32)
+            self._count = len(self._lengths)
+            self._total_length = int(self._lengths.sum())
+
+    def clear(self) -> None:
+        """Remove all rows and terms"""
+        with self._lock:
+            self._terms: Dict[str, int] = {}
+            self._postings: List[Union[array, np.ndarray]] = []
+            self._freqs: List[Union[array, np.ndarray]] = []
+            self._max_tf = array("i")  # per term, for score upper bounds
+            self._min_length = array("i")
+            self._lengths = np.zeros(self._initial_capacity, dtype=np.int32)
+            self._count = 0
+            self._total_length = 0
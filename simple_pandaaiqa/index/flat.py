@@ -0,0 +1,284 @@
+"""
+Flat vector index for PandaAIQA
+Exact inner-product search over a contiguous matrix of normalized vectors
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from simple_pandaaiqa.index.quantization import VectorMatrix
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize vectors row by row
+
+    Args:
+        vectors: Array of shape (dim,) or (n, dim)
+
+    Returns:
+        Float32 array of shape (n, dim); zero rows are left as zeros
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the top_k highest scores, best first
+
+    Uses argpartition so only the selected candidates are fully sorted.
+
+    Args:
+        scores: 1-D score array
+        top_k: Number of indices to return
+
+    Returns:
+        Index array of length min(top_k, len(scores))
+    """
+    top_k = min(top_k, len(scores))
+    if top_k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if top_k < len(scores):
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def in_sorted(values: np.ndarray, sorted_ids: np.ndarray) -> np.ndarray:
+    """
+    Which values occur in a sorted id array, by binary search
+
+    Args:
+        values: Ids to look up, in any order
+        sorted_ids: Ascending ids
+
+    Returns:
+        Boolean mask, one entry per value
+    """
+    if len(sorted_ids) == 0:
+        return np.zeros(len(values), dtype=bool)
+    slots = np.minimum(np.searchsorted(sorted_ids, values), len(sorted_ids) - 1)
+    return sorted_ids[slots] == values
+
+
+def renumber(ids: np.ndarray, rows: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Map row ids into an index that keeps only some of its rows, in order
+
+    Args:
+        ids: Row ids to map
+        rows: Rows that are kept, ascending
+        count: Rows before dropping
+
+    Returns:
+        Tuple of (mask of the ids that are kept, their new row ids)
+    """
+    remap = np.full(count, -1, dtype=np.int64)
+    remap[rows] = np.arange(len(rows))
+    mapped = remap[ids]
+    keep = mapped >= 0
+    return keep, mapped[keep]
+
+
+class FlatIndex:
+    """Exact search index, one matrix-vector product per query or matrix product per batch"""
+
+    def __init__(self, dim: int, dtype: str = "float32", rescore: bool = False,
+                 rescore_factor: int = 4, initial_capacity: int = 1024, growth_factor: float = 2.0):
+        """
+        Initialize flat index
+
+        Args:
+            dim: Vector dimension
+            dtype: Storage dtype for scoring, "float32", "float16" or "int8"
+            rescore: Keep float32 copies and re-rank the best candidates with them
+            rescore_factor: Candidates re-ranked per requested result
+            initial_capacity: Rows allocated up front
+            growth_factor: Capacity multiplier when the matrix is full
+        """
+        self.dim = dim
+        self.dtype = dtype
+        self.rescore_factor = max(1, rescore_factor)
+        self._matrix = VectorMatrix(dim, dtype, initial_capacity, growth_factor)
+        self._full = None
+        if rescore and dtype != "float32":
+            self._full = VectorMatrix(dim, "float32", initial_capacity, growth_factor)
+        logger.info(f"Initialized flat index, dim={dim}, dtype={dtype}, rescore={self._full is not None}")
+
+    def __len__(self) -> int:
+        return len(self._matrix)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Stored (normalized) vectors as float32, decoded if compressed"""
+        return self._full.codes if self._full is not None else self._matrix.rows()
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held for stored vectors, including rescoring copies"""
+        return self._matrix.nbytes + (self._full.nbytes if self._full is not None else 0)
+
+    def get_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """Decode selected rows to float32"""
+        return self._full.rows(ids) if self._full is not None else self._matrix.rows(ids)
+
+    def arrays(self, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Stored arrays by name, for persistence
+
+        Args:
+            rows: Only these rows (ascending), renumbered from 0; all rows if None
+
+        Returns:
+            Mapping of array name to array, views of the stored rows unless rows are given
+        """
+        select = slice(None) if rows is None else rows
+        arrays = {"codes": self._matrix.codes[select]}
+        if self._matrix.scales is not None:
+            arrays["scales"] = self._matrix.scales[select]
+        if self._full is not None:
+            arrays["full"] = self._full.codes[select]
+        return arrays
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Replace the contents with arrays produced by arrays()
+
+        Args:
+            arrays: Mapping of array name to array, arrays may be memory-mapped
+        """
+        self._matrix.load(arrays["codes"], arrays.get("scales"))
+        if self._full is not None:
+            self._full.load(arrays["full"] if "full" in arrays else self._matrix.rows())
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Append vectors to the index
+
+        Args:
+            vectors: Array of shape (n, dim)
+
+        Returns:
+            Row ids assigned to the new vectors
+        """
+        vectors = normalize_rows(vectors)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+
+        start = self._matrix.append(vectors)
+        if self._full is not None:
+            self._full.append(vectors)
+        return np.arange(start, len(self._matrix))
+
+    def search(self, query: np.ndarray, top_k: int, candidates: Optional[np.ndarray] = None,
+               exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the rows most similar to a query vector
+
+        Args:
+            query: Query vector of shape (dim,)
+            top_k: Number of results to return
+            candidates: Restrict scoring to these row ids
+            exclude: Row ids never returned (deleted rows), ascending
+
+        Returns:
+            Tuple of (row ids, cosine scores), best first
+        """
+        candidates, exclude = self._live(candidates, exclude)
+        if len(self._matrix) == 0 or (candidates is not None and len(candidates) == 0):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query = normalize_rows(query)[0]
+        scores = self._matrix.scores(query, candidates)
+        keep = top_k * self.rescore_factor if self._full is not None else top_k
+        best = self._best(scores, keep, exclude)
+        ids = best if candidates is None else candidates[best]
+        if self._full is None:
+            return ids, scores[best]
+
+        # re-rank the compressed-score shortlist at full precision
+        exact = self._full.scores(query, ids)
+        order = top_k_indices(exact, top_k)
+        return ids[order], exact[order]
+
+    def search_batch(self, queries: np.ndarray, top_k: int, max_scores: int = 16 * 1024 * 1024,
+                     candidates: Optional[np.ndarray] = None,
+                     exclude: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Find the rows most similar to each of several query vectors
+
+        Queries are scored as one matrix-matrix product per block of queries
+        instead of one matrix-vector product each, which streams the stored
+        matrix through memory once per block.
+
+        Args:
+            queries: Query vectors of shape (n, dim)
+            top_k: Number of results per query
+            max_scores: Query-by-row scores computed at a time, bounds the score matrix
+            candidates: Restrict scoring to these row ids
+            exclude: Row ids never returned (deleted rows), ascending
+
+        Returns:
+            One (row ids, cosine scores) tuple per query, best first
+        """
+        queries = normalize_rows(queries)
+        candidates, exclude = self._live(candidates, exclude)
+        if len(self._matrix) == 0 or (candidates is not None and len(candidates) == 0):
+            return [self.search(query, top_k, candidates) for query in queries]
+
+        keep = top_k * self.rescore_factor if self._full is not None else top_k
+        block = max(1, max_scores // (len(self._matrix) if candidates is None else len(candidates)))
+        results = []
+        for start in range(0, len(queries), block):
+            block_queries = queries[start:start + block]
+            scores = self._matrix.scores(block_queries, candidates)
+            for query, row_scores in zip(block_queries, scores):
+                best = self._best(row_scores, keep, exclude)
+                ids = best if candidates is None else candidates[best]
+                if self._full is None:
+                    results.append((ids, row_scores[best]))
+                    continue
+                exact = self._full.scores(query, ids)
+                order = top_k_indices(exact, top_k)
+                results.append((ids[order], exact[order]))
+        return results
+
+    @staticmethod
+    def _live(candidates: Optional[np.ndarray],
+              exclude: Optional[np.ndarray]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Drop excluded rows from the candidates up front
+
+        Returns:
+            Tuple of (candidates, rows whose scores must still be masked)
+        """
+        if exclude is None or len(exclude) == 0:
+            return candidates, None
+        if candidates is None:
+            return None, exclude
+        return candidates[~in_sorted(candidates, exclude)], None
+
+    @staticmethod
+    def _best(scores: np.ndarray, top_k: int, exclude: Optional[np.ndarray]) -> np.ndarray:
+        """Top scores of one query, masking excluded rows out of a full scan (modifies scores)"""
+        if exclude is None:
+            return top_k_indices(scores, top_k)
+        scores[exclude] = -np.inf
+        best = top_k_indices(scores, top_k)
+        return best[scores[best] > -np.inf]
+
+    def clear(self) -> None:
+        """Remove all vectors and release grown storage"""
+        self._matrix.clear()
+        if self._full is not None:
+            self._full.clear()
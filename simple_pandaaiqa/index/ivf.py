@@ -0,0 +1,371 @@
+"""
+IVF vector index for PandaAIQA
+Approximate search with k-means coarse quantization and inverted lists
+"""
+
+import logging
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from simple_pandaaiqa.index.flat import FlatIndex, in_sorted, normalize_rows, renumber, top_k_indices
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Cluster unit vectors by cosine similarity
+
+    Args:
+        vectors: Normalized training vectors of shape (n, dim)
+        k: Number of centroids
+        iterations: Lloyd iterations
+        seed: Random seed for centroid initialization
+
+    Returns:
+        Normalized centroids of shape (k, dim)
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_to_centroids(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        order = np.argsort(assignment, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+        # re-seed empty clusters with random training points
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray, block_size: int = 65536) -> np.ndarray:
+    """
+    Nearest centroid for each vector, computed in blocks to bound memory
+
+    Args:
+        vectors: Normalized vectors of shape (n, dim)
+        centroids: Normalized centroids of shape (k, dim)
+        block_size: Rows scored per matrix product
+
+    Returns:
+        Centroid index per vector
+    """
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFIndex:
+    """Inverted-file index: only the nprobe closest clusters are scored per query"""
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = 0,
+        nprobe: int = 16,
+        min_train_size: int = 10000,
+        retrain_growth: float = 4.0,
+        dtype: str = "float32",
+        rescore: bool = False,
+    ):
+        """
+        Initialize IVF index
+
+        Args:
+            dim: Vector dimension
+            nlist: Number of clusters, 0 picks 4 * sqrt(n) at training time
+            nprobe: Clusters scored per query (higher = better recall, slower)
+            min_train_size: Below this many vectors the index searches exactly
+            retrain_growth: Retrain once the index grows by this factor since last training
+            dtype: Vector storage dtype, see FlatIndex
+            rescore: Re-rank candidates with float32 copies, see FlatIndex
+        """
+        self.dim = dim
+        self.dtype = dtype
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self._flat = FlatIndex(dim, dtype=dtype, rescore=rescore)
+        self._centroids: Optional[np.ndarray] = None
+        # inverted lists: array("q") while growing, read-only int64 views after loading
+        self._lists: List[Union[array, np.ndarray]] = []
+        self._trained_size = 0
+        # searches read the lists while adds extend them (an exported array cannot be resized)
+        self._lock = threading.Lock()
+        logger.info(f"Initialized IVF index, dim={dim}, nlist={nlist or 'auto'}, nprobe={nprobe}")
+
+    def __len__(self) -> int:
+        return len(self._flat)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the stored (normalized) vectors"""
+        return self._flat.vectors
+
+    def get_vectors(self, ids: np.ndarray) -> np.ndarray:
+        """Decode selected rows to float32"""
+        return self._flat.get_vectors(ids)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held for stored vectors and centroids"""
+        return self._flat.nbytes + (self._centroids.nbytes if self._centroids is not None else 0)
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def arrays(self, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Stored vectors plus centroids and inverted lists, for persistence
+
+        Args:
+            rows: Only these rows (ascending), renumbered from 0, see FlatIndex.arrays
+
+        Returns:
+            Mapping of array name to array
+        """
+        arrays = self._flat.arrays(rows)
+        with self._lock:
+            if not self.is_trained:
+                return arrays
+            lengths = np.array([len(members) for members in self._lists], dtype=np.int64)
+            list_ids = np.concatenate(
+                [self._list_ids(list_id) for list_id in range(len(self._lists))]
+            ) if lengths.sum() else np.zeros(0, dtype=np.int64)
+            centroids, trained_size = self._centroids, self._trained_size
+        if rows is not None:
+            # dropped rows leave their lists, the clusters themselves stay as trained
+            keep, list_ids = renumber(list_ids, rows, len(self))
+            lengths = np.bincount(np.repeat(np.arange(len(lengths)), lengths)[keep], minlength=len(lengths))
+        arrays["centroids"] = centroids
+        arrays["list_offsets"] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        arrays["list_ids"] = list_ids
+        arrays["trained_size"] = np.array([trained_size], dtype=np.int64)
+        return arrays
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Replace the contents with arrays produced by arrays()
+
+        Args:
+            arrays: Mapping of array name to array, arrays may be memory-mapped
+        """
+        self._flat.load_arrays(arrays)
+        self._centroids = None
+        self._lists = []
+        self._trained_size = 0
+        if "centroids" in arrays:
+            self._centroids = np.asarray(arrays["centroids"])
+            offsets, ids = arrays["list_offsets"], arrays["list_ids"]
+            self._lists = [ids[offsets[i]:offsets[i + 1]] for i in range(len(self._centroids))]
+            self._trained_size = int(arrays["trained_size"][0])
+        elif len(self) >= self.min_train_size:
+            self.train()
+
+    def train(self) -> None:
+        """(Re)build centroids and inverted lists from all stored vectors"""
+        count = len(self)
+        if count == 0:
+            return
+
+        start = time.perf_counter()
+        nlist = self.nlist or int(4 * np.sqrt(count))
+        nlist = max(1, min(nlist, count))
+        # ~40 points per centroid is enough for k-means to converge
+        sample_size = min(count, nlist * 40)
+        sample_ids = np.sort(np.random.default_rng(0).choice(count, size=sample_size, replace=False))
+        centroids = spherical_kmeans(self._flat.get_vectors(sample_ids), nlist)
+        # build the new lists aside, searches keep using the old ones until the swap
+        lists = [array("q") for _ in range(len(centroids))]
+        for block_start in range(0, count, 65536):
+            row_ids = np.arange(block_start, min(block_start + 65536, count))
+            self._assign(row_ids, self._flat.get_vectors(row_ids), centroids, lists)
+        with self._lock:
+            self._centroids, self._lists, self._trained_size = centroids, lists, count
+        logger.info(f"Trained IVF index with {len(centroids)} lists on {count} vectors "
+                    f"in {time.perf_counter() - start:.2f}s")
+
+    @staticmethod
+    def _assign(row_ids: np.ndarray, vectors: np.ndarray, centroids: np.ndarray,
+                lists: List[Union[array, np.ndarray]]) -> None:
+        """Append rows to the inverted list of their nearest centroid"""
+        assignment = assign_to_centroids(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        boundaries = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+        for list_id in range(len(centroids)):
+            members = row_ids[order[boundaries[list_id]:boundaries[list_id + 1]]]
+            if len(members):
+                if not isinstance(lists[list_id], array):
+                    lists[list_id] = array("q", np.asarray(lists[list_id]).tobytes())
+                lists[list_id].extend(members.tolist())
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Append vectors, assigning them to existing clusters incrementally
+
+        Args:
+            vectors: Array of shape (n, dim)
+
+        Returns:
+            Row ids assigned to the new vectors
+        """
+        row_ids = self._flat.add(vectors)
+        if len(row_ids) == 0:
+            return row_ids
+        if not self.is_trained:
+            if len(self) >= self.min_train_size:
+                self.train()
+        elif len(self) >= self._trained_size * self.retrain_growth:
+            self.train()
+        else:
+            vectors = self._flat.get_vectors(row_ids)
+            with self._lock:
+                self._assign(row_ids, vectors, self._centroids, self._lists)
+        return row_ids
+
+    def _list_ids(self, list_id: int) -> np.ndarray:
+        """Row ids of one inverted list as an int64 array (no copy)"""
+        members = self._lists[list_id]
+        return np.frombuffer(members, dtype=np.int64) if isinstance(members, array) else members
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Row ids in the nprobe clusters closest to the query"""
+        with self._lock:
+            probe = top_k_indices(self._centroids @ query, nprobe)
+            lists = [self._list_ids(list_id) for list_id in probe if len(self._lists[list_id])]
+            # concatenate copies, so no buffer stays exported once the lock is released
+            return np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64)
+
+    def _selective(self, candidates: Optional[np.ndarray], nprobe: int) -> bool:
+        """Whether scoring all candidate rows exactly is no more work than probing nprobe clusters"""
+        return candidates is not None and len(candidates) * len(self._lists) <= nprobe * len(self)
+
+    @staticmethod
+    def _restrict(probed: np.ndarray, candidates: Optional[np.ndarray]) -> np.ndarray:
+        """Probed rows that are also candidates, candidates must be sorted"""
+        if candidates is None or len(probed) == 0:
+            return probed
+        return probed[in_sorted(probed, candidates)]
+
+    def search(self, query: np.ndarray, top_k: int, nprobe: Optional[int] = None,
+               candidates: Optional[np.ndarray] = None,
+               exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find approximately the rows most similar to a query vector
+
+        Restricted to few enough candidates, those are scored exactly instead
+        of probing clusters.
+
+        Args:
+            query: Query vector of shape (dim,)
+            top_k: Number of results to return
+            nprobe: Override the number of clusters scored
+            candidates: Restrict results to these row ids, sorted
+            exclude: Row ids never returned (deleted rows), ascending
+
+        Returns:
+            Tuple of (row ids, cosine scores), best first
+        """
+        nprobe = nprobe or self.nprobe
+        if not self.is_trained or self._selective(candidates, nprobe):
+            return self._flat.search(query, top_k, candidates=candidates, exclude=exclude)
+
+        query = normalize_rows(query)[0]
+        probed = self._restrict(self._candidates(query, nprobe), candidates)
+        return self._flat.search(query, top_k, candidates=probed, exclude=exclude)
+
+    def search_batch(self, queries: np.ndarray, top_k: int, nprobe: Optional[int] = None,
+                     max_scores: int = 16 * 1024 * 1024,
+                     candidates: Optional[np.ndarray] = None,
+                     exclude: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Find approximately the rows most similar to each of several query vectors
+
+        Centroids are scored for all queries with one matrix product; each
+        query then scores its own candidate lists, since those differ per query.
+
+        Args:
+            queries: Query vectors of shape (n, dim)
+            top_k: Number of results per query
+            nprobe: Override the number of clusters scored
+            max_scores: See FlatIndex.search_batch, used while the index is untrained
+            candidates: Restrict results to these row ids, sorted, see search()
+            exclude: Row ids never returned (deleted rows), ascending
+
+        Returns:
+            One (row ids, cosine scores) tuple per query, best first
+        """
+        nprobe = nprobe or self.nprobe
+        if not self.is_trained or self._selective(candidates, nprobe):
+            return self._flat.search_batch(queries, top_k, max_scores=max_scores, candidates=candidates,
+                                           exclude=exclude)
+
+        queries = normalize_rows(queries)
+        with self._lock:
+            centroid_scores = queries @ self._centroids.T
+            candidate_sets = []
+            for row in centroid_scores:
+                lists = [self._list_ids(list_id) for list_id in top_k_indices(row, nprobe)
+                         if len(self._lists[list_id])]
+                probed = np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64)
+                candidate_sets.append(self._restrict(probed, candidates))
+        return [self._flat.search(query, top_k, candidates=candidates, exclude=exclude)
+                for query, candidates in zip(queries, candidate_sets)]
+
+    def recall_at_k(
+        self, queries: np.ndarray, top_k: int = 10, nprobe_values: Optional[List[int]] = None
+    ) -> Dict[int, Dict[str, float]]:
+        """
+        Measure recall@k and latency against exact search
+
+        Args:
+            queries: Query vectors of shape (q, dim)
+            top_k: k for recall@k
+            nprobe_values: nprobe settings to evaluate, defaults to the current one
+
+        Returns:
+            Mapping nprobe -> {"recall": ..., "query_ms": ..., "exact_ms": ...}
+        """
+        queries = normalize_rows(queries)
+        start = time.perf_counter()
+        exact = [set(self._flat.search(query, top_k)[0].tolist()) for query in queries]
+        exact_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+
+        report = {}
+        for nprobe in nprobe_values or [self.nprobe]:
+            hits = 0
+            start = time.perf_counter()
+            approximate = [self.search(query, top_k, nprobe=nprobe)[0] for query in queries]
+            query_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+            for truth, found in zip(exact, approximate):
+                hits += len(truth.intersection(found.tolist()))
+            total = sum(len(truth) for truth in exact)
+            report[nprobe] = {
+                "recall": hits / total if total else 1.0,
+                "query_ms": query_ms,
+                "exact_ms": exact_ms,
+            }
+        return report
+
+    def clear(self) -> None:
+        """Remove all vectors and centroids"""
+        self._flat.clear()
+        self._centroids = None
+        self._lists = []
+        self._trained_size = 0
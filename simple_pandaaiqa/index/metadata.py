@@ -0,0 +1,197 @@
+"""
+Metadata index for PandaAIQA
+Inverted indexes from metadata values to sorted row id arrays, so filtered
+searches score only the rows that match
+"""
+
+import json
+import logging
+import threading
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from simple_pandaaiqa.index.flat import renumber
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FilterValue = Union[str, int, float, bool]
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, List[FilterValue]]]:
+    """
+    Validate search filters
+
+    Each metadata field maps to a value or a list of accepted values. A row
+    matches when every field has one of its accepted values.
+
+    Args:
+        filters: Filters as given, e.g. {"source": "handbook.pdf", "type": ["pdf", "txt"]}
+
+    Returns:
+        Mapping of field to accepted values, None when no filters are given
+
+    Raises:
+        ValueError: If the filters are malformed
+    """
+    if not filters:
+        return None
+    if not isinstance(filters, dict):
+        raise ValueError("Filters must map metadata fields to values")
+    normalized = {}
+    for field, values in filters.items():
+        values = values if isinstance(values, list) else [values]
+        if not values:
+            raise ValueError(f"No values given for filter field: {field}")
+        for value in values:
+            if not isinstance(value, (str, int, float, bool)):
+                raise ValueError(f"Filter values must be strings, numbers or booleans, got {value!r} for {field}")
+        normalized[str(field)] = values
+    return normalized
+
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> str:
+    """Canonical form of filters for cache keys, equal for filters that match the same rows"""
+    normalized = normalize_filters(filters)
+    if normalized is None:
+        return ""
+    return json.dumps({field: sorted({json.dumps(value) for value in values})
+                       for field, values in normalized.items()}, sort_keys=True)
+
+
+def _value_key(field: str, value: FilterValue) -> str:
+    # JSON keeps 1, 1.0, "1" and true apart, and never contains a newline
+    return json.dumps([field, value], ensure_ascii=False)
+
+
+class MetadataIndex:
+    """
+    Rows by metadata value, for every scalar metadata field
+
+    Row lists grow as array("q") in row order, so they are always sorted, and
+    are read-only int64 views after loading, like the IVF inverted lists.
+    Values that are not strings, numbers or booleans are not indexed.
+    """
+
+    def __init__(self):
+        """Initialize metadata index"""
+        # filters copy the lists they read while adds extend them (an exported array cannot be resized)
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """
+        Index the metadata of the next rows
+
+        Args:
+            metadatas: Metadata dictionaries, one per row
+        """
+        with self._lock:
+            for metadata in metadatas:
+                for field, value in metadata.items():
+                    if not isinstance(value, (str, int, float, bool)):
+                        continue
+                    key = _value_key(field, value)
+                    rows = self._rows.get(key)
+                    if rows is None:
+                        rows = self._rows[key] = array("q")
+                    elif not isinstance(rows, array):
+                        rows = self._rows[key] = array("q", np.asarray(rows).tobytes())
+                    rows.append(self._count)
+                self._count += 1
+
+    def _copy(self, key: str) -> np.ndarray:
+        """Rows of a value as an int64 array, copied if the list is still growing (call with the lock held)"""
+        rows = self._rows.get(key)
+        if rows is None:
+            return np.zeros(0, dtype=np.int64)
+        if isinstance(rows, array):
+            return np.frombuffer(rows, dtype=np.int64).copy()
+        return rows
+
+    def rows(self, filters: Dict[str, List[FilterValue]]) -> np.ndarray:
+        """
+        Rows matching filters, see normalize_filters
+
+        Args:
+            filters: Normalized filters
+
+        Returns:
+            Sorted row ids
+        """
+        matched = None
+        for field, values in filters.items():
+            with self._lock:
+                lists = [self._copy(_value_key(field, value)) for value in values]
+            field_rows = lists[0] if len(lists) == 1 else np.unique(np.concatenate(lists))
+            matched = field_rows if matched is None else np.intersect1d(matched, field_rows, assume_unique=True)
+            if len(matched) == 0:
+                break
+        return matched
+
+    def values(self, field: str) -> List[FilterValue]:
+        """
+        Indexed values of a field, including values whose rows were all deleted from the store
+
+        Args:
+            field: Metadata field
+
+        Returns:
+            Values in the order they were first seen
+        """
+        with self._lock:
+            keys = list(self._rows)
+        return [value for key_field, value in map(json.loads, keys) if key_field == field]
+
+    def arrays(self, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Row lists in CSR form plus their keys, for persistence
+
+        Args:
+            rows: Only these rows (ascending), renumbered from 0; values left without rows are dropped
+
+        Returns:
+            Mapping of array name to array
+        """
+        with self._lock:
+            keys = list(self._rows)
+            lists = [np.asarray(self._copy(key)) for key in keys]
+            count = self._count
+        sizes = np.array([len(rows) for rows in lists], dtype=np.int64)
+        flat = np.concatenate(lists) if lists else np.zeros(0, dtype=np.int64)
+        if rows is not None:
+            keep, flat = renumber(flat, rows, count)
+            sizes = np.bincount(np.repeat(np.arange(len(sizes)), sizes)[keep], minlength=len(sizes))
+            keys = [key for key, size in zip(keys, sizes.tolist()) if size]
+            sizes, count = sizes[sizes > 0], len(rows)
+        return {
+            "count": np.array([count], dtype=np.int64),
+            "offsets": np.concatenate(([0], np.cumsum(sizes))).astype(np.int64),
+            "rows": flat,
+            "keys": np.frombuffer("\n".join(keys).encode("utf-8"), dtype=np.uint8),
+        }
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """
+        Replace the contents with arrays produced by arrays()
+
+        Args:
+            arrays: Mapping of array name to array, arrays may be memory-mapped
+        """
+        offsets, rows = arrays["offsets"], arrays["rows"]
+        keys = bytes(arrays["keys"]).decode("utf-8").split("\n") if len(arrays["keys"]) else []
+        with self._lock:
+            self._rows = {key: rows[offsets[i]:offsets[i + 1]] for i, key in enumerate(keys)}
+            self._count = int(arrays["count"][0])
+
+    def clear(self) -> None:
+        """Remove all rows"""
+        with self._lock:
+            self._rows: Dict[str, Union[array, np.ndarray]] = {}
+            self._count = 0
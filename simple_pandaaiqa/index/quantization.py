@@ -0,0 +1,201 @@
+"""
+Vector quantization for PandaAIQA
+Compact float16 / int8 row storage that is scored without full decompression
+"""
+
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+GATHER_COST = 4  # scoring a row picked by id costs about as much as scanning this many contiguous rows
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Encode float32 vectors in a compact dtype
+
+    int8 uses one float32 scale per vector (max |x| / 127), so each row keeps
+    its full dynamic range.
+
+    Args:
+        vectors: Float32 array of shape (n, dim)
+        dtype: One of VECTOR_DTYPES
+
+    Returns:
+        Tuple of (codes, per-row scales or None)
+    """
+    if dtype == "float32":
+        return vectors.astype(np.float32, copy=False), None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unsupported vector dtype: {dtype}")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Decode quantized rows back to float32
+
+    Args:
+        codes: Encoded rows
+        scales: Per-row scales for int8 codes
+
+    Returns:
+        Float32 array with the same shape as codes
+    """
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+
+class VectorMatrix:
+    """Growable row matrix stored as float32, float16 or int8"""
+
+    def __init__(self, dim: int, dtype: str = "float32", initial_capacity: int = 1024,
+                 growth_factor: float = 2.0, block_size: int = 1024):
+        """
+        Initialize vector matrix
+
+        Args:
+            dim: Vector dimension
+            dtype: Storage dtype, one of VECTOR_DTYPES
+            initial_capacity: Rows allocated up front
+            growth_factor: Capacity multiplier when the matrix is full
+            block_size: Rows decoded per step while scoring compressed storage
+        """
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.growth_factor = max(growth_factor, 1.1)
+        self.block_size = block_size
+        self._initial_capacity = max(1, initial_capacity)
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the stored rows (excluding spare capacity)"""
+        row_bytes = self._codes.itemsize * self.dim + (4 if self._scales is not None else 0)
+        return row_bytes * self._count
+
+    @property
+    def codes(self) -> np.ndarray:
+        """View of the encoded rows"""
+        return self._codes[:self._count]
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        """View of the per-row int8 scales, None for float storage"""
+        return None if self._scales is None else self._scales[:self._count]
+
+    def _reserve(self, capacity: int) -> None:
+        """Grow storage geometrically so appends are amortized O(1) per row"""
+        if capacity <= self._codes.shape[0]:
+            return
+        new_capacity = max(capacity, int(self._codes.shape[0] * self.growth_factor) + 1)
+        codes = np.zeros((new_capacity, self.dim), dtype=self._codes.dtype)
+        codes[:self._count] = self._codes[:self._count]
+        self._codes = codes
+        if self._scales is not None:
+            scales = np.ones(new_capacity, dtype=np.float32)
+            scales[:self._count] = self._scales[:self._count]
+            self._scales = scales
+
+    def append(self, vectors: np.ndarray) -> int:
+        """
+        Encode and append float32 rows
+
+        Args:
+            vectors: Float32 array of shape (n, dim)
+
+        Returns:
+            Row index of the first appended vector
+        """
+        codes, scales = quantize(vectors, self.dtype)
+        start = self._count
+        self._reserve(start + len(codes))
+        self._codes[start:start + len(codes)] = codes
+        if scales is not None:
+            self._scales[start:start + len(codes)] = scales
+        self._count += len(codes)
+        return start
+
+    def load(self, codes: np.ndarray, scales: Optional[np.ndarray] = None) -> None:
+        """
+        Replace the contents with already encoded rows, without copying
+
+        Args:
+            codes: Encoded rows, may be a read-only memory map
+            scales: Per-row scales for int8 codes
+        """
+        self._codes = codes
+        self._scales = scales
+        self._count = len(codes)
+
+    def rows(self, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Decode rows to float32
+
+        Args:
+            ids: Row ids to decode, all rows if None
+
+        Returns:
+            Float32 array of shape (len(ids), dim)
+        """
+        if ids is None:
+            return dequantize(self.codes, self.scales)
+        return dequantize(self._codes[ids], None if self._scales is None else self._scales[ids])
+
+    def scores(self, query: np.ndarray, ids: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Inner products between float32 queries and stored rows
+
+        Compressed rows are decoded one block at a time, so scoring never
+        materializes a float32 copy of the whole matrix. A matrix of queries
+        is scored with one matrix-matrix product per block.
+
+        Args:
+            query: Float32 query of shape (dim,), or queries of shape (n, dim)
+            ids: Row ids to score, all rows if None
+
+        Returns:
+            Float32 scores, one per scored row, of shape (n, rows) for a query matrix
+        """
+        if ids is not None and len(ids) * GATHER_COST > self._count:
+            # a contiguous scan of all rows is cheaper than gathering most of them
+            return self.scores(query)[..., ids]
+
+        total = self._count if ids is None else len(ids)
+        queries = query.T
+        if self.dtype == "float32":
+            return (self.codes @ queries if ids is None else self._codes[ids] @ queries).T
+
+        scores = np.empty((total,) + query.shape[:-1], dtype=np.float32)
+        for start in range(0, total, self.block_size):
+            stop = min(start + self.block_size, total)
+            rows = slice(start, stop) if ids is None else ids[start:stop]
+            scores[start:stop] = self._codes[rows].astype(np.float32) @ queries
+            if self._scales is not None:
+                scores[start:stop] *= self._scales[rows].reshape((-1,) + (1,) * (query.ndim - 1))
+        return scores.T
+
+    def clear(self) -> None:
+        """Remove all rows and release grown storage"""
+        storage = np.int8 if self.dtype == "int8" else np.dtype(self.dtype)
+        self._codes = np.zeros((self._initial_capacity, self.dim), dtype=storage)
+        self._scales = np.ones(self._initial_capacity, dtype=np.float32) if self.dtype == "int8" else None
+        self._count = 0
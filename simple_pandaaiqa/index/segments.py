@@ -0,0 +1,329 @@
+"""
+Segment log for PandaAIQA
+Continuous persistence as a base snapshot plus append-only segments, one per
+add, and a tombstone file of deleted chunk ids, that compaction folds back
+into the base
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from simple_pandaaiqa.index.storage import (
+    MANIFEST_FILE,
+    MappedRecords,
+    is_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+BASE_DIR = "base"
+SEGMENTS_DIR = "segments"
+SEGMENT_PREFIX = "seg-"
+TOMBSTONES_FILE = "tombstones.bin"
+STALE_MARKER = ".stale-"  # segments and tombstones replaced by a new base, see SegmentLog.replace
+
+
+class SegmentLog:
+    """
+    Append-only log of added and deleted chunks on top of a base snapshot
+
+    Each segment is a small snapshot holding the float32 vectors and records
+    of one add, named after its first chunk id (chunk ids are assigned
+    consecutively and never reused, so they survive compaction dropping
+    deleted rows), so persisting an upload costs as much as the upload rather
+    than the whole knowledge base. Deleted chunk ids are appended to a
+    tombstone file. Segments and tombstones are deleted only once a base
+    snapshot covering them is in place, so the directory is replayable after
+    a crash at any point.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Open (or create) a log directory
+
+        Args:
+            directory: Log root, holding base/ and segments/
+        """
+        self.directory = os.path.abspath(directory)
+        self.base_dir = os.path.join(self.directory, BASE_DIR)
+        self.segments_dir = os.path.join(self.directory, SEGMENTS_DIR)
+        self.tombstones_path = os.path.join(self.directory, TOMBSTONES_FILE)
+        self._segments: List[Tuple[int, int, str]] = []  # (first chunk id, end chunk id, path), in id order
+        self._tombstones = 0  # chunk ids in the tombstone file
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._base_lock = threading.Lock()
+        os.makedirs(self.segments_dir, exist_ok=True)
+        self._recover()
+        self._scan()
+        self._tombstones = len(self.tombstones())
+        logger.info(f"Opened segment log at {self.directory} with {len(self._segments)} pending segments")
+
+    @property
+    def pending(self) -> int:
+        """Number of segments not yet folded into the base snapshot"""
+        return len(self._segments)
+
+    @property
+    def generation(self) -> int:
+        """Incremented by reset(), lets compaction detect that its state is stale"""
+        return self._generation
+
+    @property
+    def tombstone_count(self) -> int:
+        """Number of chunk ids in the tombstone file, lets compaction forget the ones it folded in"""
+        return self._tombstones
+
+    def _recover(self) -> None:
+        """Clean up after writes that were interrupted by a crash"""
+        stale = [name for name in os.listdir(self.directory) if name.startswith(f"{BASE_DIR}.old-")]
+        if stale and not is_snapshot(self.base_dir):
+            # crashed between moving the old base aside and moving the new one in
+            os.rename(os.path.join(self.directory, stale[0]), self.base_dir)
+            logger.warning(f"Restored base snapshot from {stale[0]}")
+        replaced = [name for name in os.listdir(self.directory) if STALE_MARKER in name]
+        if replaced:
+            token = self._base_info().get("replaces")
+            for name in replaced:
+                path = os.path.join(self.directory, name)
+                original, _, name_token = name.partition(STALE_MARKER)
+                if name_token != token:
+                    # crashed before the replacing base was in place, the old log is still the live one
+                    original = os.path.join(self.directory, original)
+                    if os.path.isdir(original):
+                        shutil.rmtree(original)
+                    elif os.path.exists(original):
+                        os.remove(original)
+                    os.rename(path, original)
+                    logger.warning(f"Restored {name} after an interrupted replace")
+                elif os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+        for parent in (self.directory, self.segments_dir):
+            for name in os.listdir(parent):
+                if ".tmp-" in name or ".old-" in name:
+                    path = os.path.join(parent, name)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path, ignore_errors=True)
+                    else:
+                        os.remove(path)
+        if os.path.exists(self.tombstones_path):
+            size = os.path.getsize(self.tombstones_path)
+            if size % 8:
+                # a crash left part of the last id behind, later appends must stay aligned
+                os.truncate(self.tombstones_path, size - size % 8)
+
+    def _base_info(self) -> Dict[str, Any]:
+        """Manifest of the base snapshot, empty if there is none"""
+        if not is_snapshot(self.base_dir):
+            return {}
+        with open(os.path.join(self.base_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _scan(self) -> None:
+        """Index the segments on disk by chunk id range"""
+        segments = []
+        for name in os.listdir(self.segments_dir):
+            path = os.path.join(self.segments_dir, name)
+            if not name.startswith(SEGMENT_PREFIX) or not is_snapshot(path):
+                continue
+            start = int(name[len(SEGMENT_PREFIX):])
+            with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                count = int(json.load(f)["count"])
+            segments.append((start, start + count, path))
+        self._segments = sorted(segments)
+
+    def open_base(self, verify: bool = False) -> Optional[Tuple[Dict[str, np.ndarray], MappedRecords, Dict[str, Any]]]:
+        """
+        Open the base snapshot, see read_snapshot
+
+        Returns:
+            Tuple of (arrays, records, manifest), or None if no base was written yet
+        """
+        if not is_snapshot(self.base_dir):
+            return None
+        return read_snapshot(self.base_dir, verify=verify)
+
+    def replay(self, start: int) -> Iterator[Tuple[np.ndarray, MappedRecords]]:
+        """
+        Segments that continue a store whose next chunk id is start, in order
+
+        Segments already covered by the base are skipped. A segment that does
+        not begin exactly where the previous one ended can never be applied,
+        so it and everything after it are dropped.
+
+        Args:
+            start: Chunk id the first segment to apply must begin with (the row count before any deletes)
+
+        Yields:
+            Tuple of (float32 vectors, records) per segment
+        """
+        for index, (seg_start, seg_end, path) in enumerate(list(self._segments)):
+            if seg_end <= start:
+                continue
+            if seg_start != start:
+                logger.warning(f"Segment log has a gap at row {start}, dropping segments from row {seg_start}")
+                self._drop(self._segments[index:])
+                return
+            arrays, records, _ = read_snapshot(path)
+            yield arrays["vectors"], records
+            start = seg_end
+
+    def append(self, start: int, vectors: np.ndarray, records: List[Dict[str, Any]]) -> int:
+        """
+        Durably write one segment
+
+        Callers must append in chunk id order.
+
+        Args:
+            start: Chunk id of the first vector, the others follow consecutively
+            vectors: Float32 vectors of shape (n, dim)
+            records: Records row-aligned with the vectors
+
+        Returns:
+            Number of pending segments
+        """
+        path = os.path.join(self.segments_dir, f"{SEGMENT_PREFIX}{start:012d}")
+        write_snapshot(path, {"vectors": np.asarray(vectors, dtype=np.float32)}, records, {"start": start})
+        with self._lock:
+            self._segments.append((start, start + len(records), path))
+            return len(self._segments)
+
+    def delete(self, ids: np.ndarray) -> int:
+        """
+        Durably record deleted chunk ids
+
+        Args:
+            ids: Chunk ids
+
+        Returns:
+            Number of chunk ids in the tombstone file
+        """
+        data = np.asarray(ids, dtype=np.int64).tobytes()
+        with self._lock:
+            with open(self.tombstones_path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._tombstones += len(ids)
+            return self._tombstones
+
+    def tombstones(self) -> np.ndarray:
+        """Chunk ids deleted since the base snapshot was written, in deletion order"""
+        try:
+            with open(self.tombstones_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return np.zeros(0, dtype=np.int64)
+        return np.frombuffer(data[:len(data) - len(data) % 8], dtype=np.int64).copy()
+
+    def compact(self, arrays: Dict[str, np.ndarray], records: Any, info: Dict[str, Any],
+                generation: Optional[int] = None, tombstones: int = 0) -> bool:
+        """
+        Write a new base snapshot and delete the segments and tombstones it covers
+
+        Args:
+            arrays: Index arrays for rows [0, len(records))
+            records: Records for the same rows
+            info: Extra manifest fields, next_id is the first chunk id the snapshot does not cover
+                (defaults to len(records))
+            generation: Value of generation when the state was captured
+            tombstones: Value of tombstone_count when the state was captured
+
+        Returns:
+            False if the log was reset after the state was captured
+        """
+        next_id = info.get("next_id", len(records))
+        with self._base_lock:
+            if generation is not None and generation != self._generation:
+                return False
+            write_snapshot(self.base_dir, arrays, records, info)
+            with self._lock:
+                covered = [segment for segment in self._segments if segment[1] <= next_id]
+                if tombstones:
+                    self._forget_tombstones(tombstones)
+            self._drop(covered)
+        return True
+
+    def replace(self, arrays: Dict[str, np.ndarray], records: Any, info: Dict[str, Any]) -> None:
+        """
+        Write a new base snapshot that replaces everything logged so far
+
+        The segments and tombstone file are moved aside before the base is
+        written and deleted once it is in place. The base manifest names them,
+        so after a crash in between they are restored if the old base is still
+        there and deleted otherwise. Callers must not append concurrently.
+
+        Args:
+            arrays: Index arrays for rows [0, len(records))
+            records: Records for the same rows
+            info: Extra manifest fields, see compact
+        """
+        token = uuid.uuid4().hex[:8]
+        stale_segments = f"{self.segments_dir}{STALE_MARKER}{token}"
+        stale_tombstones = f"{self.tombstones_path}{STALE_MARKER}{token}"
+        with self._base_lock:
+            self._generation += 1
+            with self._lock:
+                os.rename(self.segments_dir, stale_segments)
+                os.makedirs(self.segments_dir)
+                if os.path.exists(self.tombstones_path):
+                    os.rename(self.tombstones_path, stale_tombstones)
+                segments, self._segments = self._segments, []
+                tombstones, self._tombstones = self._tombstones, 0
+            try:
+                write_snapshot(self.base_dir, arrays, records, {**info, "replaces": token})
+            except Exception:
+                with self._lock:
+                    os.rmdir(self.segments_dir)
+                    os.rename(stale_segments, self.segments_dir)
+                    if os.path.exists(stale_tombstones):
+                        os.rename(stale_tombstones, self.tombstones_path)
+                    self._segments, self._tombstones = segments, tombstones
+                raise
+            shutil.rmtree(stale_segments, ignore_errors=True)
+            if os.path.exists(stale_tombstones):
+                os.remove(stale_tombstones)
+
+    def _forget_tombstones(self, count: int) -> None:
+        """Rewrite the tombstone file without its first count ids (call with the lock held)"""
+        remaining = self.tombstones()[count:]
+        temp_path = f"{self.tombstones_path}.tmp-{os.getpid()}"
+        with open(temp_path, "wb") as f:
+            f.write(remaining.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.tombstones_path)
+        self._tombstones = len(remaining)
+
+    def _drop(self, segments: List[Tuple[int, int, str]]) -> None:
+        """Forget segments and delete their directories"""
+        with self._lock:
+            self._segments = [segment for segment in self._segments if segment not in segments]
+        for _, _, path in segments:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def reset(self) -> None:
+        """Delete the base snapshot, all segments and tombstones"""
+        with self._base_lock:
+            self._generation += 1
+            with self._lock:
+                self._segments = []
+                self._tombstones = 0
+                if os.path.exists(self.tombstones_path):
+                    os.remove(self.tombstones_path)
+            shutil.rmtree(self.base_dir, ignore_errors=True)
+            shutil.rmtree(self.segments_dir, ignore_errors=True)
+            os.makedirs(self.segments_dir, exist_ok=True)
@@ -0,0 +1,252 @@
+"""
+Snapshot storage for PandaAIQA
+Binary on-disk format: memory-mapped .npy arrays, an offset-indexed record blob
+and a versioned manifest with checksums
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import uuid
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+RECORDS_FILE = "records.bin"
+OFFSETS_FILE = "record_offsets.npy"
+
+
+class MappedRecords:
+    """
+    Sequence of JSON records backed by a memory-mapped blob
+
+    Records are decoded on access, so opening a snapshot costs the same no
+    matter how many records it holds. Appended records are kept in memory
+    until the next snapshot is written.
+    """
+
+    def __init__(self, blob: Optional[mmap.mmap] = None, offsets: Optional[np.ndarray] = None,
+                 rows: Optional[np.ndarray] = None):
+        self._blob = blob
+        self._offsets = offsets if offsets is not None else np.zeros(1, dtype=np.uint64)
+        self._rows = rows  # blob records in use, in order, None for all of them
+        self._tail: List[Dict[str, Any]] = []
+
+    @property
+    def _mapped(self) -> int:
+        """Number of records read from the blob"""
+        return len(self._offsets) - 1 if self._rows is None else len(self._rows)
+
+    def __len__(self) -> int:
+        return self._mapped + len(self._tail)
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        if index < 0:
+            index += len(self)
+        mapped = self._mapped
+        if 0 <= index < mapped:
+            return json.loads(self.raw(index))
+        if mapped <= index < len(self):
+            return self._tail[index - mapped]
+        raise IndexError("record index out of range")
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def raw(self, index: int) -> bytes:
+        """Encoded bytes of a record, without decoding mapped records"""
+        if index < self._mapped:
+            if self._rows is not None:
+                index = int(self._rows[index])
+            return self._blob[int(self._offsets[index]):int(self._offsets[index + 1])]
+        return json.dumps(self._tail[index - self._mapped], ensure_ascii=False).encode("utf-8")
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self._tail.append(record)
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> None:
+        self._tail.extend(records)
+
+    def prefix(self, count: int) -> "MappedRecords":
+        """First count records, sharing the mapped blob and unaffected by later appends"""
+        return self.select(np.arange(count))
+
+    def select(self, indices: np.ndarray) -> "MappedRecords":
+        """
+        Some of the records, sharing the mapped blob and unaffected by later appends
+
+        Args:
+            indices: Record indices, ascending
+
+        Returns:
+            Records at those indices, in order
+        """
+        mapped = self._mapped
+        split = int(np.searchsorted(indices, mapped))
+        blob_rows = indices[:split] if self._rows is None else self._rows[indices[:split]]
+        if self._rows is None and split == mapped:
+            records = MappedRecords(self._blob, self._offsets)  # every blob record, no index needed
+        elif self._rows is None and split and int(blob_rows[-1]) == split - 1:
+            records = MappedRecords(self._blob, self._offsets[:split + 1])  # a prefix of the blob
+        else:
+            records = MappedRecords(self._blob, self._offsets, np.asarray(blob_rows, dtype=np.int64))
+        records._tail = [self._tail[index - mapped] for index in indices[split:].tolist()]
+        return records
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fsync_dir(directory: str) -> None:
+    """Flush directory entries so renames survive a crash (no-op where unsupported)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_records(directory: str, records: Any) -> int:
+    """Write records as a JSON-per-record blob plus uint64 offsets, returns record count"""
+    offsets = [0]
+    with open(os.path.join(directory, RECORDS_FILE), "wb") as f:
+        for index in range(len(records)):
+            if isinstance(records, MappedRecords):
+                data = records.raw(index)
+            else:
+                data = json.dumps(records[index], ensure_ascii=False).encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+        f.flush()
+        os.fsync(f.fileno())
+    np.save(os.path.join(directory, OFFSETS_FILE), np.asarray(offsets, dtype=np.uint64))
+    return len(offsets) - 1
+
+
+def write_snapshot(directory: str, arrays: Dict[str, np.ndarray], records: Any,
+                   info: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Atomically write a snapshot directory
+
+    Everything is written to a sibling temp directory first and renamed into
+    place, so readers only ever see a complete snapshot.
+
+    Args:
+        directory: Target snapshot directory
+        arrays: Named arrays, each saved as <name>.npy
+        records: Sequence of JSON-serializable records, row-aligned with the arrays
+        info: Extra manifest fields (backend, dtype, ...)
+    """
+    directory = os.path.abspath(directory)
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    token = uuid.uuid4().hex[:8]
+    temp_dir = f"{directory}.tmp-{token}"
+    os.makedirs(temp_dir)
+
+    try:
+        files = {}
+        for name, array in arrays.items():
+            filename = f"{name}.npy"
+            path = os.path.join(temp_dir, filename)
+            with open(path, "wb") as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+            files[name] = filename
+
+        count = _write_records(temp_dir, records)
+        checksums = {
+            filename: _file_sha256(os.path.join(temp_dir, filename))
+            for filename in [*files.values(), RECORDS_FILE, OFFSETS_FILE]
+        }
+        manifest = {
+            "version": FORMAT_VERSION,
+            "count": count,
+            "arrays": files,
+            "checksums": checksums,
+            "sizes": {name: os.path.getsize(os.path.join(temp_dir, name)) for name in checksums},
+            **(info or {}),
+        }
+        with open(os.path.join(temp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_dir(temp_dir)
+
+        # swap the new snapshot into place, keeping the old one until the rename succeeded
+        old_dir = None
+        if os.path.exists(directory):
+            old_dir = f"{directory}.old-{token}"
+            os.rename(directory, old_dir)
+        os.rename(temp_dir, directory)
+        _fsync_dir(parent)
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def is_snapshot(directory: str) -> bool:
+    """Whether a directory holds a native snapshot"""
+    return os.path.isfile(os.path.join(directory, MANIFEST_FILE))
+
+
+def read_snapshot(directory: str, verify: bool = False) -> Tuple[Dict[str, np.ndarray], MappedRecords, Dict[str, Any]]:
+    """
+    Open a snapshot without reading its contents into memory
+
+    Arrays are memory-mapped read-only, so pages are loaded on demand and
+    shared between processes opening the same snapshot.
+
+    Args:
+        directory: Snapshot directory
+        verify: Also check SHA-256 checksums (reads every file once)
+
+    Returns:
+        Tuple of (arrays by name, records, manifest)
+    """
+    with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version: {manifest.get('version')}")
+
+    for filename, size in manifest["sizes"].items():
+        path = os.path.join(directory, filename)
+        if os.path.getsize(path) != size:
+            raise ValueError(f"Snapshot file {filename} has unexpected size")
+        if verify and _file_sha256(path) != manifest["checksums"][filename]:
+            raise ValueError(f"Snapshot file {filename} failed checksum verification")
+
+    arrays = {
+        name: np.load(os.path.join(directory, filename), mmap_mode="r")
+        for name, filename in manifest["arrays"].items()
+    }
+
+    offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+    blob = None
+    if manifest["sizes"][RECORDS_FILE] > 0:
+        with open(os.path.join(directory, RECORDS_FILE), "rb") as f:
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return arrays, MappedRecords(blob, offsets), manifest
@@ -0,0 +1,492 @@
+"""
+Ingestion jobs for PandaAIQA
+Runs uploads in the background as a parse -> embed/index pipeline with
+progress reporting and cancellation, optionally replacing an earlier version
+of the same source. Archives are chunked file by file in parallel and
+indexed at once.
+"""
+
+import io
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional
+
+from simple_pandaaiqa.archive import ARCHIVE_FORMATS, iter_members, read_member
+from simple_pandaaiqa.config import (
+    INGEST_WORKERS,
+    INGEST_BATCH_SIZE,
+    INGEST_QUEUE_DEPTH,
+    INGEST_MAX_PENDING_JOBS,
+    INGEST_JOB_HISTORY,
+    ARCHIVE_WORKERS,
+    ARCHIVE_MAX_MEMBERS,
+    ARCHIVE_MAX_BYTES,
+    MAX_UPLOAD_BYTES,
+)
+from simple_pandaaiqa.utils.helpers import extract_file_extension, iter_text_blocks
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# marks the end of a job's parsed batches
+_DONE = object()
+
+MEMBER_FILE_TYPES = ("txt", "md", "csv", "pdf")  # archive files that are chunked, the others are skipped
+
+
+class IngestJob:
+    """One uploaded file or archive and its progress through the pipeline"""
+
+    def __init__(self, filename: str, ext: str, path: str, metadata: Optional[Dict[str, Any]] = None,
+                 replace: bool = False):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.ext = ext
+        self.path = path  # spooled upload, deleted when the job finishes
+        self.archive = ext in ARCHIVE_FORMATS  # ext is the archive format for archives
+        self.metadata = metadata or {"source": filename, "type": ext}
+        self.replace = replace  # delete the source's previous chunks once the new ones are indexed
+        self.status = "queued"
+        self.chunks_total: Optional[int] = None  # known once parsing finished
+        self.chunks_parsed = 0
+        self.chunks_indexed = 0
+        self.embeddings_reused = 0
+        self.chunks_replaced = 0
+        # per-file results of an archive, in archive order: name, status, chunks, error
+        self.members: Optional[List[Dict[str, Any]]] = [] if self.archive else None
+        self.errors: List[str] = []
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    @property
+    def throughput(self) -> float:
+        """Chunks indexed per second since the job started"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.chunks_indexed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def members_per_second(self) -> float:
+        """Archive files read and chunked per second since the job started"""
+        if not self.members or self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        done = sum(member["status"] != "parsing" for member in self.members)
+        return done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def message(self) -> str:
+        if self.status == "queued":
+            return f"Queued {self.filename}"
+        if self.archive and self.status in ("running", "completed"):
+            indexed = sum(member["status"] == "indexed" for member in self.members)
+            if self.status == "running":
+                return (f"Processing {self.filename}: {len(self.members)} files read, "
+                        f"{self.chunks_parsed} chunks parsed, {self.chunks_indexed} indexed")
+            message = (f"Successfully processed {self.chunks_indexed} documents from {indexed} of "
+                       f"{len(self.members)} files in {self.filename}")
+            if self.replace:
+                message += f", replacing {self.chunks_replaced} previous chunks"
+            return message
+        if self.status == "running":
+            total = self.chunks_total if self.chunks_total is not None else "?"
+            return f"Processing {self.filename}: {self.chunks_indexed}/{total} chunks indexed"
+        if self.status == "completed":
+            message = f"Successfully processed {self.chunks_indexed} documents from {self.filename}"
+            if self.embeddings_reused:
+                message += f" ({self.embeddings_reused} unchanged chunks reused cached embeddings)"
+            if self.replace:
+                message += f", replacing {self.chunks_replaced} previous chunks"
+            return message
+        if self.status == "cancelled":
+            return f"Cancelled {self.filename} after indexing {self.chunks_indexed} chunks"
+        return f"Failed to process {self.filename}: {self.errors[-1] if self.errors else 'unknown error'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Progress snapshot for the API"""
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "message": self.message,
+            "chunks_total": self.chunks_total,
+            "chunks_parsed": self.chunks_parsed,
+            "chunks_indexed": self.chunks_indexed,
+            "embeddings_reused": self.embeddings_reused,
+            "replace": self.replace,
+            "chunks_replaced": self.chunks_replaced,
+            "members": [dict(member) for member in self.members] if self.archive else None,
+            "members_per_second": round(self.members_per_second, 2),
+            "throughput": round(self.throughput, 2),
+            "errors": list(self.errors),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """
+    Bounded queue of upload jobs served by a fixed pool of worker threads
+
+    Each job runs as two pipelined stages: a parser thread decodes and
+    chunks the file into batches, and the worker embeds and indexes each
+    batch as it arrives. The batch queue between them is bounded, so
+    parsing waits whenever embedding falls behind, and the job queue is
+    bounded, so submit() fails fast instead of buffering uploads without
+    limit. Cancelling stops a job between batches; batches that were already
+    indexed stay in the knowledge base, except for replace jobs, which only
+    swap the new chunks for the source's previous ones once all of them are
+    indexed and otherwise delete what they indexed.
+
+    Archive jobs read the archive's files one after the other and chunk them
+    on a pool of archive_workers threads. All chunks are then embedded in
+    batches and indexed with a single add_texts call, so an archive is
+    indexed completely or not at all. Each file's source is the archive's
+    source and its path inside the archive, joined by "/".
+    """
+
+    def __init__(
+        self,
+        text_processor: Any,
+        pdf_processor: Any,
+        vector_store: Any,
+        workers: int = INGEST_WORKERS,
+        max_pending: int = INGEST_MAX_PENDING_JOBS,
+        batch_size: int = INGEST_BATCH_SIZE,
+        queue_depth: int = INGEST_QUEUE_DEPTH,
+        history: int = INGEST_JOB_HISTORY,
+        archive_workers: int = ARCHIVE_WORKERS,
+    ):
+        """
+        Initialize ingestion queue, workers start with the first job
+
+        Args:
+            text_processor: Chunker for txt/md/csv files
+            pdf_processor: Chunker for pdf files
+            vector_store: Store the chunks are added to
+            workers: Jobs processed concurrently
+            max_pending: Jobs that may wait in the queue
+            batch_size: Chunks per embed/index batch
+            queue_depth: Parsed batches buffered per job
+            history: Finished jobs kept for progress queries
+            archive_workers: Threads chunking the files of one archive
+        """
+        self.text_processor = text_processor
+        self.pdf_processor = pdf_processor
+        self.vector_store = vector_store
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.queue_depth = max(1, queue_depth)
+        self.history = history
+        self.archive_workers = max(1, archive_workers)
+        self._queue: "queue.Queue[Optional[IngestJob]]" = queue.Queue(maxsize=max_pending)
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def _start(self) -> None:
+        """Start the worker threads if they are not running"""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ingest-job-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, filename: str, ext: str, path: str, metadata: Optional[Dict[str, Any]] = None,
+               replace: bool = False) -> IngestJob:
+        """
+        Queue a file for ingestion
+
+        Args:
+            filename: Original file name
+            ext: Lower-case file extension, or the archive format ("zip" or "tar") for archives
+            path: Spooled copy of the file, the job deletes it once queued successfully
+            metadata: Metadata for every chunk, defaults to source and type
+            replace: Replace the chunks of the same source (metadata["source"]) once the file is indexed;
+                for archives, the chunks of every file previously uploaded in the archive
+
+        Returns:
+            The queued job
+
+        Raises:
+            queue.Full: If max_pending jobs are already waiting
+        """
+        self._start()
+        job = IngestJob(filename, ext, path, metadata, replace)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise
+        logger.info(f"Queued ingestion job {job.id} for {filename}")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestJob]:
+        """All known jobs, oldest first"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        """
+        Ask a job to stop, queued jobs are skipped when they reach a worker
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            The job, or None if it is unknown
+        """
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job._cancel.set()
+            logger.info(f"Cancelling ingestion job {job_id}")
+        return job
+
+    @property
+    def pending(self) -> int:
+        """Jobs waiting for a worker"""
+        return self._queue.qsize()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel all unfinished jobs and stop the workers"""
+        for job in self.list():
+            if not job.finished:
+                job._cancel.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            except Exception as e:
+                logger.error(f"Error running ingestion job {job.id}: {e}", exc_info=True)
+                job.errors.append(str(e))
+            finally:
+                if not job.finished:
+                    job.status = "failed" if job.errors else "cancelled" if job.cancelled else "completed"
+                job.finished_at = job.finished_at or time.time()
+                try:
+                    os.remove(job.path)
+                except OSError:
+                    pass
+                self._prune()
+
+    def _run(self, job: IngestJob) -> None:
+        """Run one job: parse on a helper thread, embed and index here"""
+        if job.cancelled:
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        if job.archive:
+            self._run_archive(job)
+            return
+        # the chunks to replace are the ones present now, not those indexed by this job
+        old_ids = self.vector_store.source_ids(job.metadata["source"]) if job.replace else []
+        new_ids: List[int] = []
+        batches: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_depth)
+        parser = threading.Thread(target=self._parse_stage, args=(job, batches),
+                                  name=f"ingest-parse-{job.id[:8]}", daemon=True)
+        parser.start()
+        drained = False
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _DONE:
+                    break
+                if job.cancelled or job.errors:
+                    continue  # keep draining so the parser never blocks
+                report: Dict[str, int] = {}
+                chunk_ids = self.vector_store.add_texts(
+                    [doc["text"] for doc in batch], [doc["metadata"] for doc in batch], report=report
+                )
+                if not chunk_ids:
+                    job.errors.append(f"Failed to index chunks {job.chunks_indexed}-{job.chunks_indexed + len(batch)}")
+                    continue
+                job.chunks_indexed += len(chunk_ids)
+                job.embeddings_reused += report.get("reused", 0)
+                new_ids.extend(chunk_ids)
+            drained = True
+        finally:
+            parser.join()
+            if job.replace:
+                self._finish_replace(job, old_ids, new_ids, complete=drained and not job.cancelled and not job.errors)
+        logger.info(f"Ingestion job {job.id} indexed {job.chunks_indexed} chunks "
+                    f"at {job.throughput:.1f} chunks/s")
+
+    def _finish_replace(self, job: IngestJob, old_ids: List[int], new_ids: List[int], complete: bool) -> None:
+        """Swap a complete new version in for the old one, or roll back an incomplete one"""
+        if not complete:
+            deleted = self.vector_store.delete(new_ids)
+            logger.info(f"Ingestion job {job.id} did not finish, removed its {deleted} chunks "
+                        f"and kept the previous version of {job.metadata['source']}")
+            return
+        job.chunks_replaced = self.vector_store.delete(old_ids)
+
+    def _run_archive(self, job: IngestJob) -> None:
+        """Run an archive job: read files in order, chunk them on a pool, index all chunks at once"""
+        prefix = f"{job.metadata['source']}/"
+        old_ids = [chunk_id for source in self.vector_store.sources()
+                   if isinstance(source, str) and source.startswith(prefix)
+                   for chunk_id in self.vector_store.source_ids(source)] if job.replace else []
+        new_ids: List[int] = []
+        parsed: Dict[int, List[Dict[str, Any]]] = {}  # documents by member position
+        pending: Dict[Future, int] = {}
+        window = self.archive_workers * 4  # files read ahead of the chunkers, bounds memory
+        size = 0
+
+        def collect(block: bool) -> None:
+            done = wait(list(pending), return_when=FIRST_COMPLETED)[0] if block else [
+                future for future in pending if future.done()]
+            for future in done:
+                position = pending.pop(future)
+                member = job.members[position]
+                try:
+                    documents = future.result()
+                except Exception as e:
+                    logger.warning(f"Error parsing {member['name']} in {job.filename}: {e}")
+                    member.update(status="failed", error=str(e))
+                    continue
+                member.update(status="parsed", chunks=len(documents))
+                parsed[position] = documents
+                job.chunks_parsed += len(documents)
+
+        pool = ThreadPoolExecutor(max_workers=self.archive_workers, thread_name_prefix=f"ingest-archive-{job.id[:8]}")
+        try:
+            try:
+                for name, open_member in iter_members(job.path, job.ext):
+                    if job.cancelled:
+                        break
+                    if len(job.members) >= ARCHIVE_MAX_MEMBERS:
+                        raise ValueError(f"Archive has more than {ARCHIVE_MAX_MEMBERS} files")
+                    ext = extract_file_extension(name)
+                    member = {"name": name, "status": "skipped", "chunks": 0, "error": None}
+                    job.members.append(member)
+                    if ext not in MEMBER_FILE_TYPES:
+                        member["error"] = f"Unsupported file type: {ext}"
+                        continue
+                    try:
+                        content = read_member(open_member, MAX_UPLOAD_BYTES)
+                    except Exception as e:
+                        member.update(status="failed", error=str(e))
+                        continue
+                    size += len(content)
+                    if size > ARCHIVE_MAX_BYTES:
+                        raise ValueError(f"Archive too large. Maximum allowed size is {ARCHIVE_MAX_BYTES} bytes "
+                                         "uncompressed")
+                    member["status"] = "parsing"
+                    metadata = {"source": prefix + name, "type": ext, "archive": job.filename}
+                    pending[pool.submit(self._parse_member, content, ext, metadata)] = len(job.members) - 1
+                    collect(block=len(pending) >= window)
+                while pending and not job.cancelled:
+                    collect(block=True)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+            if job.cancelled:
+                return
+            documents = [document for position in sorted(parsed) for document in parsed[position]]
+            job.chunks_total = len(documents)
+            if not documents:
+                raise ValueError("No documents generated from uploaded archive")
+            report: Dict[str, int] = {}
+            new_ids = self.vector_store.add_texts(
+                [doc["text"] for doc in documents], [doc["metadata"] for doc in documents], report=report
+            )
+            if not new_ids:
+                job.errors.append(f"Failed to index {len(documents)} chunks")
+                return
+            job.chunks_indexed = len(new_ids)
+            job.embeddings_reused = report.get("reused", 0)
+            for position in parsed:
+                job.members[position]["status"] = "indexed"
+        finally:
+            if job.replace:
+                self._finish_replace(job, old_ids, new_ids, complete=bool(new_ids) and not job.cancelled)
+        logger.info(f"Ingestion job {job.id} indexed {job.chunks_indexed} chunks from {len(parsed)} files "
+                    f"at {job.members_per_second:.1f} files/s")
+
+    def _parse_member(self, content: bytes, ext: str, metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Chunk one archive file (runs on the archive pool)"""
+        if ext == "pdf":
+            return list(self.pdf_processor.iter_documents(content, metadata))
+        return list(self.text_processor.iter_documents(iter_text_blocks(io.BytesIO(content)), metadata))
+
+    def _parse_stage(self, job: IngestJob, batches: "queue.Queue[Any]") -> None:
+        """Producer: push parsed batches, blocking while the embed stage is behind"""
+        try:
+            for batch in self._parse(job):
+                if job.cancelled or job.errors:
+                    break
+                job.chunks_parsed += len(batch)
+                batches.put(batch)
+        except Exception as e:
+            logger.error(f"Error parsing {job.filename}: {e}", exc_info=True)
+            job.errors.append(f"Parsing failed: {e}")
+        finally:
+            batches.put(_DONE)
+
+    def _parse(self, job: IngestJob) -> Iterator[List[Dict[str, Any]]]:
+        """Decode and chunk a file, yielding batches of documents"""
+        if job.ext == "pdf":
+            # PDF chunks stream in while later pages are still being extracted
+            with open(job.path, "rb") as f:
+                content = f.read()
+            documents = self.pdf_processor.iter_documents(content, job.metadata)
+        else:
+            # text is decoded and chunked block by block, memory does not grow with the file
+            documents = self.text_processor.iter_documents(iter_text_blocks(job.path), job.metadata)
+
+        count = 0
+        while True:
+            batch = list(itertools.islice(documents, self.batch_size))
+            if not batch:
+                break
+            count += len(batch)
+            yield batch
+        if not count:
+            raise ValueError("No documents generated from uploaded file")
+        job.chunks_total = count
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the history limit"""
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+            for job_id in finished[:max(0, len(finished) - self.history)]:
+                del self._jobs[job_id]
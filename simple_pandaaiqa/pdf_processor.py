@@ -1,9 +1,23 @@
+import bisect
 import logging
-from typing import List, Dict, Any, Optional
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from PyPDF2 import PdfReader
 from io import BytesIO
 
-from simple_pandaaiqa.config import CHUNK_SIZE, CHUNK_OVERLAP
+from simple_pandaaiqa.config import (
+    PDF_WORKERS,
+    PDF_PAGES_PER_TASK,
+    PDF_PAGE_WINDOW,
+    PDF_PARALLEL_MIN_PAGES,
+)
+from simple_pandaaiqa.splitters import TextSplitter, get_splitter
 
 # Setup logging
 logging.basicConfig(
@@ -11,73 +25,201 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# per worker process: the reader of the file it extracted from last
+_worker_reader: Tuple[Optional[str], Optional[PdfReader]] = (None, None)
+
+
+def _get_pool() -> Optional[Executor]:
+    """Process pool shared by all PDF processors, None on a single CPU or if processes cannot be started"""
+    global _pool
+    if (PDF_WORKERS or os.cpu_count() or 1) < 2:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            try:
+                # spawn, since forking a process that runs server threads can deadlock
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS or None, mp_context=multiprocessing.get_context("spawn")
+                )
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Cannot start PDF extraction processes, extracting in-process: {e}")
+                return None
+        return _pool
+
+
+def _reset_pool() -> None:
+    """Drop a broken pool, the next document starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+
+def _extract_pages(path: str, first: int, last: int) -> List[str]:
+    """Extract the text of pages [first, last) of a PDF file (runs in a worker process)"""
+    global _worker_reader
+    if _worker_reader[0] != path:
+        _worker_reader = (path, PdfReader(path))
+    reader = _worker_reader[1]
+    return [reader.pages[i].extract_text() or "" for i in range(first, last)]
+
 
 class PDFProcessor:
     """PDF processor class, processes PDF splitting and creates documents"""
 
     def __init__(
-        self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        splitter: Optional[TextSplitter] = None,
+        pages_per_task: int = PDF_PAGES_PER_TASK,
+        page_window: int = PDF_PAGE_WINDOW,
+        parallel_min_pages: int = PDF_PARALLEL_MIN_PAGES,
     ):
-        """Initialize PDF processor"""
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
+        """
+        Initialize PDF processor
+
+        Args:
+            chunk_size: Chunk size for the configured strategy, defaults to its config value
+            chunk_overlap: Chunk overlap for the configured strategy, defaults to its config value
+            splitter: Splitter to use instead of the configured strategy
+            pages_per_task: Pages extracted per worker task
+            page_window: Maximum pages extracted ahead of the chunker
+            parallel_min_pages: Smaller documents are extracted in-process
+        """
+        if splitter is None:
+            sizes = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+            splitter = get_splitter(**{name: value for name, value in sizes.items() if value is not None})
+        self.splitter = splitter
+        self.chunk_size = splitter.chunk_size
+        self.chunk_overlap = splitter.chunk_overlap
+        self.pages_per_task = max(1, pages_per_task)
+        self.page_window = max(self.pages_per_task, page_window)
+        self.parallel_min_pages = parallel_min_pages
         logger.info(
-            f"Initialized PDF processor, chunk size={chunk_size}, chunk overlap={chunk_overlap}"
+            f"Initialized PDF processor, splitter={type(splitter).__name__}, "
+            f"chunk size={self.chunk_size}, chunk overlap={self.chunk_overlap}"
         )
 
     def process_pdf(
-        self, content: str, metadata: Optional[Dict[str, Any]] = None
+        self, content: bytes, metadata: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Process PDF, split it into chunks and create documents
 
         Args:
-            pdf_path: Path to PDF file
+            content: PDF file content
             metadata: Optional metadata
 
         Returns:
-            List of documents, each containing text and metadata
+            List of documents, metadata as for iter_documents
         """
-        logger.info(f"Processing PDF: {content}")
-        metadata = metadata or {}
-        chunks = self._split_pdf(content)
-        documents = [
-            {
-                "text": chunk,
-                "metadata": {**metadata, "chunk_id": i, "chunk_count": len(chunks)},
-            }
-            for i, chunk in enumerate(chunks)
-        ]
+        documents = list(self.iter_documents(content, metadata))
         logger.info(f"Created {len(documents)} documents")
         return documents
 
-    def _split_pdf(self, content: str) -> List[str]:
+    def iter_documents(
+        self, content: bytes, metadata: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Split PDF into multiple chunks based on chunk size and overlap
+        Stream documents while later pages are still being extracted
+
+        Whitespace-only chunks, e.g. from image-only or blank pages, are
+        skipped and not numbered. Like text documents, the metadata has no
+        chunk count, which is only known once the whole document was read.
 
         Args:
-            content: Path to PDF file
+            content: PDF file content
+            metadata: Optional metadata
 
-        Returns:
-            List of text chunks
+        Yields:
+            Documents with chunk_id, page_start and page_end (1-based) metadata
         """
-        reader = PdfReader(BytesIO(content))
-        full_text = ""
-        for page in reader.pages:
-            full_text += page.extract_text() + "\n"
+        logger.info(f"Processing PDF of {len(content)} bytes")
+        metadata = metadata or {}
+        count = 0
+        for chunk, page_start, page_end in self._chunk_pages(self._iter_pages(content)):
+            if not chunk.strip():
+                continue
+            yield {
+                "text": chunk,
+                "metadata": {**metadata, "chunk_id": count, "page_start": page_start, "page_end": page_end},
+            }
+            count += 1
 
-        chunks = []
-        start = 0
-        text_length = len(full_text)
+    def _iter_pages(self, content: bytes) -> Iterator[str]:
+        """
+        Page texts in page order
 
-        while start < text_length:
-            end = min(start + self.chunk_size, text_length)
-            chunk = full_text[start:end]
-            chunks.append(chunk)
+        Large documents are extracted by the process pool in tasks of
+        pages_per_task pages, with at most page_window pages in flight, so
+        memory holds a window of pages rather than the whole document.
+        """
+        reader = PdfReader(BytesIO(content))
+        page_count = len(reader.pages)
+        pool = _get_pool() if page_count >= self.parallel_min_pages else None
+        if pool is None:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+        del reader
+
+        # workers read the document from a file instead of receiving it with every task
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(content)
+            path = f.name
+        tasks = deque()
+        try:
+            ranges = iter(range(0, page_count, self.pages_per_task))
+            max_tasks = self.page_window // self.pages_per_task
+            for first in ranges:
+                tasks.append(pool.submit(_extract_pages, path, first, min(first + self.pages_per_task, page_count)))
+                if len(tasks) >= max_tasks:
+                    break
+            while tasks:
+                texts = tasks.popleft().result()
+                first = next(ranges, None)
+                if first is not None:
+                    tasks.append(pool.submit(_extract_pages, path, first, min(first + self.pages_per_task, page_count)))
+                yield from texts
+        except BrokenProcessPool:
+            _reset_pool()
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _chunk_pages(self, pages: Iterator[str]) -> Iterator[Tuple[str, int, int]]:
+        """
+        Split streamed pages into chunks with the splitter
 
-            if end == text_length:
-                break
+        The text is split as if the pages were joined, each followed by a
+        newline, so chunks may span pages.
 
-            start += self.chunk_size - self.chunk_overlap
+        Args:
+            pages: Page texts in order
 
-        return chunks
+        Yields:
+            Tuple of (chunk, first page, last page), pages 1-based
+        """
+        page_offsets = []  # offset of each page in the joined text
+
+        def joined() -> Iterator[str]:
+            offset = 0
+            for text in pages:
+                page_offsets.append(offset)
+                offset += len(text) + 1
+                yield text + "\n"
+
+        for offset, chunk in self.splitter.iter_spans(joined()):
+            first = bisect.bisect_right(page_offsets, offset)
+            last = bisect.bisect_right(page_offsets, offset + max(0, len(chunk) - 1))
+            yield chunk, first, last
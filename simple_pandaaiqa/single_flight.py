@@ -0,0 +1,131 @@
+"""
+Single-flight request coalescing for PandaAIQA
+Identical requests that arrive while one is being answered attach to it and
+share its result, instead of each running retrieval and generation
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    """
+    The events of one shared computation, replayed to every subscriber
+
+    Subscribers that attach late first receive everything published so far,
+    then follow along live. All methods run on the event loop.
+    """
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False  # every subscriber left before the result was complete
+        self._changed = asyncio.Event()
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def publish(self, event: Any) -> None:
+        """Append an event and wake the subscribers"""
+        self.events.append(event)
+        self._wake()
+
+    def _finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        """
+        Iterate over all events of the flight, from the first one
+
+        Raises:
+            The exception the computation failed with, once its events are consumed
+        """
+        self.subscribers += 1
+        try:
+            index = 0
+            while True:
+                if index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self._task is not None:
+                # nobody is waiting for the result any more
+                self.abandoned = True
+                self._task.cancel()
+
+
+class SingleFlight:
+    """
+    Registry of in-flight computations by key
+
+    The first caller for a key starts the computation as a task of its own,
+    so it keeps running for the others if that caller goes away; later
+    callers for the same key join it until it finishes. Used from the event
+    loop only, so it needs no locks.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def join(self, key: Hashable, start: Callable[[Flight], Awaitable[None]]) -> Tuple[Flight, bool]:
+        """
+        Join the flight for a key, starting it if there is none
+
+        Args:
+            key: Identity of the computation
+            start: Coroutine function that runs the computation and publishes its events
+
+        Returns:
+            Tuple of (flight, whether this call started it)
+        """
+        flight = self._flights.get(key)
+        if flight is not None and not flight.done and not flight.abandoned:
+            self._stats["followers"] += 1
+            return flight, False
+
+        flight = Flight()
+        self._flights[key] = flight
+        self._stats["leaders"] += 1
+        flight._task = asyncio.ensure_future(self._run(key, flight, start))
+        return flight, True
+
+    async def _run(self, key: Hashable, flight: Flight, start: Callable[[Flight], Awaitable[None]]) -> None:
+        try:
+            await start(flight)
+            flight._finish()
+        except asyncio.CancelledError as e:
+            flight._finish(e)
+        except Exception as e:
+            logger.error(f"Error in shared computation: {e}", exc_info=True)
+            flight._finish(e)
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Started and joined computation counters"""
+        requests = self._stats["leaders"] + self._stats["followers"]
+        return {
+            **self._stats,
+            "coalesced_rate": self._stats["followers"] / requests if requests else 0.0,
+            "in_flight": len(self._flights),
+        }
@@ -0,0 +1,164 @@
+"""
+Text splitters for PandaAIQA
+The single chunking stage shared by text and PDF processing, with character,
+sentence-aware and token-based strategies
+"""
+
+import itertools
+import logging
+import re
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, List, Tuple
+
+from simple_pandaaiqa.config import (
+    CHUNK_STRATEGY,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    CHUNK_TOKENS,
+    CHUNK_TOKEN_OVERLAP,
+)
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class TextSplitter(ABC):
+    """
+    Streaming splitter: text arrives in blocks of any size and chunks are
+    yielded as soon as they are complete, so only the text later chunks can
+    still reach is kept in memory
+    """
+
+    def __init__(self, chunk_size: int, chunk_overlap: int):
+        """
+        Initialize splitter
+
+        Args:
+            chunk_size: Maximum chunk length, in the splitter's unit
+            chunk_overlap: Length shared by consecutive chunks
+        """
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) must be smaller than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text: str) -> List[str]:
+        """Split a whole text into chunks"""
+        return [chunk for _, chunk in self.iter_spans([text])]
+
+    @abstractmethod
+    def iter_spans(self, blocks: Iterable[str]) -> Iterator[Tuple[int, str]]:
+        """
+        Split text arriving in blocks
+
+        Args:
+            blocks: Consecutive pieces of the text
+
+        Yields:
+            Tuple of (offset of the chunk in the whole text, chunk)
+        """
+
+
+class CharacterSplitter(TextSplitter):
+    """Fixed windows of chunk_size characters, optionally ending at a sentence end"""
+
+    sentence_ends = {".", "!", "?", "\n"}
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP, lookback: int = 0):
+        """
+        Initialize splitter
+
+        Args:
+            chunk_size: Maximum characters per chunk
+            chunk_overlap: Characters shared by consecutive chunks
+            lookback: End a chunk early at a sentence end within its last lookback characters
+        """
+        super().__init__(chunk_size, chunk_overlap)
+        self.lookback = lookback
+
+    def iter_spans(self, blocks: Iterable[str]) -> Iterator[Tuple[int, str]]:
+        # a chunk is cut once text beyond its end has arrived, only then is it known not to be the last one
+        buffer, base, start = "", 0, 0  # buffer holds the text from offset base on, start is relative to it
+        for block in itertools.chain(blocks, [None]):
+            final = block is None
+            if not final:
+                buffer, base = buffer[start:] + block, base + start
+                start = 0
+            while start < len(buffer) and (final or len(buffer) - start > self.chunk_size):
+                end = min(start + self.chunk_size, len(buffer))
+                if end < len(buffer):
+                    # an early end must stay past start + chunk_overlap, or the next chunk would not advance
+                    for i in range(min(self.lookback, end - start - self.chunk_overlap - 1)):
+                        if buffer[end - i - 1] in self.sentence_ends:
+                            end -= i
+                            break
+                yield base + start, buffer[start:end]
+                start = end - self.chunk_overlap if end < len(buffer) else end
+
+
+class SentenceSplitter(CharacterSplitter):
+    """Character windows that end at a sentence end within their last 50 characters where possible"""
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+        super().__init__(chunk_size, chunk_overlap, lookback=50)
+
+
+class TokenSplitter(TextSplitter):
+    """
+    Windows of chunk_size whitespace-delimited tokens
+
+    Tokens are words with their trailing whitespace, a model-independent
+    approximation of the embedding model's input limit.
+    """
+
+    token_pattern = re.compile(r"\S+\s*")
+
+    def __init__(self, chunk_size: int = CHUNK_TOKENS, chunk_overlap: int = CHUNK_TOKEN_OVERLAP):
+        super().__init__(chunk_size, chunk_overlap)
+
+    def iter_spans(self, blocks: Iterable[str]) -> Iterator[Tuple[int, str]]:
+        step = self.chunk_size - self.chunk_overlap
+        tokens: List[Tuple[int, str]] = []  # complete tokens from the start of the next chunk on
+        pending, pending_offset = "", 0  # text that may still continue in the next block
+        emitted = True  # whether tokens[-1] (if any) is already part of a yielded chunk
+        for block in itertools.chain(blocks, [None]):
+            final = block is None
+            text = pending + (block or "")
+            end = 0
+            for match in self.token_pattern.finditer(text):
+                if match.end() == len(text) and not final:
+                    break
+                tokens.append((pending_offset + match.start(), match.group()))
+                end = match.end()
+                emitted = False
+            pending, pending_offset = text[end:], pending_offset + end
+
+            while len(tokens) > self.chunk_size or (final and tokens and not emitted):
+                window = tokens[:self.chunk_size]
+                yield window[0][0], "".join(token for _, token in window)
+                emitted = len(tokens) <= self.chunk_size
+                del tokens[:step]
+
+
+_STRATEGIES = {
+    "character": CharacterSplitter,
+    "sentence": SentenceSplitter,
+    "token": TokenSplitter,
+}
+
+
+def get_splitter(strategy: str = CHUNK_STRATEGY, **kwargs) -> TextSplitter:
+    """
+    Create the splitter for a chunking strategy
+
+    Args:
+        strategy: "character", "sentence" or "token"
+        **kwargs: chunk_size / chunk_overlap, in characters or tokens depending on the strategy
+
+    Returns:
+        TextSplitter instance
+    """
+    if strategy not in _STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy: {strategy}")
+    return _STRATEGIES[strategy](**kwargs)
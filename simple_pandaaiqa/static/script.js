@@ -295,9 +295,10 @@ function bindFormSubmissions() {
                 console.log('Response data:', data);
                 
                 if (response.ok) {
-                    showNotification(data.message, 'success');
                     if (fileInput) fileInput.value = '';
                     if (fileName) fileName.textContent = 'No file selected';
+                    const job = await waitForJob(data.job_id);
+                    showNotification(job.message, job.status === 'completed' ? 'success' : 'error');
                     fetchStatus();
                 } else {
                     showNotification(data.message || 'Failed to upload file', 'error');
@@ -339,7 +340,7 @@ function bindFormSubmissions() {
                 if (answerContainer) answerContainer.classList.add('hidden');
                 if (contextContainer) contextContainer.classList.add('hidden');
                 
-                const apiUrl = `${API_BASE_URL}/api/query`;
+                const apiUrl = `${API_BASE_URL}/api/query/stream`;
                 console.log('API URL:', apiUrl);
                 
                 console.log('About to send fetch request to:', apiUrl);
@@ -354,27 +355,33 @@ function bindFormSubmissions() {
                     }),
                 });
                 
-                const data = await response.json();
-                console.log('Query response:', data);
+                if (!response.ok) {
+                    const data = await response.json();
+                    showNotification(data.message || data.detail || 'Query failed', 'error');
+                    return;
+                }
                 
-                if (response.ok) {
-                    // Show results
-                    if (answer && answerContainer) {
-                        answer.textContent = data.answer;
-                        answerContainer.classList.remove('hidden');
-                    }
-                    
-                    // Show context
-                    if (context && contextContainer) {
-                        context.innerHTML = '';
-                        if (data.context && data.context.length > 0) {
-                            renderContext(data.context);
-                            contextContainer.classList.remove('hidden');
+                if (answer) answer.textContent = '';
+                await readEventStream(response, (event, data) => {
+                    if (event === 'context') {
+                        // Show context as soon as it is retrieved
+                        if (context && contextContainer) {
+                            context.innerHTML = '';
+                            if (data.length > 0) {
+                                renderContext(data);
+                                contextContainer.classList.remove('hidden');
+                            }
+                        }
+                    } else if (event === 'token') {
+                        // Append answer tokens as they arrive
+                        if (answer && answerContainer) {
+                            answer.textContent += data.text;
+                            answerContainer.classList.remove('hidden');
                         }
+                        removeNotification('querying');
                     }
-                } else {
-                    showNotification(data.message || 'Query failed', 'error');
-                }
+                });
+                console.log('Query stream finished');
             } catch (error) {
                 console.error('Error during query:', error);
                 console.error('Error details:', error.message, error.stack);
@@ -386,6 +393,36 @@ function bindFormSubmissions() {
     }
 }
 
+/**
+ * Read a server-sent event stream, calling onEvent(event, data) for each event
+ */
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 /**
  * Bind clear button event
  */
@@ -507,6 +544,24 @@ function showNotification(message, type = 'info', id = null) {
     }
 }
 
+/**
+ * Poll an ingestion job until it finishes, showing its progress
+ */
+async function waitForJob(jobId) {
+    while (true) {
+        const response = await fetch(`${API_BASE_URL}/api/jobs/${jobId}`);
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.detail || 'Failed to get upload progress');
+        }
+        if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+            return job;
+        }
+        showNotification(job.message, 'info', 'uploading');
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
 /**
  * Remove notification by ID
  */
@@ -0,0 +1,552 @@
+"""
+Directory sync for PandaAIQA
+Keeps the knowledge base in step with a directory tree: new and changed files
+are chunked in parallel and indexed in shared batches, files that disappeared
+are deleted, and a persisted fingerprint manifest lets unchanged files be
+skipped without reading them
+
+Run a sync from the command line with
+    python -m simple_pandaaiqa.sync DIRECTORY
+while the server is stopped (both would write the same knowledge base), or
+through POST /api/sync while it is running.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from simple_pandaaiqa.config import (
+    SYNC_WORKERS,
+    SYNC_MANIFEST_FILE,
+    INGEST_BATCH_SIZE,
+    INGEST_JOB_HISTORY,
+    UPLOAD_BLOCK_SIZE,
+    DEFAULT_STORAGE_DIR,
+    KB_PERSISTENCE_ENABLED,
+)
+from simple_pandaaiqa.utils.helpers import extract_file_extension, iter_text_blocks
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SYNC_FILE_TYPES = ("txt", "md", "csv", "pdf")  # the file types /api/upload ingests
+MAX_REPORTED_ERRORS = 100  # per-file errors kept on a job, files_failed counts all of them
+
+
+def file_digest(path: str, block_size: int = UPLOAD_BLOCK_SIZE) -> str:
+    """
+    SHA-256 of a file's content, read in fixed-size blocks
+
+    Args:
+        path: File path
+        block_size: Bytes read at a time
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_under(path: str, root: str) -> bool:
+    """Whether an absolute path lies inside the directory root"""
+    return path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+class SyncManifest:
+    """
+    Fingerprints of synced files by absolute path, persisted as JSON
+
+    Each entry holds the mtime (ns), size and SHA-256 a file had when it was
+    indexed, and the number of chunks it produced. The manifest only lets a
+    sync skip reading files; whether a file's chunks are in the knowledge
+    base is checked against the store itself.
+    """
+
+    def __init__(self, path: str = SYNC_MANIFEST_FILE):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)["files"]
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable sync manifest {self.path}: {e}")
+            return {}
+
+    def save(self) -> None:
+        """Write the manifest atomically, a crash leaves the previous version"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.entries}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+
+class SyncedFile:
+    """A new or changed file, read and chunked by a sync worker"""
+
+    def __init__(self, path: str, stat: os.stat_result, known: bool):
+        self.path = path
+        self.stat = stat
+        self.known = known  # indexed by an earlier sync or upload, so this is an update
+        self.digest: Optional[str] = None
+        self.documents: Optional[List[Dict[str, Any]]] = None  # None when the content is unchanged
+
+    def fingerprint(self) -> Dict[str, Any]:
+        return {
+            "mtime_ns": self.stat.st_mtime_ns,
+            "size": self.stat.st_size,
+            "sha256": self.digest,
+            "chunks": len(self.documents or []),
+        }
+
+
+class SyncJob:
+    """One sync of a directory tree and its progress"""
+
+    def __init__(self, directory: str):
+        self.id = uuid.uuid4().hex
+        self.directory = directory
+        self.status = "queued"
+        self.files_scanned = 0
+        self.files_unchanged = 0
+        self.files_added = 0
+        self.files_updated = 0
+        self.files_deleted = 0
+        self.files_failed = 0
+        self.chunks_indexed = 0
+        self.chunks_deleted = 0
+        self.embeddings_reused = 0
+        self.errors: List[str] = []
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    @property
+    def throughput(self) -> float:
+        """Files scanned per second since the sync started"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return self.files_scanned / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def message(self) -> str:
+        if self.status == "queued":
+            return f"Queued sync of {self.directory}"
+        changes = (f"{self.files_added} added, {self.files_updated} updated, {self.files_deleted} deleted, "
+                   f"{self.files_unchanged} unchanged")
+        if self.files_failed:
+            changes += f", {self.files_failed} failed"
+        if self.status == "running":
+            return f"Syncing {self.directory}: {self.files_scanned} files scanned, {changes}"
+        if self.status == "completed":
+            return f"Synced {self.directory}: {changes}"
+        if self.status == "cancelled":
+            return f"Cancelled sync of {self.directory} after {self.files_scanned} files: {changes}"
+        return f"Failed to sync {self.directory}: {self.errors[-1] if self.errors else 'unknown error'}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Progress snapshot for the API"""
+        return {
+            "job_id": self.id,
+            "directory": self.directory,
+            "status": self.status,
+            "message": self.message,
+            "files_scanned": self.files_scanned,
+            "files_unchanged": self.files_unchanged,
+            "files_added": self.files_added,
+            "files_updated": self.files_updated,
+            "files_deleted": self.files_deleted,
+            "files_failed": self.files_failed,
+            "chunks_indexed": self.chunks_indexed,
+            "chunks_deleted": self.chunks_deleted,
+            "embeddings_reused": self.embeddings_reused,
+            "throughput": round(self.throughput, 2),
+            "errors": list(self.errors),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def _fail_file(self, path: str, error: Any) -> None:
+        self.files_failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"{path}: {error}")
+
+
+class DirectorySync:
+    """
+    Syncs directory trees into the vector store, one sync at a time
+
+    A sync walks the tree on its own thread. Files whose mtime and size
+    match the manifest are skipped without being read; the others are
+    hashed and, if their content changed, chunked by a pool of workers with
+    the same processors as uploads. Chunked files are collected into
+    batches of about batch_size chunks, and each batch is indexed with one
+    add_texts call before the previous chunks of its files are deleted, so
+    searches find the old version of a file until the new one is indexed.
+    Once the whole tree was walked, the sources of files that no longer
+    exist are deleted. A file's source is its absolute path.
+
+    Syncs are queued and run one after the other; submitting a directory
+    whose sync is still queued returns that job. Cancelling stops a sync
+    after the batch being indexed; files already indexed stay indexed and
+    nothing is deleted for missing files.
+    """
+
+    def __init__(
+        self,
+        text_processor: Any,
+        pdf_processor: Any,
+        vector_store: Any,
+        manifest_path: str = SYNC_MANIFEST_FILE,
+        workers: int = SYNC_WORKERS,
+        batch_size: int = INGEST_BATCH_SIZE,
+        history: int = INGEST_JOB_HISTORY,
+    ):
+        """
+        Initialize directory sync, the sync thread starts with the first job
+
+        Args:
+            text_processor: Chunker for txt/md/csv files
+            pdf_processor: Chunker for pdf files
+            vector_store: Store the chunks are added to and deleted from
+            manifest_path: JSON file holding the fingerprints of synced files
+            workers: Threads hashing and chunking files
+            batch_size: Chunks indexed per add_texts call
+            history: Finished jobs kept for progress queries
+        """
+        self.text_processor = text_processor
+        self.pdf_processor = pdf_processor
+        self.vector_store = vector_store
+        self.manifest_path = manifest_path
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.history = history
+        self._manifest: Optional[SyncManifest] = None  # loaded by the first sync
+        self._queue: "queue.Queue[Optional[SyncJob]]" = queue.Queue()
+        self._jobs: "OrderedDict[str, SyncJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # one sync at a time, whether queued or run directly
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, directory: str) -> SyncJob:
+        """
+        Queue a sync of a directory tree
+
+        Args:
+            directory: Directory to sync
+
+        Returns:
+            The queued job, or the already queued job for the same directory
+
+        Raises:
+            ValueError: If the directory does not exist
+        """
+        directory = os.path.abspath(directory)
+        if not os.path.isdir(directory):
+            raise ValueError(f"Directory {directory} does not exist")
+        with self._lock:
+            for job in self._jobs.values():
+                if job.directory == directory and job.status == "queued" and not job.cancelled:
+                    return job
+            job = SyncJob(directory)
+            self._jobs[job.id] = job
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="directory-sync", daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        logger.info(f"Queued sync job {job.id} for {directory}")
+        return job
+
+    def sync(self, directory: str) -> SyncJob:
+        """
+        Sync a directory tree on the calling thread
+
+        Args:
+            directory: Directory to sync
+
+        Returns:
+            The finished job
+
+        Raises:
+            ValueError: If the directory does not exist
+        """
+        directory = os.path.abspath(directory)
+        if not os.path.isdir(directory):
+            raise ValueError(f"Directory {directory} does not exist")
+        job = SyncJob(directory)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._execute(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[SyncJob]:
+        """All known jobs, oldest first"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[SyncJob]:
+        """
+        Ask a sync to stop, a queued sync is skipped
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            The job, or None if it is unknown
+        """
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job._cancel.set()
+            logger.info(f"Cancelling sync job {job_id}")
+        return job
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel all unfinished syncs and stop the sync thread"""
+        for job in self.list():
+            if not job.finished:
+                job._cancel.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            if wait:
+                thread.join()
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self._execute(job)
+
+    def _execute(self, job: SyncJob) -> None:
+        """Run a job and record how it ended"""
+        try:
+            with self._sync_lock:
+                if not job.cancelled:
+                    self._run(job)
+        except Exception as e:
+            logger.error(f"Error running sync job {job.id}: {e}", exc_info=True)
+            job.errors.append(str(e))
+            job.status = "failed"
+        finally:
+            if not job.finished:
+                job.status = "cancelled" if job.cancelled else "completed"
+            job.finished_at = job.finished_at or time.time()
+            self._prune()
+
+    def _run(self, job: SyncJob) -> None:
+        """Walk the tree, index new and changed files in batches, then delete missing ones"""
+        job.status = "running"
+        job.started_at = time.time()
+        if self._manifest is None:
+            self._manifest = SyncManifest(self.manifest_path)
+        manifest = self._manifest
+        # the store decides whether a file is indexed, the manifest may be stale (e.g. after a clear)
+        stored = {source for source in self.vector_store.sources() if isinstance(source, str)}
+        seen: Set[str] = set()
+        unreadable: List[str] = []
+        pending: Dict[Future, SyncedFile] = {}
+        batch: List[SyncedFile] = []
+        window = self.workers * 4  # files read ahead of the indexer, bounds memory
+
+        def collect(block: bool) -> None:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED) if block else (
+                [future for future in pending if future.done()], None)
+            for future in done:
+                item = pending.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to read {item.path}: {e}")
+                    job._fail_file(item.path, e)
+                    continue
+                if item.documents is None:
+                    # touched but identical, only the fingerprint changes
+                    manifest.entries[item.path] = {**item.fingerprint(),
+                                                   "chunks": manifest.entries[item.path]["chunks"]}
+                    job.files_unchanged += 1
+                    continue
+                batch.append(item)
+            if sum(len(item.documents) for item in batch) >= self.batch_size:
+                self._index(job, batch, manifest)
+                batch.clear()
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sync")
+        try:
+            for path, stat in self._walk(job.directory, unreadable):
+                if job.cancelled:
+                    break
+                seen.add(path)
+                job.files_scanned += 1
+                previous = manifest.entries.get(path)
+                indexed = path in stored or (previous is not None and not previous["chunks"])
+                if (previous is not None and indexed and previous["mtime_ns"] == stat.st_mtime_ns
+                        and previous["size"] == stat.st_size):
+                    job.files_unchanged += 1
+                    continue
+                item = SyncedFile(path, stat, known=path in stored)
+                unchanged_digest = previous["sha256"] if previous is not None and indexed else None
+                pending[pool.submit(self._read, item, unchanged_digest)] = item
+                collect(block=len(pending) >= window)
+            while pending and not job.cancelled:
+                collect(block=True)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            try:
+                if batch:
+                    self._index(job, batch, manifest)
+                if not job.cancelled:
+                    self._delete_missing(job, stored, seen, unreadable, manifest)
+            finally:
+                manifest.save()
+        logger.info(f"Sync job {job.id}: {job.message} ({job.throughput:.1f} files/s)")
+
+    def _walk(self, root: str, unreadable: List[str]) -> Iterator[Tuple[str, os.stat_result]]:
+        """
+        Supported files under root with their stat
+
+        Hidden files and directories are skipped and symlinked directories
+        are not followed. Directories that cannot be listed are added to
+        unreadable, so their files are not taken for deleted.
+        """
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    entries = list(entries)
+            except OSError as e:
+                logger.warning(f"Cannot list {directory}: {e}")
+                unreadable.append(directory)
+                continue
+            for entry in sorted(entries, key=lambda entry: entry.name):
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif extract_file_extension(entry.name) in SYNC_FILE_TYPES and entry.is_file():
+                        yield entry.path, entry.stat()
+                except OSError as e:
+                    logger.warning(f"Cannot stat {entry.path}: {e}")
+
+    def _read(self, item: SyncedFile, unchanged_digest: Optional[str]) -> None:
+        """Hash a file and, unless its content is unchanged, chunk it (runs on a worker)"""
+        ext = extract_file_extension(item.path)
+        metadata = {"source": item.path, "type": ext}
+        if ext == "pdf":
+            with open(item.path, "rb") as f:
+                content = f.read()
+            item.digest = hashlib.sha256(content).hexdigest()
+            if item.digest != unchanged_digest:
+                item.documents = list(self.pdf_processor.iter_documents(content, metadata))
+            return
+        item.digest = file_digest(item.path)
+        if item.digest != unchanged_digest:
+            item.documents = list(self.text_processor.iter_documents(iter_text_blocks(item.path), metadata))
+
+    def _index(self, job: SyncJob, batch: List[SyncedFile], manifest: SyncManifest) -> None:
+        """Index a batch of files with one add_texts call, then delete their previous chunks"""
+        old_ids = [chunk_id for item in batch if item.known for chunk_id in self.vector_store.source_ids(item.path)]
+        documents = [document for item in batch for document in item.documents]
+        if documents:
+            report: Dict[str, int] = {}
+            chunk_ids = self.vector_store.add_texts(
+                [doc["text"] for doc in documents], [doc["metadata"] for doc in documents], report=report
+            )
+            if not chunk_ids:
+                for item in batch:
+                    job._fail_file(item.path, "indexing failed")
+                return
+            job.chunks_indexed += len(chunk_ids)
+            job.embeddings_reused += report.get("reused", 0)
+        job.chunks_deleted += self.vector_store.delete(old_ids)
+        for item in batch:
+            manifest.entries[item.path] = item.fingerprint()
+            if item.known:
+                job.files_updated += 1
+            else:
+                job.files_added += 1
+
+    def _delete_missing(self, job: SyncJob, stored: Set[str], seen: Set[str], unreadable: List[str],
+                        manifest: SyncManifest) -> None:
+        """Delete the sources of files under the synced directory that no longer exist"""
+        missing = {path for path in stored.union(manifest.entries)
+                   if is_under(path, job.directory) and path not in seen
+                   and not any(path == directory or is_under(path, directory) for directory in unreadable)}
+        if not missing:
+            return
+        old_ids = [chunk_id for path in missing for chunk_id in self.vector_store.source_ids(path)]
+        job.chunks_deleted += self.vector_store.delete(old_ids)
+        for path in missing:
+            manifest.entries.pop(path, None)
+        job.files_deleted += len(missing)
+
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond the history limit"""
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+            for job_id in finished[:max(0, len(finished) - self.history)]:
+                del self._jobs[job_id]
+
+
+def main():
+    """Sync a directory into the persisted knowledge base"""
+    parser = argparse.ArgumentParser(description="Sync a directory tree into the PandaAIQA knowledge base")
+    parser.add_argument("directory", help="directory to sync")
+    parser.add_argument("--workers", type=int, default=SYNC_WORKERS, help="threads hashing and chunking files")
+    args = parser.parse_args()
+    if not KB_PERSISTENCE_ENABLED:
+        parser.error("KB_PERSISTENCE_ENABLED is off, a sync outside the server would not be kept")
+    if not os.path.isdir(args.directory):
+        parser.error(f"Directory {args.directory} does not exist")
+
+    from simple_pandaaiqa.pdf_processor import PDFProcessor
+    from simple_pandaaiqa.text_processor import TextProcessor
+    from simple_pandaaiqa.vector_store import VectorStore
+
+    vector_store = VectorStore(persist_dir=DEFAULT_STORAGE_DIR)
+    directory_sync = DirectorySync(TextProcessor(), PDFProcessor(), vector_store, workers=args.workers)
+    job = directory_sync.sync(args.directory)
+    print(job.message)
+    for error in job.errors:
+        print(f"  {error}")
+    raise SystemExit(0 if job.status == "completed" and not job.files_failed else 1)
+
+
+if __name__ == "__main__":
+    main()
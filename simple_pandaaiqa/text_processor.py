@@ -4,9 +4,9 @@ Handles text splitting and document creation
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 
-from simple_pandaaiqa.config import CHUNK_SIZE, CHUNK_OVERLAP
+from simple_pandaaiqa.splitters import TextSplitter, get_splitter
 
 # Setup logging
 logging.basicConfig(
@@ -19,13 +19,28 @@ class TextProcessor:
     """Text processor class, processes text splitting and creates documents"""
 
     def __init__(
-        self, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        splitter: Optional[TextSplitter] = None,
     ):
-        """Initialize text processor"""
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
+        """
+        Initialize text processor
+
+        Args:
+            chunk_size: Chunk size for the configured strategy, defaults to its config value
+            chunk_overlap: Chunk overlap for the configured strategy, defaults to its config value
+            splitter: Splitter to use instead of the configured strategy
+        """
+        if splitter is None:
+            sizes = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+            splitter = get_splitter(**{name: value for name, value in sizes.items() if value is not None})
+        self.splitter = splitter
+        self.chunk_size = splitter.chunk_size
+        self.chunk_overlap = splitter.chunk_overlap
         logger.info(
-            f"Initialized text processor, chunk size={chunk_size}, chunk overlap={chunk_overlap}"
+            f"Initialized text processor, splitter={type(splitter).__name__}, "
+            f"chunk size={self.chunk_size}, chunk overlap={self.chunk_overlap}"
         )
 
     def process_text(
@@ -39,7 +54,9 @@ class TextProcessor:
             metadata: Optional metadata
 
         Returns:
-            List of documents, each containing text and metadata
+            List of documents, each containing text and metadata with chunk_id;
+            there is no chunk count, as streamed documents cannot know it when
+            they are indexed (use VectorStore.source_ids for a source's chunks)
         """
         if not text.strip():
             logger.warning("Received empty text for processing")
@@ -47,41 +64,39 @@ class TextProcessor:
 
         logger.info(f"Processing text, length={len(text)}")
         metadata = metadata or {}
-        chunks = self._split_text(text)
+        chunks = self.splitter.split_text(text)
         documents = [
             {
                 "text": chunk,
-                "metadata": {**metadata, "chunk_id": i, "chunk_count": len(chunks)},
+                "metadata": {**metadata, "chunk_id": i},
             }
             for i, chunk in enumerate(chunks)
         ]
         logger.info(f"Created {len(documents)} documents")
         return documents
 
-    def _split_text(self, text: str) -> List[str]:
+    def iter_documents(
+        self, blocks: Iterable[str], metadata: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Split text into multiple chunks
+        Stream documents from text that arrives in blocks
+
+        Only the text that later chunks can still reach is kept, so memory
+        does not depend on the length of the input. Unlike process_text,
+        whitespace-only chunks are skipped.
 
         Args:
-            text: Text to split
+            blocks: Consecutive pieces of the text, of any size
+            metadata: Optional metadata
 
-        Returns:
-            List of text chunks
+        Yields:
+            Documents, each containing text and metadata
         """
-        if len(text) <= self.chunk_size:
-            return [text]
-
-        chunks = []
-        start = 0
-        sentence_ends = {".", "!", "?", "\n"}
-        while start < len(text):
-            end = min(start + self.chunk_size, len(text))
-            if end < len(text):
-                for i in range(min(50, end - start)):
-                    if text[end - i - 1] in sentence_ends:
-                        end -= i
-                        break
-            chunks.append(text[start:end])
-            start = end - self.chunk_overlap if end < len(text) else end
-        logger.info(f"Text split into {len(chunks)} chunks")
-        return chunks
+        metadata = metadata or {}
+        count = 0
+        for _, chunk in self.splitter.iter_spans(blocks):
+            if not chunk.strip():
+                continue
+            yield {"text": chunk, "metadata": {**metadata, "chunk_id": count}}
+            count += 1
+        logger.info(f"Created {count} documents from streamed text")
@@ -2,8 +2,18 @@
 PandaAIQA Helper Functions
 """
 
+import asyncio
+import codecs
+import functools
+import itertools
 import os
+import tempfile
 import logging
+from concurrent.futures import Executor
+from contextlib import nullcontext
+from typing import Any, BinaryIO, Callable, Iterator, Tuple, Union
+
+from simple_pandaaiqa.config import UPLOAD_BLOCK_SIZE
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -31,4 +41,82 @@ def extract_file_extension(filename: str) -> str:
         File extension (lowercase)
     """
     _, ext = os.path.splitext(filename)
-    return ext.lower()[1:]  # Remove dot and convert to lowercase 
\ No newline at end of file
+    return ext.lower()[1:]  # Remove dot and convert to lowercase
+
+def save_upload(src: BinaryIO, max_bytes: int, block_size: int = UPLOAD_BLOCK_SIZE) -> Tuple[str, int]:
+    """
+    Copy an uploaded file to a temporary file in fixed-size blocks
+    
+    Args:
+        src: Readable binary file object
+        max_bytes: Maximum accepted size
+        block_size: Bytes copied at a time
+        
+    Returns:
+        Tuple of (temporary file path, size), the caller deletes the file
+        
+    Raises:
+        ValueError: If the file is larger than max_bytes
+    """
+    size = 0
+    with tempfile.NamedTemporaryFile(prefix="upload-", delete=False) as dst:
+        try:
+            for block in iter(lambda: src.read(block_size), b""):
+                size += len(block)
+                if size > max_bytes:
+                    raise ValueError(f"File too large. Maximum allowed size is {max_bytes} bytes")
+                dst.write(block)
+        except Exception:
+            dst.close()
+            os.remove(dst.name)
+            raise
+    return dst.name, size
+
+def iter_text_blocks(source: Union[str, BinaryIO], block_size: int = UPLOAD_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Read and incrementally decode a text file in fixed-size blocks
+    
+    Multi-byte characters split across blocks are decoded correctly. The
+    file is read as UTF-8; from the first block that is not valid UTF-8 on,
+    it is decoded as latin-1 instead.
+    
+    Args:
+        source: Text file path, or a binary file object that is read to its end
+        block_size: Bytes read at a time
+        
+    Yields:
+        Decoded text blocks
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    fallback = False
+    with open(source, "rb") if isinstance(source, str) else nullcontext(source) as f:
+        for block in itertools.chain(iter(lambda: f.read(block_size), b""), [None]):
+            final = block is None
+            block = block or b""
+            if not fallback:
+                pending = decoder.getstate()[0]
+                try:
+                    yield decoder.decode(block, final=final)
+                    continue
+                except UnicodeDecodeError:
+                    logger.info("Using latin-1 encoding to decode the rest of the file")
+                    decoder = codecs.getincrementaldecoder("latin-1")()
+                    fallback = True
+                    block = pending + block
+            yield decoder.decode(block, final=final)
+
+async def run_in_executor(executor: Executor, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking call in an executor without blocking the event loop
+    
+    Args:
+        executor: Bounded pool to run the call in
+        func: Blocking function
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+        
+    Returns:
+        Result of func
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs)) 
\ No newline at end of file
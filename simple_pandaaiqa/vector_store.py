@@ -1,64 +1,167 @@
 """
 Vector Store module for PandaAIQA
-Uses llama_index VectorStoreIndex for efficient document storage and retrieval
+Stores documents in a native NumPy index or a llama_index VectorStoreIndex
 """
 
 import logging
 import os
-from typing import List, Dict, Any, Optional, Union
+import threading
+from array import array
+from collections import Counter
+from typing import List, Dict, Any, Callable, Optional, Tuple, TypeVar, Union
 import numpy as np
 
-from llama_index.core import Document as LlamaDocument
 from llama_index.core import VectorStoreIndex, Settings
-from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
 from llama_index.core.retrievers import VectorIndexRetriever
-from llama_index.core.schema import NodeWithScore
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.vector_stores import FilterOperator, MetadataFilter, MetadataFilters
 from llama_index.core.storage.docstore import SimpleDocumentStore
 from llama_index.core.storage import StorageContext
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 
-from simple_pandaaiqa.config import DEFAULT_TOP_K, CHUNK_SIZE, CHUNK_OVERLAP
+from simple_pandaaiqa.config import (
+    DEFAULT_TOP_K,
+    EMBEDDING_BATCH_SIZE,
+    VECTOR_STORE_BACKEND,
+    IVF_NLIST,
+    IVF_NPROBE,
+    IVF_MIN_TRAIN_SIZE,
+    VECTOR_DTYPE,
+    VECTOR_RESCORE,
+    KB_COMPACT_SEGMENTS,
+    KB_COMPACT_DELETED_RATIO,
+    BATCH_SEARCH_MAX_SCORES,
+    SEARCH_MODE,
+    HYBRID_CANDIDATES,
+    HYBRID_RRF_K,
+    BM25_K1,
+    BM25_B,
+)
 from simple_pandaaiqa.embedder import Embedder
+from simple_pandaaiqa.index.bm25 import BM25Index, reciprocal_rank_fusion
+from simple_pandaaiqa.index.flat import FlatIndex, in_sorted, normalize_rows
+from simple_pandaaiqa.index.ivf import IVFIndex
+from simple_pandaaiqa.index.metadata import MetadataIndex, normalize_filters
+from simple_pandaaiqa.index.segments import SegmentLog
+from simple_pandaaiqa.index.storage import MappedRecords, is_snapshot, read_snapshot, write_snapshot
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+SEARCH_MODES = ("dense", "sparse", "hybrid")
+NODE_ID_PREFIX = "doc_"  # llama_index node ids are this prefix plus the chunk id
+
+T = TypeVar("T")
+
+class EmbedderAdapter(BaseEmbedding):
+    """llama_index embedding model that delegates to the shared Embedder"""
+    
+    _embedder: Embedder = PrivateAttr()
+    
+    def __init__(self, embedder: Embedder, **kwargs: Any):
+        super().__init__(
+            model_name=embedder.backend.model_name,
+            embed_batch_size=EMBEDDING_BATCH_SIZE,
+            **kwargs
+        )
+        self._embedder = embedder
+    
+    @classmethod
+    def class_name(cls) -> str:
+        return "EmbedderAdapter"
+    
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embedder.embed_text(query).tolist()
+    
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+    
+    def _get_text_embedding(self, text: str) -> List[float]:
+        # documents go through the embedding store, not the query cache
+        return self._embedder.embed_texts([text])[0].tolist()
+    
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embedder.embed_texts(texts).tolist()
+
+
 class VectorStore:
-    """Vector store using llama_index for document storage and retrieval"""
+    """Vector store for document storage and retrieval"""
     
-    def __init__(self, embedder: Optional[Embedder] = None):
-        """Initialize vector store"""
-        self.embedder = embedder
+    def __init__(self, embedder: Optional[Embedder] = None, backend: str = VECTOR_STORE_BACKEND,
+                 persist_dir: Optional[str] = None):
+        """
+        Initialize vector store
+        
+        Args:
+            embedder: Shared embedder, created if not provided
+            backend: "flat" (exact) or "ivf" (approximate) native index, or "llama_index"
+            persist_dir: Segment log directory, every add is persisted there and replayed on startup
+        """
+        if backend not in ("flat", "ivf", "llama_index"):
+            raise ValueError(f"Unknown vector store backend: {backend}")
+        self.backend = backend
+        self.embedder = embedder or Embedder()
         # 创建文档存储和存储上下文
         self.document_store = SimpleDocumentStore()
         self.storage_context = StorageContext.from_defaults(
             docstore=self.document_store
         )
         
-        self.node_parser = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-        
-        # 使用HuggingFace嵌入模型
-        self.embed_model = HuggingFaceEmbedding(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        # llama_index只通过共享的Embedder生成嵌入
+        self.embed_model = EmbedderAdapter(self.embedder)
         # 设置全局嵌入模型
         Settings.embed_model = self.embed_model
             
         self.index = None
+        self.vector_index = None  # native index, row ids map to self.documents
+        # keyword index over the same rows, native backends only
+        self.keyword_index = BM25Index(k1=BM25_K1, b=BM25_B) if backend != "llama_index" else None
+        self.metadata_index = MetadataIndex() if backend != "llama_index" else None
         self.documents = []  # Keep for backward compatibility
-        logger.info("Initialized vector store with llama_index")
+        # stable chunk id of every row, ascending; ids are never reused, rows are renumbered by compaction
+        self._ids: Union[array, np.ndarray] = array("q")
+        self._next_id = 0
+        self._deleted = np.zeros(0, dtype=np.int64)  # tombstoned rows, ascending, replaced rather than modified
+        self._layout = 0  # odd while compaction swaps in renumbered rows, see _stable
+        self.version = 0  # bumped whenever the contents change, lets caches detect stale answers
+        self._lock = threading.RLock()  # orders adds and deletes with segment appends and compaction snapshots
+        self._log = None
+        self._compaction = None
+        # first chunk id of every add whose segment is being written, ascending
+        self._appending: List[int] = []
+        self._appended = threading.Condition()
+        if persist_dir:
+            if backend == "llama_index":
+                logger.warning("Continuous persistence requires a native backend, use save_to_disk instead")
+            else:
+                self._log = SegmentLog(persist_dir)
+                self._restore_from_log()
+        logger.info(f"Initialized vector store with {backend} backend")
     
-    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> List[int]:
+    def _create_vector_index(self, dim: int, dtype: str = VECTOR_DTYPE) -> Union[FlatIndex, IVFIndex]:
+        """Create the native index for the configured backend"""
+        if self.backend == "ivf":
+            return IVFIndex(dim, nlist=IVF_NLIST, nprobe=IVF_NPROBE, min_train_size=IVF_MIN_TRAIN_SIZE,
+                            dtype=dtype, rescore=VECTOR_RESCORE)
+        return FlatIndex(dim, dtype=dtype, rescore=VECTOR_RESCORE)
+    
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+                  report: Optional[Dict[str, int]] = None) -> List[int]:
         """
         Add multiple text documents to the store
         
+        Texts are stored as given, one row (or llama_index node) per text, so
+        they should already be chunked.
+        
         Args:
             texts: List of document texts
             metadatas: Optional list of metadata dictionaries
+            report: Optional dictionary that receives embedding counts, see Embedder.embed_texts
             
         Returns:
-            List of indices for the added documents
+            Chunk ids of the added documents, stable for their lifetime (see delete)
         """
         try:
             if not texts:
@@ -72,40 +175,222 @@ class VectorStore:
                 logger.warning("Length of metadatas doesn't match length of texts")
                 metadatas = metadatas[:len(texts)] + [{} for _ in range(len(texts) - len(metadatas))]
             
-            # Create llama_index Documents
-            llama_docs = []
-            for i, (text, metadata) in enumerate(zip(texts, metadatas)):
-                doc_id = f"doc_{len(self.documents) + i}"
-                llama_doc = LlamaDocument(
-                    text=text,
-                    metadata=metadata,
-                    doc_id=doc_id
-                )
-                llama_docs.append(llama_doc)
+            if self.backend != "llama_index":
+                return self._add_texts_native(texts, metadatas, report)
+            
+            # Texts are already chunked, insert each one as a node with its embedding
+            # instead of letting llama_index split and embed them again
+            vectors = self.embedder.embed_texts(texts, report=report)
+            with self._lock:
+                first_id = self._next_id
+                nodes = []
+                for i, (text, metadata) in enumerate(zip(texts, metadatas)):
+                    nodes.append(TextNode(
+                        text=text,
+                        metadata=metadata,
+                        id_=f"{NODE_ID_PREFIX}{first_id + i}",
+                        embedding=vectors[i].tolist(),
+                    ))
+                
+                # Create or update the index
+                if self.index is None:
+                    # 使用当前设置的embedding模型
+                    self.index = VectorStoreIndex(
+                        nodes,
+                        storage_context=self.storage_context,
+                        embed_model=self.embed_model
+                    )
+                else:
+                    self.index.insert_nodes(nodes)
                 
                 # Keep track of documents for backward compatibility
-                self.documents.append({"text": text, "metadata": metadata})
-            
-            # Create or update the index
-            if self.index is None:
-                # 使用当前设置的embedding模型
-                self.index = VectorStoreIndex.from_documents(
-                    llama_docs,
-                    storage_context=self.storage_context,
-                    transformations=[self.node_parser]
-                )
-            else:
-                self.index.insert_nodes(
-                    self.node_parser.get_nodes_from_documents(llama_docs)
-                )
+                chunk_ids = self._allocate_ids(len(texts))
+                self.documents.extend({"text": text, "metadata": metadata}
+                                      for text, metadata in zip(texts, metadatas))
+                self.version += 1
             
             logger.info(f"Added {len(texts)} documents to vector store")
-            return list(range(len(self.documents) - len(texts), len(self.documents)))
+            return chunk_ids
             
         except Exception as e:
             logger.error(f"Error adding texts: {e}", exc_info=True)
             return []
     
+    def _add_texts_native(self, texts: List[str], metadatas: List[Dict[str, Any]],
+                          report: Optional[Dict[str, int]] = None) -> List[int]:
+        """Embed texts in batches and append them to the native index"""
+        vectors = self.embedder.embed_texts(texts, report=report)
+        records = [{"text": text, "metadata": metadata} for text, metadata in zip(texts, metadatas)]
+        with self._lock:
+            if self.vector_index is None:
+                self.vector_index = self._create_vector_index(vectors.shape[1])
+            self.vector_index.add(vectors)
+            self.keyword_index.add(texts)
+            self.metadata_index.add(metadatas)
+            # ids before documents, so every row a search can format has its id
+            chunk_ids = self._allocate_ids(len(records))
+            self.documents.extend(records)
+            self.version += 1
+            log = self._log
+            if log is not None:
+                with self._appended:
+                    self._appending.append(chunk_ids[0])
+        if log is not None:
+            self._append_segment(log, chunk_ids[0], vectors, records)
+        
+        logger.info(f"Added {len(texts)} documents to vector store")
+        return chunk_ids
+    
+    def _allocate_ids(self, count: int) -> List[int]:
+        """Assign the next chunk ids to rows being appended (call with the lock held)"""
+        chunk_ids = list(range(self._next_id, self._next_id + count))
+        if not isinstance(self._ids, array):
+            self._ids = array("q", np.asarray(self._ids, dtype=np.int64).tobytes())
+        self._ids.extend(chunk_ids)
+        self._next_id += count
+        return chunk_ids
+    
+    def _chunk_ids(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Chunk ids of rows, all rows if None, as a new int64 array (call with the lock held)"""
+        # a view of a growing array must not outlive the lock, it would block the next append
+        ids = np.frombuffer(self._ids, dtype=np.int64) if isinstance(self._ids, array) else np.asarray(self._ids)
+        return ids.copy() if rows is None else ids[rows]
+    
+    def _append_segment(self, log: SegmentLog, start: int, vectors: np.ndarray,
+                        records: List[Dict[str, Any]]) -> None:
+        """
+        Persist one add to the segment log, compacting in the background when enough are pending
+        
+        Runs without the store lock, so concurrent adds write their segments
+        in parallel. It returns only once the segments of all earlier adds are
+        written as well, since replay stops at the first missing one.
+        """
+        try:
+            pending = log.append(start, vectors, records)
+        except Exception as e:
+            # the log now has a gap, only a full compaction can make it replayable again
+            logger.error(f"Error appending segment, scheduling compaction: {e}", exc_info=True)
+            pending = KB_COMPACT_SEGMENTS
+        with self._appended:
+            self._appending.remove(start)
+            self._appended.notify_all()
+            self._appended.wait_for(lambda: not self._appending or self._appending[0] > start)
+        if pending >= KB_COMPACT_SEGMENTS:
+            self._schedule_compaction()
+    
+    def _wait_for_appends(self) -> None:
+        """Wait until no segment is being written (call with the lock held, so no new one starts)"""
+        with self._appended:
+            self._appended.wait_for(lambda: not self._appending)
+    
+    def _schedule_compaction(self) -> None:
+        """Start a background compaction unless one is already running"""
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self.compact, name="kb-compaction", daemon=True)
+        self._compaction.start()
+    
+    def compact(self) -> bool:
+        """
+        Drop deleted rows, then fold pending segments and tombstones into a fresh base snapshot
+        
+        Dropping deleted rows rebuilds the native indexes from the remaining
+        rows under the store lock (searches overlapping the swap retry, see
+        _stable). Only capturing the current rows for the snapshot holds the
+        lock; the snapshot is written while adds continue.
+        
+        Returns:
+            Success status
+        """
+        try:
+            with self._lock:
+                if self.vector_index is None:
+                    return False
+                dropped = len(self._deleted)
+                if dropped:
+                    self._purge()
+                if self._log is None:
+                    return dropped > 0
+                arrays, records = self._capture()
+                info = self._snapshot_info()
+                generation, tombstones = self._log.generation, self._log.tombstone_count
+            
+            if not self._log.compact(arrays, records, info, generation=generation, tombstones=tombstones):
+                return False
+            logger.info(f"Compacted segment log into a base snapshot of {len(records)} documents")
+            return True
+        except Exception as e:
+            logger.error(f"Error compacting segment log: {e}", exc_info=True)
+            return False
+    
+    def _purge(self) -> None:
+        """Rebuild the native indexes and documents without the deleted rows (call with the lock held)"""
+        dropped = len(self._deleted)
+        arrays, records = self._capture(self._live_rows())
+        info = self._snapshot_info()
+        self._layout += 1
+        try:
+            self._apply_snapshot(arrays, records, info)
+        finally:
+            self._layout += 1
+        logger.info(f"Dropped {dropped} deleted documents, {len(self.documents)} remain")
+    
+    def _stable(self, search: Callable[[], T]) -> T:
+        """
+        Run a native search against one row numbering
+        
+        Searches hold no lock, so compaction may renumber rows while one runs;
+        the search is then repeated rather than formatting row ids of one
+        numbering with the documents of the other. A search that mixed both
+        numberings may also fail outright, which is retried the same way.
+        """
+        while True:
+            layout = self._layout
+            if layout % 2:
+                # compaction is swapping in renumbered rows, wait for it
+                with self._lock:
+                    pass
+                continue
+            try:
+                results = search()
+            except (IndexError, ValueError):
+                if self._layout == layout:
+                    raise
+                continue
+            if self._layout == layout:
+                return results
+    
+    def _restore_from_log(self) -> None:
+        """Open the base snapshot and replay the segments written after it"""
+        try:
+            base = self._log.open_base()
+            if base is not None:
+                self._apply_snapshot(*base)
+            replayed = 0
+            for vectors, records in self._log.replay(self._next_id):
+                if self.vector_index is None:
+                    self.vector_index = self._create_vector_index(vectors.shape[1])
+                self.vector_index.add(vectors)
+                self.keyword_index.add(record["text"] for record in records)
+                self.metadata_index.add(record["metadata"] for record in records)
+                self._allocate_ids(len(records))
+                self.documents.extend(records)
+                replayed += 1
+            self._deleted = self._rows_of(self._log.tombstones())
+            logger.info(f"Restored {self.document_count} documents from {self._log.directory} "
+                        f"({replayed} segments replayed, {len(self._deleted)} deleted documents to drop)")
+            if self._log.pending >= KB_COMPACT_SEGMENTS or self._compaction_due():
+                self._schedule_compaction()
+        except Exception as e:
+            # never append to a log that could not be read, it would overwrite its segments
+            logger.error(f"Error restoring from segment log, continuous persistence disabled: {e}", exc_info=True)
+            self._log = None
+            self.vector_index = None
+            self.keyword_index.clear()
+            self.metadata_index.clear()
+            self.documents = []
+            self._ids, self._next_id, self._deleted = array("q"), 0, np.zeros(0, dtype=np.int64)
+    
     def add_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> int:
         """
         Add a single text document to the store
@@ -124,26 +409,192 @@ class VectorStore:
             logger.error(f"Error adding text: {e}", exc_info=True)
             return -1
     
-    def search(self, query: str, top_k: int = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+    @property
+    def document_count(self) -> int:
+        """Number of searchable documents, deleted ones not counted"""
+        return len(self.documents) - len(self._deleted)
+    
+    def delete(self, ids: List[int]) -> int:
+        """
+        Delete documents by chunk id
+        
+        On the native backends deleted rows become tombstones: searches mask
+        them out instead of the indexes being rebuilt, and a background
+        compaction drops them once they make up KB_COMPACT_DELETED_RATIO of
+        the rows. With continuous persistence the deletion is logged first.
+        
+        Args:
+            ids: Chunk ids, as returned by add_texts and in search results; unknown ids are ignored
+            
+        Returns:
+            Number of documents deleted
+        """
+        if self.backend == "llama_index":
+            return self._delete_llama(ids)
+        with self._lock:
+            rows = self._rows_of(ids)
+            if len(rows) == 0:
+                return 0
+            if self._log is not None:
+                self._log.delete(self._chunk_ids(rows))
+            self._deleted = np.union1d(self._deleted, rows)
+            self.version += 1
+            if self._compaction_due():
+                self._schedule_compaction()
+        logger.info(f"Deleted {len(rows)} documents from vector store")
+        return len(rows)
+    
+    def _delete_llama(self, ids: List[int]) -> int:
+        """Remove nodes from the llama_index index and the documents list"""
+        wanted = set(ids)
+        with self._lock:
+            keep = [row for row, chunk_id in enumerate(self._ids) if chunk_id not in wanted]
+            if len(keep) == len(self.documents):
+                return 0
+            kept = set(keep)
+            self.index.delete_nodes([f"{NODE_ID_PREFIX}{chunk_id}" for row, chunk_id in enumerate(self._ids)
+                                     if row not in kept], delete_from_docstore=True)
+            count = len(self.documents) - len(keep)
+            self.documents = [self.documents[row] for row in keep]
+            self._ids = array("q", [self._ids[row] for row in keep])
+            self.version += 1
+        logger.info(f"Deleted {count} documents from vector store")
+        return count
+    
+    def _rows_of(self, ids: Any) -> np.ndarray:
+        """Rows holding chunk ids that are not deleted yet, ascending (call with the lock held)"""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        known = self._chunk_ids()
+        rows = np.searchsorted(known, ids[in_sorted(ids, known)])
+        return rows[~in_sorted(rows, self._deleted)]
+    
+    def _live_rows(self) -> np.ndarray:
+        """Rows that are not deleted, ascending (call with the lock held)"""
+        return np.setdiff1d(np.arange(len(self.documents)), self._deleted, assume_unique=True)
+    
+    def _compaction_due(self) -> bool:
+        """Whether enough rows are deleted to drop them in a background compaction"""
+        return len(self._deleted) > 0 and len(self._deleted) >= KB_COMPACT_DELETED_RATIO * len(self.documents)
+    
+    def source_ids(self, source: Any) -> List[int]:
+        """
+        Chunk ids of a source's documents
+        
+        Args:
+            source: Value of the "source" metadata field, the file name for uploads
+            
+        Returns:
+            Chunk ids in insertion order
+        """
+        if self.backend == "llama_index":
+            return [chunk_id for chunk_id, document in zip(self._ids, self.documents)
+                    if document["metadata"].get("source") == source]
+        with self._lock:
+            rows = self.metadata_index.rows(normalize_filters({"source": source}))
+            return self._chunk_ids(rows[~in_sorted(rows, self._deleted)]).tolist()
+    
+    def sources(self) -> Dict[Any, int]:
+        """
+        Number of searchable documents per source
+        
+        Returns:
+            Mapping of "source" metadata value to document count
+        """
+        if self.backend == "llama_index":
+            return dict(Counter(document["metadata"]["source"] for document in self.documents
+                                if "source" in document["metadata"]))
+        counts = {}
+        with self._lock:
+            for source in self.metadata_index.values("source"):
+                rows = self.metadata_index.rows({"source": [source]})
+                count = len(rows) - int(in_sorted(rows, self._deleted).sum())
+                if count:
+                    counts[source] = count
+        return counts
+    
+    def delete_source(self, source: Any) -> int:
+        """
+        Delete every document of a source, see delete
+        
+        The metadata index serves as the source -> rows index, so this costs
+        as much as the source's documents, not the store.
+        
+        Args:
+            source: Value of the "source" metadata field
+            
+        Returns:
+            Number of documents deleted
+        """
+        with self._lock:
+            return self.delete(self.source_ids(source))
+    
+    def replace_source(self, source: Any, texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None,
+                       report: Optional[Dict[str, int]] = None) -> List[int]:
+        """
+        Replace every document of a source with new texts
+        
+        The new documents are added before the old ones are deleted, so
+        searches keep finding the old version until the new one is complete,
+        and the old version is kept if adding fails.
+        
+        Args:
+            source: Value of the "source" metadata field, set on every new document
+            texts: New document texts, already chunked, see add_texts
+            metadatas: Optional metadata for the new documents
+            report: Optional dictionary that receives embedding counts, see Embedder.embed_texts
+            
+        Returns:
+            Chunk ids of the new documents
+        """
+        old_ids = self.source_ids(source)
+        metadatas = [{**metadata, "source": source} for metadata in (metadatas or [{} for _ in texts])]
+        new_ids = self.add_texts(texts, metadatas, report=report) if texts else []
+        if texts and not new_ids:
+            logger.warning(f"Failed to add the new version of {source}, keeping the old one")
+            return []
+        deleted = self.delete(old_ids)
+        logger.info(f"Replaced {deleted} documents of {source} with {len(new_ids)}")
+        return new_ids
+    
+    def search(self, query: str, top_k: int = DEFAULT_TOP_K, query_vector: Optional[np.ndarray] = None,
+               mode: str = SEARCH_MODE, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Search for similar documents
         
         Args:
             query: Query text
             top_k: Number of results to return
+            query_vector: Embedding of the query if already computed (native backends)
+            mode: "dense", "sparse" or "hybrid" (native backends, llama_index is always dense)
+            filters: Only return documents whose metadata matches, e.g. {"source": "handbook.pdf"};
+                a field may list several accepted values, all fields must match
             
         Returns:
             List of dictionaries containing document text, metadata, and score
+            (cosine similarity, or BM25 score in sparse mode); hybrid results are
+            ordered by their reciprocal rank fusion value, returned as fused_score
+            
+        Raises:
+            ValueError: If mode or filters are invalid
         """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        filters = normalize_filters(filters)
         try:
-            if not self.index or len(self.documents) == 0:
+            if len(self.documents) == 0:
                 logger.warning("Vector store is empty, no documents to search")
                 return []
             
+            if self.backend != "llama_index":
+                return self._stable(lambda: self._search_native(
+                    query, top_k, query_vector, mode, self.metadata_index.rows(filters) if filters else None
+                ))
+            
             # Create retriever with specified top_k
             retriever = VectorIndexRetriever(
                 index=self.index,
-                similarity_top_k=top_k
+                similarity_top_k=top_k,
+                filters=self._llama_filters(filters) if filters else None
             )
             
             # Retrieve nodes
@@ -159,6 +610,7 @@ class VectorStore:
                 
                 # Format result
                 result = {
+                    "id": self._node_chunk_id(node.node.node_id if hasattr(node, 'node') else node.node_id),
                     "text": node_text,
                     "metadata": node_metadata,
                     "score": float(node.score) if hasattr(node, 'score') else 0.0
@@ -172,6 +624,153 @@ class VectorStore:
             logger.error(f"Error searching documents: {e}", exc_info=True)
             return []
     
+    def search_batch(self, queries: List[str], top_k: int = DEFAULT_TOP_K, query_vectors: Optional[np.ndarray] = None,
+                     mode: str = SEARCH_MODE, filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for documents similar to each of several queries
+        
+        On the native backends all queries are embedded in batched forward
+        passes and scored against the index with matrix-matrix products, then
+        fused with per-query keyword results in hybrid mode; the llama_index
+        backend searches them one at a time.
+        
+        Args:
+            queries: Query texts
+            top_k: Number of results per query
+            query_vectors: Embeddings of the queries if already computed (native backends)
+            mode: "dense", "sparse" or "hybrid", see search()
+            filters: Metadata filters applied to every query, see search()
+            
+        Returns:
+            One result list per query, in the order of queries, formatted like search()
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        filters = normalize_filters(filters)
+        try:
+            if len(self.documents) == 0:
+                logger.warning("Vector store is empty, no documents to search")
+                return [[] for _ in queries]
+            
+            if self.backend == "llama_index":
+                return [self.search(query, top_k, filters=filters) for query in queries]
+            
+            if mode != "sparse" and query_vectors is None:
+                query_vectors = self.embedder.embed_queries(queries)
+            results = self._stable(lambda: self._search_batch_native(queries, top_k, query_vectors, mode, filters))
+            logger.info(f"Found documents for {len(queries)} queries")
+            return results
+        
+        except Exception as e:
+            logger.error(f"Error searching documents: {e}", exc_info=True)
+            return [[] for _ in queries]
+    
+    def _search_native(self, query: str, top_k: int, query_vector: Optional[np.ndarray] = None,
+                       mode: str = SEARCH_MODE, candidates: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Score the query against the native vector index, the keyword index or both, only candidate rows if given"""
+        exclude = self._deleted if len(self._deleted) else None
+        fused = None
+        if mode == "sparse":
+            row_ids, scores = self.keyword_index.search(query, top_k, candidates=candidates, exclude=exclude)
+        else:
+            if query_vector is None:
+                query_vector = self.embedder.embed_text(query)
+            depth = max(top_k, HYBRID_CANDIDATES) if mode == "hybrid" else top_k
+            row_ids, scores = self.vector_index.search(query_vector, depth, candidates=candidates, exclude=exclude)
+            if mode == "hybrid":
+                row_ids, scores, fused = self._fuse(query, query_vector, row_ids, top_k, candidates, exclude)
+        results = self._format_native(row_ids, scores, fused)
+        logger.info(f"Found {len(results)} similar documents")
+        return results
+    
+    def _search_batch_native(self, queries: List[str], top_k: int, query_vectors: Optional[np.ndarray],
+                             mode: str, filters: Optional[Dict[str, List[Any]]]) -> List[List[Dict[str, Any]]]:
+        """Score all queries against the native indexes, dense scores as batched matrix products"""
+        candidates = self.metadata_index.rows(filters) if filters else None
+        exclude = self._deleted if len(self._deleted) else None
+        if mode == "sparse":
+            hits = [self.keyword_index.search(query, top_k, candidates=candidates, exclude=exclude)
+                    for query in queries]
+        else:
+            depth = max(top_k, HYBRID_CANDIDATES) if mode == "hybrid" else top_k
+            hits = self.vector_index.search_batch(query_vectors, depth, max_scores=BATCH_SEARCH_MAX_SCORES,
+                                                  candidates=candidates, exclude=exclude)
+            if mode == "hybrid":
+                hits = [self._fuse(query, query_vector, row_ids, top_k, candidates, exclude)
+                        for query, query_vector, (row_ids, _) in zip(queries, query_vectors, hits)]
+        return [self._format_native(*hit) for hit in hits]
+    
+    def _fuse(self, query: str, query_vector: np.ndarray, dense_ids: np.ndarray, top_k: int,
+              candidates: Optional[np.ndarray] = None,
+              exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Keyword-search the query and fuse the hits with dense hits by reciprocal rank
+        
+        Returns:
+            Tuple of (row ids, cosine similarities, fused scores), best fused first;
+            keyword-only hits are scored against the query vector too, so every
+            result carries a cosine similarity
+        """
+        sparse_ids, _ = self.keyword_index.search(query, max(top_k, HYBRID_CANDIDATES), candidates=candidates,
+                                                  exclude=exclude)
+        row_ids, fused = reciprocal_rank_fusion([dense_ids, sparse_ids], top_k, k=HYBRID_RRF_K)
+        indexed = row_ids < len(self.vector_index)  # keyword rows of a concurrent add may lack a vector yet
+        row_ids, fused = row_ids[indexed], fused[indexed]
+        query_vector = normalize_rows(np.asarray(query_vector, dtype=np.float32)[None])[0]
+        return row_ids, self.vector_index.get_vectors(row_ids) @ query_vector, fused
+    
+    @staticmethod
+    def _llama_filters(filters: Dict[str, List[Any]]) -> MetadataFilters:
+        """Normalized filters as llama_index metadata filters"""
+        return MetadataFilters(filters=[
+            MetadataFilter(key=field, value=values[0], operator=FilterOperator.EQ) if len(values) == 1
+            else MetadataFilter(key=field, value=values, operator=FilterOperator.IN)
+            for field, values in filters.items()
+        ])
+    
+    @staticmethod
+    def _node_chunk_id(node_id: str) -> Optional[int]:
+        """Chunk id of a llama_index node, None for nodes not added by this store"""
+        suffix = node_id[len(NODE_ID_PREFIX):] if node_id.startswith(NODE_ID_PREFIX) else ""
+        return int(suffix) if suffix.isdigit() else None
+    
+    def _format_native(self, row_ids: np.ndarray, scores: np.ndarray,
+                       fused: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Turn native index hits into result dictionaries, with fused_score when fused scores are given"""
+        results = []
+        for i, (row_id, score) in enumerate(zip(row_ids, scores)):
+            if row_id >= len(self.documents):
+                continue  # vector of a concurrent add whose document is not appended yet
+            document = self.documents[row_id]
+            result = {
+                "id": int(self._ids[row_id]),
+                "text": document["text"],
+                "metadata": document["metadata"],
+                "score": float(score)
+            }
+            if fused is not None:
+                result["fused_score"] = float(fused[i])
+            results.append(result)
+        return results
+    
+    def evaluate_recall(
+        self, queries: List[str], top_k: int = 10, nprobe_values: Optional[List[int]] = None
+    ) -> Dict[int, Dict[str, float]]:
+        """
+        Measure recall@k of the IVF index against exact search for real queries
+        
+        Args:
+            queries: Query texts
+            top_k: k for recall@k
+            nprobe_values: nprobe settings to evaluate
+            
+        Returns:
+            Mapping nprobe -> {"recall": ..., "query_ms": ..., "exact_ms": ...}
+        """
+        if not isinstance(self.vector_index, IVFIndex):
+            raise ValueError("Recall evaluation requires the ivf backend with indexed documents")
+        return self.vector_index.recall_at_k(self.embedder.embed_queries(queries), top_k, nprobe_values)
+    
     def clear(self) -> None:
         """Clear all documents and vectors from the store"""
         try:
@@ -181,23 +780,60 @@ class VectorStore:
                 docstore=self.document_store
             )
             
-            self.index = None
-            self.documents = []
+            with self._lock:
+                self.index = None
+                self.vector_index = None
+                if self.keyword_index is not None:
+                    self.keyword_index.clear()
+                    self.metadata_index.clear()
+                self.documents = []
+                self._ids, self._next_id, self._deleted = array("q"), 0, np.zeros(0, dtype=np.int64)
+                self.version += 1
+                if self._log is not None:
+                    # a segment written after the reset would be replayed as the first rows
+                    self._wait_for_appends()
+                    self._log.reset()
             logger.info("Vector store cleared")
         except Exception as e:
             logger.error(f"Error clearing vector store: {e}", exc_info=True)
             
+    def overlaps_persist_dir(self, directory: str) -> bool:
+        """
+        Whether a directory is the segment log directory, lies inside it or contains it
+        
+        Saving a snapshot there would replace the live log, and loading from
+        there would reset the log the snapshot is read from.
+        
+        Args:
+            directory: Snapshot directory
+            
+        Returns:
+            True if the directory must not be used for save_to_disk or load_from_disk
+        """
+        if self._log is None:
+            return False
+        target = os.path.realpath(directory)
+        log_dir = os.path.realpath(self._log.directory)
+        return target == log_dir or target.startswith(log_dir + os.sep) or log_dir.startswith(target + os.sep)
+    
     def save_to_disk(self, directory: str) -> bool:
         """
         Save the vector store to disk
         
         Args:
-            directory: Directory to save to
+            directory: Directory to save to, not the persist directory (see overlaps_persist_dir)
             
         Returns:
             Success status
         """
         try:
+            if self.overlaps_persist_dir(directory):
+                logger.error(f"Refusing to save to {directory}, it overlaps the persist directory "
+                             f"{self._log.directory}")
+                return False
+            if self.backend != "llama_index":
+                return self._save_native(directory)
+            
             if self.index is None:
                 logger.warning("No index to save")
                 return False
@@ -210,20 +846,117 @@ class VectorStore:
             logger.error(f"Error saving vector store: {e}", exc_info=True)
             return False
             
-    def load_from_disk(self, directory: str) -> bool:
+    def _save_native(self, directory: str) -> bool:
+        """Write the native index and documents as a memory-mappable snapshot"""
+        if self.vector_index is None:
+            logger.warning("No index to save")
+            return False
+        
+        with self._lock:
+            arrays, records = self._capture()
+            info = self._snapshot_info()
+        write_snapshot(directory, arrays, records, info)
+        logger.info(f"Vector store saved to {directory}")
+        return True
+    
+    def _capture(
+        self, rows: Optional[np.ndarray] = None
+    ) -> Tuple[Dict[str, np.ndarray], Union[MappedRecords, List[Dict[str, Any]]]]:
+        """
+        Index arrays and records as of now, unaffected by later adds (call with the lock held)
+        
+        Args:
+            rows: Only these rows, renumbered from 0; all rows that are not deleted if None
+        """
+        if rows is None and len(self._deleted):
+            rows = self._live_rows()
+        arrays = dict(self.vector_index.arrays(rows))
+        arrays.update((f"bm25_{name}", values) for name, values in self.keyword_index.arrays(rows).items())
+        arrays.update((f"meta_{name}", values) for name, values in self.metadata_index.arrays(rows).items())
+        arrays["chunk_ids"] = self._chunk_ids(rows)
+        if isinstance(self.documents, MappedRecords):
+            if rows is None:
+                return arrays, self.documents.prefix(len(self.documents))
+            return arrays, self.documents.select(rows)
+        if rows is None:
+            return arrays, self.documents[:]
+        return arrays, [self.documents[row] for row in rows.tolist()]
+    
+    def _snapshot_info(self) -> Dict[str, Any]:
+        """Manifest fields describing the native index"""
+        return {"backend": self.backend, "dtype": self.vector_index.dtype, "dim": self.vector_index.dim,
+                "next_id": self._next_id}
+    
+    def _apply_snapshot(self, arrays: Dict[str, np.ndarray], records: MappedRecords, manifest: Dict[str, Any]) -> None:
+        """Replace the native index and documents with an opened snapshot"""
+        self.vector_index = self._create_vector_index(manifest["dim"], dtype=manifest["dtype"])
+        self.vector_index.load_arrays(arrays)
+        # snapshots written before the keyword or metadata index existed are indexed from their records
+        keyword_arrays = {name[5:]: values for name, values in arrays.items() if name.startswith("bm25_")}
+        if keyword_arrays:
+            self.keyword_index.load_arrays(keyword_arrays)
+        else:
+            logger.info(f"Building keyword index for {len(records)} documents")
+            self.keyword_index.clear()
+            self.keyword_index.add(record["text"] for record in records)
+        metadata_arrays = {name[5:]: values for name, values in arrays.items() if name.startswith("meta_")}
+        if metadata_arrays:
+            self.metadata_index.load_arrays(metadata_arrays)
+        else:
+            logger.info(f"Building metadata index for {len(records)} documents")
+            self.metadata_index.clear()
+            self.metadata_index.add(record["metadata"] for record in records)
+        # snapshots written before chunk ids existed numbered chunks by row
+        chunk_ids = arrays.get("chunk_ids")
+        self._ids = np.arange(len(records), dtype=np.int64) if chunk_ids is None else chunk_ids
+        self._next_id = int(manifest.get("next_id", len(records)))
+        self._deleted = np.zeros(0, dtype=np.int64)
+        self.documents = records
+    
+    def _load_native(self, directory: str, verify: bool = False) -> bool:
+        """Open a snapshot, memory-mapping vectors and records instead of parsing them"""
+        if not is_snapshot(directory):
+            logger.warning(f"No vector store snapshot found in {directory}")
+            return False
+        
+        arrays, records, manifest = read_snapshot(directory, verify=verify)
+        with self._lock:
+            self._apply_snapshot(arrays, records, manifest)
+            self.version += 1
+            if self._log is not None:
+                # the loaded snapshot replaces the logged knowledge base, durably before the load returns
+                self._wait_for_appends()
+                try:
+                    self._log.replace(*self._capture(), self._snapshot_info())
+                except Exception as e:
+                    logger.error(f"Error writing the loaded snapshot to the segment log: {e}", exc_info=True)
+                    self._log.reset()
+                    self._schedule_compaction()
+        logger.info(f"Vector store loaded from {directory} with {self.document_count} documents")
+        return True
+    
+    def load_from_disk(self, directory: str, verify: bool = False) -> bool:
         """
         Load the vector store from disk
         
         Args:
-            directory: Directory to load from
+            directory: Directory to load from, not the persist directory (see overlaps_persist_dir)
+            verify: Check snapshot checksums before loading (native backends)
             
         Returns:
             Success status
         """
         try:
+            if self.overlaps_persist_dir(directory):
+                logger.error(f"Refusing to load from {directory}, it overlaps the persist directory "
+                             f"{self._log.directory}")
+                return False
             if not os.path.exists(directory):
                 logger.warning(f"Directory {directory} does not exist")
                 return False
+            
+            if self.backend != "llama_index":
+                return self._load_native(directory, verify=verify)
                 
             # 使用最新版本的加载方法
             # 先加载存储上下文
@@ -231,9 +964,11 @@ class VectorStore:
             # 使用加载的存储上下文创建索引
             self.index = VectorStoreIndex.from_storage(storage_context)
             self.storage_context = storage_context
+            self.version += 1
             
             # 重建documents列表以保持向后兼容性
             self.documents = []
+            chunk_ids = []
             # 遍历文档存储中的所有文档
             if hasattr(self.index, 'docstore') and hasattr(self.index.docstore, 'docs'):
                 for node_id, node in self.index.docstore.docs.items():
@@ -242,6 +977,9 @@ class VectorStore:
                             "text": node.text,
                             "metadata": node.metadata if hasattr(node, 'metadata') else {}
                         })
+                        chunk_ids.append(self._node_chunk_id(node_id))
+            self._next_id = max((chunk_id + 1 for chunk_id in chunk_ids if chunk_id is not None), default=0)
+            self._ids = array("q", [chunk_id if chunk_id is not None else -1 for chunk_id in chunk_ids])
                     
             logger.info(f"Vector store loaded from {directory} with {len(self.documents)} documents")
             return True
@@ -0,0 +1,83 @@
+"""
+Shared fixtures: a local stub completions server standing in for LM Studio,
+and the API module with a hash embedding backend instead of the model
+"""
+
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+import simple_pandaaiqa.config as config
+
+# nothing written to the working directory, set before the modules copy these settings
+config.KB_PERSISTENCE_ENABLED = False
+config.EMBEDDING_STORE_ENABLED = False
+
+from stub_completions import StubCompletionsHandler, start_stub_server
+
+TOKENS = StubCompletionsHandler.tokens
+
+
+class HashModel:
+    """Deterministic stand-in for SentenceTransformer, one random unit vector per distinct text"""
+
+    dim = 384
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, str):
+            return self._vector(texts)
+        return np.stack([self._vector(text) for text in texts])
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+
+class HashBackend:
+    """Embedding backend around HashModel, so tests need neither the model nor its download"""
+
+    model_name = "hash"
+    model = HashModel()
+    dimension = HashModel.dim
+
+
+@pytest.fixture(scope="session")
+def stub_server():
+    server, api_base = start_stub_server(token_delay=0.001)
+    yield api_base
+    server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def failing_server():
+    server, api_base = start_stub_server(token_delay=0.001, status=500)
+    yield api_base
+    server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def api(stub_server):
+    from simple_pandaaiqa.generator import Generator
+
+    # the app serves its static files relative to the repository root
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        import simple_pandaaiqa.api as api_module
+    finally:
+        os.chdir(cwd)
+    api_module.embedder.backend = HashBackend()
+    # a fresh generator, the one created on import has probed LM Studio's default address
+    api_module.generator = Generator(api_base=stub_server)
+    return api_module
@@ -0,0 +1,69 @@
+"""/api/query/stream event order, answered by the stub completions server"""
+
+import asyncio
+import json
+
+import httpx
+
+from simple_pandaaiqa.generator import GenerationError
+
+from conftest import TOKENS
+
+
+def parse_events(body):
+    """(event, data) pairs of a server-sent event stream"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def stream_query(api, text):
+    async def request():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            response = await client.post("/api/query/stream", json={"text": text})
+        await api.generator.aclose()
+        return response
+
+    return asyncio.run(request())
+
+
+def test_context_then_tokens_then_done(api):
+    api.vector_store.clear()
+    api.vector_store.add_texts(["Pandas eat bamboo.", "Pandas live in China."], [{"source": "pandas.txt"}] * 2)
+
+    response = stream_query(api, "What do pandas eat?")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+    assert names[0] == "context"
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    assert {document["text"] for document in events[0][1]} <= {"Pandas eat bamboo.", "Pandas live in China."}
+    assert [data["text"] for name, data in events if name == "token"] == TOKENS
+
+
+class FailingMidStream:
+    """Generator that streams part of an answer, then fails"""
+
+    async def agenerate_stream(self, query, context):
+        yield "Pandas eat"
+        yield GenerationError("Sorry, an error occurred while processing your request: connection reset")
+
+    async def aclose(self):
+        pass
+
+
+def test_failed_stream_is_not_cached(api, monkeypatch):
+    api.vector_store.clear()
+    api.vector_store.add_texts(["Pandas eat bamboo."], [{"source": "pandas.txt"}])
+    api.answer_cache.clear()
+    monkeypatch.setattr(api, "generator", FailingMidStream())
+
+    events = parse_events(stream_query(api, "What do pandas eat?").text)
+    assert [data["text"] for name, data in events if name == "token"][0] == "Pandas eat"
+    assert api.answer_cache.get("What do pandas eat?", 3, api.vector_store.version) is None
@@ -0,0 +1,66 @@
+"""Streaming generation against the stub completions server"""
+
+import asyncio
+import socket
+
+from simple_pandaaiqa.generator import GenerationError, Generator
+
+from conftest import TOKENS
+
+CONTEXT = [{"text": "The answer is in the context.", "metadata": {"source": "notes.txt"}, "score": 1.0}]
+
+
+def collect(make_generator, query="What is the answer?"):
+    """Tokens of generate_stream and agenerate_stream, each from a fresh generator, and the generators"""
+    generator, async_generator = make_generator(), make_generator()
+    tokens = list(generator.generate_stream(query, CONTEXT))
+
+    async def collect_async():
+        try:
+            return [token async for token in async_generator.agenerate_stream(query, CONTEXT)]
+        finally:
+            await async_generator.aclose()
+
+    return tokens, asyncio.run(collect_async()), (generator, async_generator)
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_streams_tokens_in_order(stub_server):
+    tokens, async_tokens, generators = collect(lambda: Generator(api_base=stub_server))
+    assert tokens == TOKENS
+    assert async_tokens == TOKENS
+    assert not any(isinstance(token, GenerationError) for token in tokens + async_tokens)
+    for generator in generators:
+        assert generator.connection_status()[0]
+
+
+def test_error_status_is_yielded_as_message(failing_server):
+    tokens, async_tokens, generators = collect(lambda: Generator(api_base=failing_server))
+    for stream in (tokens, async_tokens):
+        assert len(stream) == 1
+        assert isinstance(stream[0], GenerationError)
+        assert "API returned an error: 500" in stream[0]
+    for generator in generators:
+        assert generator.connection_status() == (False, "LM Studio connection failed: HTTP 500")
+
+
+def test_error_status_marks_lm_studio_down(failing_server):
+    generator = Generator(api_base=failing_server)
+    answer = generator.generate("What is the answer?", CONTEXT)
+    assert isinstance(answer, GenerationError)
+    assert generator.connection_status() == (False, "LM Studio connection failed: HTTP 500")
+
+
+def test_unreachable_server_is_yielded_as_message():
+    tokens, async_tokens, _ = collect(
+        lambda: Generator(api_base=f"http://127.0.0.1:{unused_port()}", connect_timeout=1)
+    )
+    for stream in (tokens, async_tokens):
+        assert len(stream) == 1
+        assert isinstance(stream[0], GenerationError)
+        assert stream[0].startswith("cannot connect to language model")